@@ -0,0 +1,267 @@
+"""Micro-benchmarks for the app's hot paths, with results saved as JSON.
+
+Every benchmark is warmed up, then timed over several samples. Each sample
+runs enough loops to last at least ``MIN_SAMPLE_SECONDS``, so fast
+functions are not dominated by timer noise. Statistics are per call.
+
+    python benchmark.py                          # writes bench_results.json
+    python benchmark.py --quick --filter chart   # subset, smaller inputs
+    python benchmark.py --output new.json --compare bench_results.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from emission_model import (MODEL_DIR, calculate_trees_needed, industry_average_emission, load_predictor,
+                            model_artifact_stamp)
+
+RESULTS_FILE = 'bench_results.json'
+SAMPLES = 7
+WARMUP = 1
+MIN_SAMPLE_SECONDS = 0.05
+REGRESSION_THRESHOLD = 0.10  # median slower by more than this is flagged
+BATCH_SIZES = [1_000, 100_000, 1_000_000]
+EXPLORER_ROWS = 100_000
+
+SCAN_TRIP = {
+    'Distance_km': 500.0,
+    'Fuel_Type': 'Diesel',
+    'Fuel_Consumed_Liters': 25.0,
+    'Avg_Speed_kmph': 60.0,
+    'Traffic_Level': 'Medium',
+    'Weather_Condition': 'Clear',
+    'Cargo_Weight_kg': 3000.0,
+}
+
+_COLD_LOAD_PROBE = """
+import time
+start = time.perf_counter()
+from emission_model import load_predictor
+load_predictor()
+print(time.perf_counter() - start)
+"""
+
+
+# =============================================
+# TIMING
+# =============================================
+def time_call(fn, samples=SAMPLES, warmup=WARMUP, min_sample_seconds=MIN_SAMPLE_SECONDS):
+    """Per-call seconds for fn: one value per sample, each averaged over auto-sized loops"""
+    for _ in range(warmup):
+        fn()
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_sample_seconds:
+            break
+        loops = max(loops * 2, int(loops * min_sample_seconds / max(elapsed, 1e-9)))
+    times = [elapsed / loops]
+    for _ in range(samples - 1):
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        times.append((time.perf_counter() - start) / loops)
+    return times, loops
+
+
+def summarize(times, loops):
+    """Robust statistics over per-call sample times (seconds)"""
+    median = statistics.median(times)
+    return {
+        'median': median,
+        'min': min(times),
+        'mean': statistics.fmean(times),
+        'stdev': statistics.stdev(times) if len(times) > 1 else 0.0,
+        'mad': statistics.median(abs(t - median) for t in times),
+        'samples': len(times),
+        'loops': loops,
+    }
+
+
+# =============================================
+# BENCHMARKS
+# =============================================
+def _cold_load_times(samples):
+    """Fresh-interpreter import + load_predictor(), one process per sample"""
+    times = []
+    for _ in range(samples):
+        out = subprocess.run([sys.executable, '-W', 'ignore', '-c', _COLD_LOAD_PROBE], cwd=MODEL_DIR,
+                             capture_output=True, text=True, check=True)
+        times.append(float(out.stdout.strip().splitlines()[-1]))
+    return times, 1
+
+
+def _explorer_csv(rows, directory):
+    from train_model import generate_trips
+
+    path = os.path.join(directory, f'bench_trips_{rows}.csv')
+    generate_trips(rows, seed=7).to_csv(path, index=False)
+    return path
+
+
+def _history_store(rows, directory):
+    """A trip store holding rows scored trips spread over one year"""
+    from train_model import generate_trips
+    from trip_store import TripStore
+
+    trips = generate_trips(rows, seed=11)
+    days = np.random.default_rng(11).integers(0, 365, rows)
+    trips['Trip_Date'] = (np.datetime64('2025-01-01') + days).astype(str)
+    trips['Predicted_CO2_kg'] = trips['CO2_Emission_kg']
+    trips['Industry_Avg_CO2_kg'] = industry_average_emission(trips['Distance_km'], trips['Cargo_Weight_kg'])
+    store = TripStore(os.path.join(directory, 'bench_history.sqlite'))
+    store.add(trips, source='bulk')
+    return store
+
+
+def build_benchmarks(quick=False, workdir=None):
+    """[(name, fn)] for every hot path; fn returns (per-call times, loops)"""
+    import pandas as pd
+
+    from charts import CHART_TYPES, render_chart_png
+    from prediction_cache import PredictionCache
+    from stream_stats import summarize_dataset
+    from train_model import generate_trips
+    from trip_dataset import load_dataset
+
+    predictor = load_predictor()
+    samples = 3 if quick else SAMPLES
+    batch_sizes = BATCH_SIZES[:2] if quick else BATCH_SIZES
+    explorer_rows = EXPLORER_ROWS // 10 if quick else EXPLORER_ROWS
+    benches = []
+
+    def add(name, fn, samples=samples):
+        benches.append((name, lambda: time_call(fn, samples)))
+
+    benches.append(('load_model.cold', lambda: _cold_load_times(3 if quick else 5)))
+    add('load_model.reload', load_predictor)
+    # A warm load_model() is a cache_resource hit keyed on this stamp
+    add('load_model.warm_stamp', model_artifact_stamp)
+
+    trip = pd.DataFrame([SCAN_TRIP])
+    add('scan.encode_predict', lambda: predictor.forest.predict(predictor.encode(trip)))
+    cache = PredictionCache()
+    features = predictor.encode(trip).iloc[0].to_numpy(dtype=float)
+    add('scan.cached_predict', lambda: cache.predict(features, predictor.forest.predict))
+
+    largest = generate_trips(batch_sizes[-1], seed=3)
+    encoded = predictor.encode(largest)
+    add(f'encode.batch_{len(largest)}', lambda: predictor.encode(largest), samples=min(samples, 3))
+    for n in batch_sizes:
+        X = encoded.iloc[:n]
+        add(f'predict.batch_{n}', lambda X=X: predictor.predict_encoded(X),
+            samples=min(samples, 3) if n >= 1_000_000 else samples)
+    add(f'predict.interval_{len(encoded)}', lambda: predictor.predict_interval_encoded(encoded),
+        samples=min(samples, 3) if len(encoded) >= 1_000_000 else samples)
+    co2 = largest['CO2_Emission_kg'].to_numpy()
+    add(f'offset.trees_needed_{len(co2)}', lambda: calculate_trees_needed(co2))
+
+    csv_path = _explorer_csv(explorer_rows, workdir)
+    add(f'explorer.csv_describe_{explorer_rows}', lambda: pd.read_csv(csv_path).describe())
+    load_dataset(csv_path)  # builds the columnar store outside the timed region
+    add(f'explorer.columnar_load_{explorer_rows}', lambda: load_dataset(csv_path))
+    add(f'explorer.streaming_summary_{explorer_rows}', lambda: summarize_dataset(csv_path).describe())
+    df = load_dataset(csv_path)
+    for chart in CHART_TYPES:
+        slug = chart.lower().replace(' ', '_')
+        add(f'chart.{slug}', lambda chart=chart: render_chart_png(chart, df), samples=min(samples, 3))
+
+    # Trip history: precomputed rollups against aggregating the stored trips
+    store = _history_store(explorer_rows, workdir)
+    add(f'history.rollup_month_{explorer_rows}', lambda: store.rollup('month'))
+    add(f'history.rollup_day_{explorer_rows}', lambda: store.rollup('day'))
+    add(f'history.rescan_month_{explorer_rows}', lambda: store.rollup('month', rescan=True),
+        samples=min(samples, 3))
+    scan = pd.DataFrame([dict(SCAN_TRIP, Predicted_CO2_kg=300.0, Industry_Avg_CO2_kg=150.0)])
+    add('history.add_scan', lambda: store.add(scan, source='scan'))
+    return benches
+
+
+def run(quick=False, name_filter=None, verbose=True):
+    """Run the suite; returns the results document"""
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for name, bench in build_benchmarks(quick, workdir):
+            if name_filter and name_filter not in name:
+                continue
+            results[name] = summarize(*bench())
+            if verbose:
+                r = results[name]
+                print(f"  {name:<40} {r['median'] * 1000:>11.3f} ms  ±{r['mad'] * 1000:.3f}  "
+                      f"(min {r['min'] * 1000:.3f}, {r['samples']}x{r['loops']})")
+    return {'meta': environment(quick), 'results': results}
+
+
+def environment(quick=False):
+    import pandas as pd
+
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=MODEL_DIR,
+                                capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'commit': commit,
+        'quick': quick,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+    }
+
+
+def compare(new, old, threshold=REGRESSION_THRESHOLD):
+    """Print median ratios new/old; returns the names that regressed"""
+    regressions = []
+    print(f"\n  {'benchmark':<40} {'old ms':>11} {'new ms':>11} {'ratio':>7}")
+    for name, r in new['results'].items():
+        if name not in old['results']:
+            continue
+        before, after = old['results'][name]['median'], r['median']
+        ratio = after / before
+        flag = ''
+        if ratio > 1 + threshold:
+            flag = '  SLOWER'
+            regressions.append(name)
+        elif ratio < 1 - threshold:
+            flag = '  faster'
+        print(f"  {name:<40} {before * 1000:>11.3f} {after * 1000:>11.3f} {ratio:>6.2f}x{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the app's hot paths")
+    parser.add_argument('--output', default=RESULTS_FILE)
+    parser.add_argument('--compare', default=None, help="earlier results file to compare against")
+    parser.add_argument('--filter', default=None, help="only run benchmarks whose name contains this")
+    parser.add_argument('--quick', action='store_true', help="fewer samples and smaller inputs")
+    args = parser.parse_args(argv)
+
+    results = run(args.quick, args.filter)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Wrote {args.output}")
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f))
+        if regressions:
+            sys.exit(f"{len(regressions)} benchmark(s) slower by more than {REGRESSION_THRESHOLD:.0%}: "
+                     f"{', '.join(regressions)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,15 +1,21 @@
 import streamlit as st
-import pandas as pd
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.preprocessing import LabelEncoder
-import joblib
-import matplotlib.pyplot as plt
-from matplotlib import cm
-import numpy as np
+from emission_model import (CATEGORICAL_COLUMNS, EMPTY_LABEL, FEATURE_COLUMNS, calculate_trees_needed,
+                            industry_average_emission, load_predictor, model_artifact_stamp)
+from prediction_cache import PredictionCache
+import metrics
+import io
+import os
+import tempfile
+import time
+import weakref
+
+# pandas, matplotlib and the model are loaded inside the pages that use them,
+# so the static pages render without paying for them on a fresh worker.
 
 # Constants
-AVG_CO2_PER_KM = 0.15  # kg CO2 per km per kg cargo (industry average)
-TREE_ABSORPTION_PER_YEAR = 21.77  # kg CO2 per tree per year (average)
+PREDICTION_CACHE_SIZE = 4096  # distinct single-trip inputs remembered across sessions
+RECOMMENDATION_CACHE_SIZE = 256  # scanned trips whose counterfactual batches are kept
+PREVIEW_ROWS = 10  # trips shown in the Data Explorer's dataset preview
 
 # =============================================
 # 3D COLORFUL PAGE CONFIGURATION
@@ -231,7 +237,9 @@ app_mode = st.sidebar.radio("",
                            "📈 Data Explorer", 
                            "⚙️ AI Model Lab",
                            "🔬 Fuel Science"],
+                          key="app_mode",
                           label_visibility="collapsed")
+metrics.start_rerun()
 
 # Add fuel science section
 if app_mode == "🔬 Fuel Science":
@@ -330,221 +338,285 @@ if app_mode == "🔬 Fuel Science":
         🌟 Clean energy isn't just the future — it's our responsibility today.🌟 
     </div>
     """, unsafe_allow_html=True)
-def calculate_trees_needed(co2_kg, years=5):
-    """Calculate how many trees needed to offset CO2 over given years"""
-    return co2_kg / (TREE_ABSORPTION_PER_YEAR * years)
 
 
-# =============================================
-# MODEL LOADING FUNCTION
-# =============================================
 # =============================================
 # MODEL LOADING FUNCTION (IMPROVED)
 # =============================================
+@st.cache_resource(max_entries=1)
+def load_model(artifact_stamp):
+    """Load the model and encoders; a new artifact_stamp forces a reload.
+
+    Retrain with `python train_model.py`.
+    """
+    with metrics.stage('model_load'):
+        return load_predictor()
+
+
+@st.cache_resource(max_entries=2)
+def load_dataset_preview(stamp):
+    """First PREVIEW_ROWS trips of the dataset, shared across sessions until the CSV changes"""
+    from trip_dataset import load_dataset
+
+    with metrics.stage('dataset_load'):
+        return load_dataset(stamp[0], rows=slice(0, PREVIEW_ROWS))
+
+
+@st.cache_resource(max_entries=2)
+def load_trip_summary(stamp):
+    """Single-pass streaming statistics over the columnar trip dataset"""
+    from stream_stats import summarize_dataset
+
+    with metrics.stage('dataset_summary'):
+        return summarize_dataset(stamp[0])
+
+
+@st.cache_resource(max_entries=2)
+def load_plan_sample(stamp):
+    """Sample trip CSV for the Portfolio Planner, read once per CSV version"""
+    import pandas as pd
+
+    with metrics.stage('plan_sample_load'):
+        return pd.read_csv(stamp[0])
+
+
+@st.cache_resource(max_entries=2)
+def load_plan_upload(file_id, size, _plan_file):
+    """An uploaded emissions file for the Portfolio Planner, parsed once per upload"""
+    import pandas as pd
+
+    _plan_file.seek(0)
+    with metrics.stage('plan_upload_load'):
+        return pd.read_csv(_plan_file, compression='gzip' if _plan_file.name.endswith('.gz') else None)
+
+
 @st.cache_resource
-def load_model():
-    model = joblib.load('co2_emission_model.pkl')
-    le_fuel = joblib.load('label_encoder_fuel.pkl')
-    le_traffic = joblib.load('label_encoder_traffic.pkl')
-    le_weather = joblib.load('label_encoder_weather.pkl')
-    # except:
-    #     # Generate synthetic data with improved fuel type emissions
-    #     np.random.seed(42)
-    #     n_samples = 5000  # Increased sample size
-        
-    #     # Emission factors by fuel type (kg CO2 per liter)
-    #     FUEL_EMISSIONS = {
-    #         'Diesel': 2.68,
-    #         'Petrol': 2.31,
-    #         'CNG': 1.65,    # Lower emissions for CNG
-    #         'Electric': 0.0  # Zero direct emissions
-    #     }
-        
-    #     data = {
-    #         'Route_ID': range(1, n_samples+1),
-    #         'Distance_km': np.random.uniform(50, 2000, n_samples),
-    #         'Fuel_Type': np.random.choice(['Diesel', 'Petrol', 'CNG', 'Electric'], n_samples, p=[0.3, 0.3, 0.2, 0.2]),
-    #         'Fuel_Consumed_Liters': np.random.uniform(10, 500, n_samples),
-    #         'Avg_Speed_kmph': np.random.uniform(30, 100, n_samples),
-    #         'Traffic_Level': np.random.choice(['Low', 'Medium', 'High'], n_samples, p=[0.3, 0.5, 0.2]),
-    #         'Weather_Condition': np.random.choice(['Clear', 'Rainy', 'Foggy'], n_samples, p=[0.6, 0.3, 0.1]),
-    #         'Cargo_Weight_kg': np.random.uniform(500, 10000, n_samples),
-    #     }
-        
-    #     # Calculate emissions based on fuel type
-    #     data['CO2_Emission_kg'] = [
-    #         data['Fuel_Consumed_Liters'][i] * FUEL_EMISSIONS[data['Fuel_Type'][i]] 
-    #         + data['Distance_km'][i] * data['Cargo_Weight_kg'][i] * AVG_CO2_PER_KM / 1000
-    #         for i in range(n_samples)
-    #     ]
-        
-    #     df = pd.DataFrame(data)
-    #     df.to_csv('carbon_footprint_logistics_2000.csv', index=False)
-        
-    #     # Label encoding
-    #     le_fuel = LabelEncoder()
-    #     le_traffic = LabelEncoder()
-    #     le_weather = LabelEncoder()
-        
-    #     df['Fuel_Type'] = le_fuel.fit_transform(df['Fuel_Type'])
-    #     df['Traffic_Level'] = le_traffic.fit_transform(df['Traffic_Level'])
-    #     df['Weather_Condition'] = le_weather.fit_transform(df['Weather_Condition'])
-        
-    #     # Train improved model
-    #     X = df.drop(['Route_ID', 'CO2_Emission_kg'], axis=1)
-    #     y = df['CO2_Emission_kg']
-        
-    #     model = RandomForestRegressor(
-    #         n_estimators=200,  # Increased number of trees
-    #         max_depth=12,      # Deeper trees for better accuracy
-    #         min_samples_split=5,
-    #         random_state=42
-    #     )
-    #     model.fit(X, y)
-        
-    #     # Save the improved model
-    #     joblib.dump(model, 'co2_emission_model.pkl')
-    #     joblib.dump(le_fuel, 'label_encoder_fuel.pkl')
-    #     joblib.dump(le_traffic, 'label_encoder_traffic.pkl')
-    #     joblib.dump(le_weather, 'label_encoder_weather.pkl')
-    
-    return model, le_fuel, le_traffic, le_weather
+def load_trip_store():
+    """SQLite trip history with daily and monthly rollups, shared by every session"""
+    from trip_store import TripStore
+
+    return TripStore()
+
+
+@st.cache_resource
+def load_chart_cache():
+    """PNG render cache for the Data Explorer charts, shared by every session"""
+    from charts import ChartCache
+
+    return ChartCache()
+
+
+@st.cache_resource(max_entries=1)
+def load_prediction_cache(artifact_stamp):
+    """One prediction cache per model version, shared by every session"""
+    return PredictionCache(maxsize=PREDICTION_CACHE_SIZE)
+
+
+@st.cache_resource(max_entries=RECOMMENDATION_CACHE_SIZE, show_spinner=False)
+def load_recommendations(artifact_stamp, trip_items):
+    """Counterfactual savings for one trip, scored once per trip and model version"""
+    from recommendations import recommend
+
+    return recommend(load_model(artifact_stamp), dict(trip_items))
+
+
+@st.cache_resource(max_entries=1)
+def load_model_evaluation(artifact_stamp):
+    """Holdout evaluation of this model version, started in a background thread"""
+    from model_evaluation import EvaluationJob
+
+    return EvaluationJob(load_model(artifact_stamp))
+
+
+
+# =============================================
+# MODEL LAB HELPERS
+# =============================================
+def show_evaluation(evaluation, section, waiting_text, render):
+    """Render one section of the background evaluation once it is ready.
+
+    While it is pending, a fragment polls once a second without rerunning the
+    page; when it lands, one full rerun re-creates the fragment without polling.
+    """
+    pending = not evaluation.ready(section)
+
+    @st.fragment(run_every=1.0 if pending else None)
+    def evaluation_section():
+        if not evaluation.ready(section):
+            st.info(waiting_text)
+            return
+        if pending:
+            st.rerun()
+        if section not in evaluation.results:
+            st.error(f"⚠️ Model evaluation failed: {evaluation.error}")
+            return
+        render(evaluation.results[section])
+
+    evaluation_section()
+
+
+# =============================================
+# BULK SCORING HELPERS
+# =============================================
+def remove_file(path):
+    """Delete path if it is still there"""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class ScanFile:
+    """A scored-trips file on disk, deleted on remove() or when the session holding it ends"""
+
+    def __init__(self, path):
+        self.path = path
+        self.remove = weakref.finalize(self, remove_file, path)
 
-model, le_fuel, le_traffic, le_weather = load_model()
+
+def run_bulk_scan(predictor, uploaded_file, progress, store=None):
+    """Score an uploaded trip file into a gzipped CSV on disk, updating a progress bar.
+
+    With a store, every scored trip is also appended to the trip history. The
+    file is returned as a ScanFile, so it goes when the result is dropped.
+    """
+    out = tempfile.NamedTemporaryFile(prefix='ecovision_scan_', suffix='.csv.gz', delete=False)
+    out.close()
+    scan_file = ScanFile(out.name)
+    rows = 0
+    total_co2 = 0.0
+    total_avg = 0.0
+    unscored = 0
+    stored = 0
+    unknown = {}  # column -> {label: trips}
+    size = max(uploaded_file.size, 1)
+    try:
+        for chunk in predictor.score_chunks(uploaded_file):
+            chunk.to_csv(out.name, mode='a', header=rows == 0, index=False, compression='gzip')
+            if store is not None:
+                stored += store.add(chunk, source='bulk')
+            rows += len(chunk)
+            scored = chunk['Predicted_CO2_kg'].notna()
+            unscored += chunk.attrs['encoding']['unscored_rows']
+            total_co2 += chunk['Predicted_CO2_kg'].sum()
+            total_avg += chunk.loc[scored, 'Industry_Avg_CO2_kg'].sum()
+            empty = {col: {EMPTY_LABEL: count} for col, count in chunk.attrs['encoding']['empty'].items()}
+            for col, counts in (chunk.attrs['encoding']['unknown'] | empty).items():
+                seen = unknown.setdefault(col, {})
+                for label, count in counts.items():
+                    seen[label] = seen.get(label, 0) + count
+            progress.progress(min(uploaded_file.tell() / size, 1.0), text=f"Scored {rows:,} trips")
+    except Exception:
+        scan_file.remove()
+        raise
+    progress.progress(1.0, text=f"Scored {rows:,} trips")
+    return {'file': scan_file, 'rows': rows, 'total_co2': total_co2, 'total_avg': total_avg,
+            'unscored': unscored, 'unknown': unknown, 'stored': stored}
 # =============================================
 # 3D EMISSION SCAN MODULE
 # =============================================
 if app_mode == "📊 Emission Scan":
-    with st.container():
-        st.markdown("""
-        <div class="card-3d">
-            <h2>🚛 Supply Chain Carbon Footprint Analysis</h2>
-            <p>🧮Calculate your logistics carbon footprint with our interactive analyzer.</p>
-        </div>
-        """, unsafe_allow_html=True)
-       
-        
-        col1, col2 = st.columns(2, gap="large")
-        
-        with col1:
-            with st.expander("🔧 Trip Parameters", expanded=True):
-                distance = st.number_input("Distance (km)", min_value=1, max_value=5000, value=500)
-                fuel_type = st.selectbox("Fuel Type", le_fuel.classes_)
-                fuel_consumed = st.number_input("Fuel Consumed (Liters)", min_value=0.1, value=25.0)
-        
-        with col2:
-            with st.expander("🌤️ Environmental Factors", expanded=True):
-                avg_speed = st.number_input("Average Speed (km/h)", min_value=1, max_value=120, value=60)
-                traffic_level = st.selectbox("Traffic Level", le_traffic.classes_)
-                weather = st.selectbox("Weather Condition", le_weather.classes_)
-        
-        with st.expander("📦 Cargo Details", expanded=True):
-            cargo_weight = st.number_input("Cargo Weight (kg)", min_value=1, value=3000)
-    
-        if st.button("SCAN EMISSIONS", use_container_width=True):
-            with st.spinner('Analyzing environmental impact in 3D...'):
-                input_data = {
-                    'Distance_km': distance,
-                    'Fuel_Type': fuel_type,
-                    'Fuel_Consumed_Liters': fuel_consumed,
-                    'Avg_Speed_kmph': avg_speed,
-                    'Traffic_Level': traffic_level,
-                    'Weather_Condition': weather,
-                    'Cargo_Weight_kg': cargo_weight
-                }
-                
-                input_df = pd.DataFrame([input_data])
-                
-                input_df['Fuel_Type'] = le_fuel.transform(input_df['Fuel_Type'])
-                input_df['Traffic_Level'] = le_traffic.transform(input_df['Traffic_Level'])
-                input_df['Weather_Condition'] = le_weather.transform(input_df['Weather_Condition'])
-                
-                prediction = model.predict(input_df)
-                avg_emission = distance * cargo_weight * AVG_CO2_PER_KM / 1000
-                
-                # 3D Results card
+    import pandas as pd
+    from recommendations import CATEGORIES, best_by_category
+
+    artifact_stamp = model_artifact_stamp()
+    predictor = load_model(artifact_stamp)
+    prediction_cache = load_prediction_cache(artifact_stamp)
+
+    def show_scan_results(trip):
+        """Estimate, recommendations and offset card for one scanned trip; returns its scores"""
+        with st.spinner('Analyzing environmental impact in 3D...'):
+            with metrics.stage('encode'):
+                input_df = predictor.encode(pd.DataFrame([trip]))
+            
+            with metrics.timer('prediction_seconds'):
+                # One row per trip: the estimate, then the 5th and 95th percentile across trees
+                estimate = prediction_cache.predict(input_df.iloc[0].to_numpy(dtype=float),
+                                                    predictor.predict_interval_encoded)
+            prediction = estimate[:, 0]
+            interval_low, interval_high = estimate[0, 1:]
+            avg_emission = industry_average_emission(trip['Distance_km'], trip['Cargo_Weight_kg'])
+            metrics.record_cache('prediction', prediction_cache.stats())
+            
+            # 3D Results card
+            with metrics.stage('render_html'):
                 st.markdown(f"""
-                <div class="card-3d">
-                    <div style="display: grid; grid-template-columns: 1fr 1fr; gap: 2rem;">
-                        <div style="background: linear-gradient(135deg, #FF6B6B, #FF8E53); padding: 1.5rem; border-radius: 12px; color: white;">
-                            <h3>Your Emissions</h3>
-                            <div style="font-size: 2.5rem; font-weight: 800;">{prediction[0]:.1f} kg CO₂</div>
-                        </div>
-                        <div style="background: linear-gradient(135deg, #4CAF50, #8BC34A); padding: 1.5rem; border-radius: 12px; color: white;">
-                            <h3>Industry Average</h3>
-                            <div style="font-size: 2.5rem; font-weight: 800;">{avg_emission:.1f} kg CO₂</div>
-                        </div>
+            <div class="card-3d">
+                <div style="display: grid; grid-template-columns: 1fr 1fr; gap: 2rem;">
+                    <div style="background: linear-gradient(135deg, #FF6B6B, #FF8E53); padding: 1.5rem; border-radius: 12px; color: white;">
+                        <h3>Your Emissions</h3>
+                        <div style="font-size: 2.5rem; font-weight: 800;">{prediction[0]:.1f} kg CO₂</div>
+                        <div style="font-size: 0.95rem; opacity: 0.9;">90% of trees: {interval_low:.1f} – {interval_high:.1f} kg</div>
                     </div>
-                </div>
-                """, unsafe_allow_html=True)
-                
-                difference = prediction[0] - avg_emission
-                if difference > 0:
-                    st.error(f"⚠️ Your emissions are {difference:.2f} kg above industry average")
-                else:
-                    st.success(f"✅ Your emissions are {abs(difference):.2f} kg below industry average")
-                                    # Optimization recommendations
-                st.markdown("---")
-                st.markdown("""
-                <div style="text-align: center;">
-                    <h2>🔄 Optimization Recommendations</h2>
-                    <p>Actionable insights to reduce your supply chain carbon footprint</p>
-                </div>
-                """, unsafe_allow_html=True)
-                
-                rec_col1, rec_col2, rec_col3 = st.columns(3)
-                
-                with rec_col1:
-                    route_savings = distance * 0.15 * cargo_weight * AVG_CO2_PER_KM / 1000
-                    st.markdown(f"""
-                    <div class="card-3d" style="padding: 1rem;">
-                        <h4>🚛 Route Optimization</h4>
-                        <p>Potential distance reduction: <strong>12-18%</strong></p>
-                        <p>Estimated savings: <strong>{route_savings:.1f} kg CO₂</strong></p>
+                    <div style="background: linear-gradient(135deg, #4CAF50, #8BC34A); padding: 1.5rem; border-radius: 12px; color: white;">
+                        <h3>Industry Average</h3>
+                        <div style="font-size: 2.5rem; font-weight: 800;">{avg_emission:.1f} kg CO₂</div>
                     </div>
-                    """, unsafe_allow_html=True)
-                
-                with rec_col2:
-                    if fuel_type != "Electric":
-                        fuel_savings = prediction[0] * 0.25
-                        alt_fuel = "Electric"
-                        savings_pct = 25
+                </div>
+            </div>
+            """, unsafe_allow_html=True)
+            
+            difference = prediction[0] - avg_emission
+            if difference > 0:
+                st.error(f"⚠️ Your emissions are {difference:.2f} kg above industry average")
+            else:
+                st.success(f"✅ Your emissions are {abs(difference):.2f} kg below industry average")
+            cache_stats = prediction_cache.stats()
+            st.caption(f"Prediction cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses "
+                       f"({cache_stats['size']} of {cache_stats['maxsize']} entries)")
+                                # Optimization recommendations
+            st.markdown("---")
+            st.markdown("""
+            <div style="text-align: center;">
+                <h2>🔄 Optimization Recommendations</h2>
+                <p>Actionable insights to reduce your supply chain carbon footprint</p>
+            </div>
+            """, unsafe_allow_html=True)
+            
+            with metrics.stage('recommendations'):
+                recommendations = load_recommendations(artifact_stamp, tuple(trip.items()))
+            best = best_by_category(recommendations)
+            card_titles = {'route': "🚛 Route Optimization", 'fuel': "⛽ Fuel Switch", 'load': "📦 Load Optimization"}
+            
+            for rec_col, category in zip(st.columns(3), CATEGORIES):
+                option = best.get(category)
+                with rec_col:
+                    if option is None:
+                        detail = "<p>No alternative to score for this trip</p>"
+                    elif option['savings_kg'] > 0:
+                        detail = (f"<p>{option['action']}: <strong>{option['savings_pct']:.1f}%</strong> less</p>"
+                                  f"<p>Estimated savings: <strong>{option['savings_kg']:.1f} kg CO₂</strong></p>")
                     else:
-                        fuel_savings = prediction[0] * 0.15
-                        alt_fuel = "CNG"
-                        savings_pct = 15
-                    
+                        detail = (f"<p>No saving predicted; best option: {option['action']}</p>"
+                                  f"<p>Predicted change: <strong>{-option['savings_kg']:+.1f} kg CO₂</strong></p>")
                     st.markdown(f"""
-                    <div class="card-3d" style="padding: 1rem;">
-                        <h4>⛽ Fuel Efficiency</h4>
-                        <p>Switch to {alt_fuel}: <strong>{savings_pct:.1f}%</strong> cleaner</p>
-                        <p>Estimated savings: <strong>{fuel_savings:.1f} kg CO₂</strong></p>
-                    </div>
-                    """, unsafe_allow_html=True)
-                
-                with rec_col3:
-                    load_savings = prediction[0] * 0.1
-                    st.markdown(f"""
-                    <div class="card-3d" style="padding: 1rem;">
-                        <h4>📦 Load Optimization</h4>
-                        <p>Improved capacity utilization: <strong>8-12%</strong></p>
-                        <p>Estimated savings: <strong>{load_savings:.1f} kg CO₂</strong></p>
-                    </div>
-                    """, unsafe_allow_html=True)
-                
-                # 3D Offset calculator
-                st.markdown("---")
-                st.markdown("""
-                <div style="text-align: center;">
-                    <h2>🌱 Carbon Neutralization</h2>
-                    <p>Discover how to offset your emissions through reforestation</p>
+                <div class="card-3d" style="padding: 1rem;">
+                    <h4>{card_titles[category]}</h4>
+                    {detail}
                 </div>
                 """, unsafe_allow_html=True)
-                
-                years_to_offset =1
-                
-                trees_needed = calculate_trees_needed(prediction[0], years_to_offset)
-                st.markdown(f"""
+            
+            with st.expander("📋 All alternatives, ranked by predicted savings"):
+                st.dataframe(pd.DataFrame(recommendations['options']).rename(columns={
+                    'category': 'Area', 'action': 'Change', 'predicted_kg': 'Predicted CO₂ (kg)',
+                    'savings_kg': 'Savings (kg)', 'savings_pct': 'Savings (%)'}),
+                    hide_index=True, use_container_width=True)
+                st.caption(f"{recommendations['trips_scored']} counterfactual trips scored in one batch; "
+                           "inputs not named in a change stay as entered.")
+            
+            # 3D Offset calculator
+            st.markdown("---")
+            st.markdown("""
+            <div style="text-align: center;">
+                <h2>🌱 Carbon Neutralization</h2>
+                <p>Discover how to offset your emissions through reforestation</p>
+            </div>
+            """, unsafe_allow_html=True)
+            
+            years_to_offset =1
+            
+            trees_needed = calculate_trees_needed(prediction[0], years_to_offset)
+            st.markdown(f"""
 <div style="
     font-family: 'Segoe UI', Roboto, 'Helvetica Neue', Arial, sans-serif;
     margin: 1rem 0;
@@ -600,12 +672,163 @@ if app_mode == "📊 Emission Scan":
     </div>
 </div>
 """, unsafe_allow_html=True)
-                
+        return {'Predicted_CO2_kg': float(prediction[0]), 'Industry_Avg_CO2_kg': float(avg_emission)}
+
+    # What-if sensitivity: sweep one or two inputs around the scanned trip, scored in one batch
+    @st.fragment
+    def sensitivity_panel():
+        with st.expander("🎛️ What-if Sensitivity", expanded=False):
+            if not st.toggle("Show how the prediction responds to the trip inputs", key='sensitivity_on'):
+                return
+            current_trip = st.session_state.get('scan_trip')
+            if current_trip is None:
+                st.info("Scan a trip above to sweep its inputs.")
+                return
+            from sensitivity import DEFAULT_POINTS, FEATURE_LABELS, SWEEP_RANGES, render_heatmap, sweep, sweep_values
+
+            s1, s2, s3 = st.columns(3)
+            x_feature = s1.selectbox("Sweep", FEATURE_COLUMNS, index=FEATURE_COLUMNS.index('Avg_Speed_kmph'),
+                                     format_func=lambda f: FEATURE_LABELS.get(f, f))
+            y_options = [None] + [f for f in FEATURE_COLUMNS if f != x_feature]
+            y_feature = s2.selectbox("Against", y_options, index=y_options.index('Traffic_Level')
+                                     if 'Traffic_Level' in y_options else 0,
+                                     format_func=lambda f: FEATURE_LABELS.get(f, "— nothing (curve) —"))
+            points = s3.slider("Points per numeric axis", 5, 100, DEFAULT_POINTS)
+            x_range = y_range = (None, None)
+            if x_feature in SWEEP_RANGES:
+                x_range = st.slider(f"{FEATURE_LABELS[x_feature]} range", *SWEEP_RANGES[x_feature],
+                                    value=SWEEP_RANGES[x_feature])
+            if y_feature in SWEEP_RANGES:
+                y_range = st.slider(f"{FEATURE_LABELS[y_feature]} range", *SWEEP_RANGES[y_feature],
+                                    value=SWEEP_RANGES[y_feature])
+
+            x_values = sweep_values(predictor, x_feature, *x_range, points=points)
+            y_values = sweep_values(predictor, y_feature, *y_range, points=points) if y_feature else None
+            with metrics.stage('sensitivity_predict'):
+                grid = sweep(predictor, current_trip, x_feature, x_values, y_feature, y_values)
+            if y_feature:
+                with metrics.stage('matplotlib'):
+                    st.pyplot(render_heatmap(grid, x_feature, x_values, y_feature, y_values, current_trip))
+            else:
+                st.line_chart(pd.DataFrame({'Predicted CO₂ (kg)': grid},
+                                           index=pd.Index(x_values, name=FEATURE_LABELS[x_feature])))
+            st.caption(f"{grid.size:,} what-if trips scored in one prediction call; every other input "
+                       "stays at the values of the scanned trip.")
+
+    # Trip inputs sit in a form, so editing them sends nothing to the server. A
+    # submit reruns only this fragment: the header, sidebar, model load and bulk
+    # scoring are left as they are.
+    @st.fragment
+    def scan_panel():
+        with st.container():
+            st.markdown("""
+            <div class="card-3d">
+                <h2>🚛 Supply Chain Carbon Footprint Analysis</h2>
+                <p>🧮Calculate your logistics carbon footprint with our interactive analyzer.</p>
+            </div>
+            """, unsafe_allow_html=True)
+
+            with st.form("scan_form", border=False):
+                col1, col2 = st.columns(2, gap="large")
+
+                with col1:
+                    with st.expander("🔧 Trip Parameters", expanded=True):
+                        distance = st.number_input("Distance (km)", min_value=1, max_value=5000, value=500)
+                        fuel_type = st.selectbox("Fuel Type", predictor.le_fuel.classes_)
+                        fuel_consumed = st.number_input("Fuel Consumed (Liters)", min_value=0.1, value=25.0)
+
+                with col2:
+                    with st.expander("🌤️ Environmental Factors", expanded=True):
+                        avg_speed = st.number_input("Average Speed (km/h)", min_value=1, max_value=120, value=60)
+                        traffic_level = st.selectbox("Traffic Level", predictor.le_traffic.classes_)
+                        weather = st.selectbox("Weather Condition", predictor.le_weather.classes_)
+
+                with st.expander("📦 Cargo Details", expanded=True):
+                    cargo_weight = st.number_input("Cargo Weight (kg)", min_value=1, value=3000)
+
+                submitted = st.form_submit_button("SCAN EMISSIONS", use_container_width=True)
+
+            if submitted:
+                trip = {
+                    'Distance_km': distance,
+                    'Fuel_Type': fuel_type,
+                    'Fuel_Consumed_Liters': fuel_consumed,
+                    'Avg_Speed_kmph': avg_speed,
+                    'Traffic_Level': traffic_level,
+                    'Weather_Condition': weather,
+                    'Cargo_Weight_kg': cargo_weight
+                }
+                st.session_state['scan_trip'] = trip
+            if 'scan_trip' in st.session_state:
+                scores = show_scan_results(st.session_state['scan_trip'])
+                if submitted:
+                    # Each submitted scan is kept in the trip history, once
+                    load_trip_store().add(pd.DataFrame([dict(st.session_state['scan_trip'], **scores)]),
+                                          source='scan')
+
+        # Nested fragment: its own widgets rerun only the what-if panel, while a
+        # submit reruns it with the scan, so it always sweeps the scanned trip
+        st.markdown("---")
+        sensitivity_panel()
+
+    # Bulk scoring: many trips from one file, scored chunk by chunk
+    @st.fragment
+    def bulk_scoring_panel():
+        with st.expander("📂 Bulk Trip Scoring", expanded=False):
+            st.markdown(f"Upload a CSV with the columns: `{'`, `'.join(FEATURE_COLUMNS)}`. "
+                        "Extra columns are kept in the output; an optional `Trip_Date` column dates "
+                        "the trips in the trip history.")
+            trip_file = st.file_uploader("Trip file (CSV)", type=["csv"])
+            bulk_result = st.session_state.get('bulk_result')
+            if trip_file is not None and st.button("SCORE FILE", use_container_width=True):
+                if bulk_result:
+                    bulk_result['file'].remove()
+                st.session_state.pop('bulk_result', None)
+                progress = st.progress(0.0, text="Scoring trips...")
+                try:
+                    bulk_result = run_bulk_scan(predictor, trip_file, progress, load_trip_store())
+                    bulk_result['file_id'] = trip_file.file_id
+                    st.session_state['bulk_result'] = bulk_result
+                except (ValueError, pd.errors.ParserError) as e:
+                    bulk_result = None
+                    st.error(f"⚠️ Could not score file: {e}")
+
+            if trip_file is not None and bulk_result and bulk_result.get('file_id') == trip_file.file_id:
+                m1, m2, m3 = st.columns(3)
+                m1.metric("Trips Scored", f"{bulk_result['rows']:,}")
+                m2.metric("Predicted CO₂", f"{bulk_result['total_co2']:,.0f} kg")
+                m3.metric("Industry Average", f"{bulk_result['total_avg']:,.0f} kg")
+                if bulk_result['unscored']:
+                    labels = "; ".join(f"{col}: {', '.join(f'{label} ({count:,})' for label, count in counts.items())}"
+                                       for col, counts in bulk_result['unknown'].items())
+                    st.warning(f"⚠️ {bulk_result['unscored']:,} trips have empty values or categories the model "
+                               f"was not trained on and were left unscored (Unknown_Category column). {labels}")
+                st.caption(f"{bulk_result['stored']:,} scored trips added to the trip history "
+                           "(Data Explorer → Trip History).")
+                # Read only when asked for; the download itself does not rerun the fragment
+                if st.button("PREPARE DOWNLOAD", key='bulk_download', use_container_width=True):
+                    with open(bulk_result['file'].path, 'rb') as f:
+                        st.download_button(
+                            label="DOWNLOAD SCORED TRIPS",
+                            data=f,
+                            file_name="scored_trips.csv.gz",
+                            mime="application/gzip",
+                            on_click='ignore',
+                            use_container_width=True
+                        )
+
+    scan_panel()
+    st.markdown("---")
+    bulk_scoring_panel()
+
+
 
 # =============================================
 # OFFSET SIMULATOR MODULE
 # =============================================
 elif app_mode == "🌳 Offset Simulator":
+    from offset_planner import ANNUAL_MORTALITY, GROWTH_YEARS, export_schedule, plan_offsets, schedule_table
+
     st.header("🌳 Offset Simulator")
     st.markdown("""
     <div class="card-3d">
@@ -626,6 +849,7 @@ elif app_mode == "🌳 Offset Simulator":
             years = st.slider("Offset period (years)", 1, 30, 10)
     
     trees_needed = calculate_trees_needed(total_co2, years)
+    planted = plan_offsets(total_co2, years)['trees'][0]
     
     with col2:
             st.markdown(f"""
@@ -634,48 +858,134 @@ elif app_mode == "🌳 Offset Simulator":
                     <h3 style="color: var(--dark-3d);">Offset Solution(Trees)</h3>
                     <div class="tree-counter-3d">{trees_needed:.0f}</div>
                     <p style="font-size: 1.1rem;">Trees required to absorb {total_co2:.0f} kg CO₂ over {years} years</p>
+                    <p>🌱 Planting saplings today: <strong>{planted:,}</strong> trees, allowing
+                    {GROWTH_YEARS:.0f} years to grow in and {ANNUAL_MORTALITY:.0%} losses a year</p>
                 </div>
                 
             </div>
             """, unsafe_allow_html=True)
     
-    # 
+    # Portfolio planner: many routes or business units sized in one array pass. A fragment,
+    # so its widgets rerun only the planner, not the calculator above.
+    st.markdown("---")
+
+    @st.fragment
+    def portfolio_planner():
+        with st.expander("📋 Portfolio Planner", expanded=False):
+            st.markdown("Size plantings for many emission figures at once, e.g. a scored trip file "
+                        "or one row per business unit. Absorption ramps up as trees mature and "
+                        "some trees are lost every year.")
+            plan_file = st.file_uploader("Emissions file (CSV)", type=["csv", "gz"], key='plan_file')
+            # Nothing is read (or imported) until there is a file or the sample is asked for:
+            # the expander's body runs on every rerun even while it is collapsed.
+            plans = None
+            if plan_file is not None:
+                import pandas as pd
+
+                plans = load_plan_upload(plan_file.file_id, plan_file.size, plan_file)
+            elif st.session_state.get('plan_sample') or st.button("PLAN THE SAMPLE DATASET"):
+                import pandas as pd
+                from trip_dataset import DATASET_FILE, dataset_stamp
+
+                st.session_state['plan_sample'] = True
+                st.caption("No file uploaded: planning for every trip in the sample dataset.")
+                try:
+                    stamp = dataset_stamp(DATASET_FILE)
+                except FileNotFoundError:
+                    from train_model import write_sample_dataset
+                    write_sample_dataset(DATASET_FILE)
+                    stamp = dataset_stamp(DATASET_FILE)
+                plans = load_plan_sample(stamp)
+            if plans is not None:
+                numeric = [c for c in plans.columns if pd.api.types.is_numeric_dtype(plans[c])]
+                if not numeric:
+                    st.error("⚠️ The file has no numeric column to plan for")
+                else:
+                    preferred = [c for c in ('Predicted_CO2_kg', 'CO2_Emission_kg') if c in numeric]
+                    p1, p2 = st.columns(2)
+                    emissions_column = p1.selectbox("Emissions column (kg CO₂)", numeric,
+                                                    index=numeric.index(preferred[0]) if preferred else 0)
+                    label_column = p2.selectbox("Plan name column", [None] + list(plans.columns),
+                                                format_func=lambda c: "— row number —" if c is None else c)
+                    p3, p4, p5 = st.columns(3)
+                    horizon = p3.slider("Horizon (years)", 1, 30, 10, key='plan_years')
+                    growth_years = p4.slider("Years to grow in", 0.0, 15.0, GROWTH_YEARS, 0.5)
+                    mortality = p5.slider("Yearly tree losses (%)", 0.0, 15.0, ANNUAL_MORTALITY * 100, 0.5) / 100
+                    curve = {'growth_years': growth_years, 'mortality': mortality}
+                    try:
+                        with metrics.stage('offset_plan'):
+                            plans = plans[plans[emissions_column].notna()]  # e.g. trips left unscored
+                            plan = plan_offsets(plans[emissions_column].to_numpy(dtype=float), horizon, **curve)
+                            schedule = schedule_table(plan, plans[label_column].to_numpy() if label_column else None,
+                                                      **curve)
+                    except ValueError as e:
+                        st.error(f"⚠️ Could not plan: {e}")
+                    else:
+                        m1, m2, m3 = st.columns(3)
+                        m1.metric("Plans", f"{len(plan['trees']):,}")
+                        m2.metric("Trees to Plant", f"{plan['trees'].sum():,}")
+                        m3.metric("CO₂ to Absorb", f"{plan['emissions_kg'].sum():,.0f} kg")
+                        by_year = schedule.groupby('Year')['Cumulative_kg'].sum().to_frame('Absorbed to date (kg)')
+                        by_year['Target (kg)'] = plan['emissions_kg'].sum()
+                        st.line_chart(by_year)
+                        # The CSV is only built when asked for; the download itself does not rerun the planner
+                        if st.button("PREPARE DOWNLOAD", key='plan_download', use_container_width=True):
+                            st.download_button(
+                                label="DOWNLOAD SCHEDULE",
+                                data=export_schedule(schedule, io.BytesIO()).getvalue(),
+                                file_name="offset_schedule.csv",
+                                mime="text/csv",
+                                on_click='ignore',
+                                use_container_width=True
+                            )
+
+    portfolio_planner()
+
+
 # =============================================
 # DATA EXPLORER MODULE
 # =============================================
 elif app_mode == "📈 Data Explorer":
+    from trip_dataset import DATASET_FILE, EXPORT_FORMATS, dataset_stamp, export_dataset, load_dataset
+    from charts import (CARGO_IMPACT, CHART_COLUMNS, DEFAULT_GRID_SIZE, DEFAULT_MAX_POINTS, EMISSIONS_BY_FUEL,
+                        POINT_BUDGETS, chart_key, render_chart_png)
+
     st.header("📊 EcoVision Carbon Tracker ")
     
     try:
-        df = pd.read_csv('carbon_footprint_logistics_2000.csv')
-    except:
-        load_model()  # Generates sample data if needed
-        df = pd.read_csv('carbon_footprint_logistics_2000.csv')
-    
-    tab1, tab2, tab3 = st.tabs(["📋 Dataset Explorer", "📈 Statistical Insights", "📊 3D Visual Analytics"])
+        stamp = dataset_stamp(DATASET_FILE)
+    except FileNotFoundError:
+        from train_model import write_sample_dataset
+        write_sample_dataset(DATASET_FILE)
+        stamp = dataset_stamp(DATASET_FILE)
     
-    with tab1:
+    # No tab holds the whole dataset: the preview reads its first rows, charts the
+    # columns they draw and the statistics a streaming summary.
+    # Tabs with widgets are fragments: changing one reruns only that tab, not the
+    # page (CSS, header, sidebar) or the other tabs.
+    @st.fragment
+    def dataset_tab():
         st.subheader("Dataset Preview")
-        st.dataframe(df.head(10), use_container_width=True)
+        st.dataframe(load_dataset_preview(stamp), use_container_width=True)
         
-        st.download_button(
-            label="DOWNLOAD DATASET",
-            data=df.to_csv(index=False),
-            file_name="logistics_emissions_data.csv",
-            mime="text/csv"
-        )
-    
-    with tab2:
-        st.subheader("Statistical Overview")
-        st.dataframe(df.describe(), use_container_width=True)
-        
-        st.subheader("Key Metrics")
-        col1, col2, col3 = st.columns(3)
-        col1.metric("Total Records", len(df))
-        col2.metric("Average CO₂", f"{df['CO2_Emission_kg'].mean():.1f} kg")
-        col3.metric("Most Common Fuel", df['Fuel_Type'].mode()[0])
-    
-    with tab3:
+        # The export is built and read only on request, then reused on disk until the CSV changes;
+        # the download itself does not rerun the tab
+        export_labels = {'csv.gz': "CSV (gzip)", 'csv': "CSV", 'npz': "Columnar (.npz)"}
+        export_format = st.selectbox("Export format", list(EXPORT_FORMATS), format_func=export_labels.get)
+        if st.button("PREPARE DOWNLOAD"):
+            with st.spinner("Exporting dataset..."):
+                path = export_dataset(DATASET_FILE, export_format)
+            with open(path, 'rb') as f:
+                st.download_button(
+                    label="DOWNLOAD DATASET",
+                    data=f,
+                    file_name=f"logistics_emissions_data.{export_format}",
+                    mime=EXPORT_FORMATS[export_format],
+                    on_click='ignore'
+                )
+
+    @st.fragment
+    def charts_tab():
         st.subheader("Interactive  Visualizations")
         
         chart_type = st.selectbox("Select Visualization", 
@@ -683,76 +993,118 @@ elif app_mode == "📈 Data Explorer":
                                  " Distance vs Emissions", 
                                  "Cargo Impact"])
         
-        if chart_type == "Emissions by Fuel Type":
-            fig = plt.figure(figsize=(10, 6))
-            ax = fig.add_subplot(111, projection='3d')
-            
-            for fuel in df['Fuel_Type'].unique():
-                subset = df[df['Fuel_Type'] == fuel]
-                ax.scatter(subset['Distance_km'], subset['Cargo_Weight_kg'], subset['CO2_Emission_kg'], 
-                          label=fuel, s=50, alpha=0.7)
-            
-            ax.set_xlabel('Distance (km)')
-            ax.set_ylabel('Cargo Weight (kg)')
-            ax.set_zlabel('CO₂ Emissions (kg)')
-            ax.set_title(' Emissions by Fuel Type', pad=20)
-            ax.legend()
-            
-            st.pyplot(fig)
-        
-        elif chart_type == "Distance vs Emissions":
-            fig = plt.figure(figsize=(10, 6))
-            ax = fig.add_subplot(111, projection='3d')
-            
-            hist, xedges, yedges = np.histogram2d(df['Distance_km'], df['CO2_Emission_kg'], bins=20)
-            
-            xpos, ypos = np.meshgrid(xedges[:-1], yedges[:-1])
-            xpos = xpos.flatten()
-            ypos = ypos.flatten()
-            zpos = np.zeros_like(xpos)
-            
-            dx = dy = 0.8 * np.ones_like(zpos)
-            dz = hist.flatten()
-            
-            ax.bar3d(xpos, ypos, zpos, dx, dy, dz, color='#4CAF50', zsort='average')
-            
-            ax.set_xlabel('Distance (km)')
-            ax.set_ylabel('CO₂ Emissions (kg)')
-            ax.set_zlabel('Frequency')
-            ax.set_title(' Distance vs Emissions Distribution', pad=20)
-            
-            st.pyplot(fig)
-        
+        chart_name = chart_type.strip()
+        # Level of detail: scatters are sampled, the surface is gridded
+        chart_params = {}
+        if chart_name == EMISSIONS_BY_FUEL:
+            chart_params['max_points'] = st.select_slider("Point budget", options=POINT_BUDGETS,
+                                                          value=DEFAULT_MAX_POINTS)
+        elif chart_name == CARGO_IMPACT:
+            chart_params['grid_size'] = st.slider("Surface grid size", 10, 60, DEFAULT_GRID_SIZE)
+
+        # Identical charts are served from the shared PNG cache instead of re-rendering;
+        # only a miss reads the chart's columns, and they are dropped after the render
+        chart_cache = load_chart_cache()
+        def render_chart():
+            with metrics.stage('dataset_load'):
+                df = load_dataset(DATASET_FILE, columns=CHART_COLUMNS[chart_name])
+            with metrics.stage('chart_render'):
+                return render_chart_png(chart_name, df, **chart_params)
+
+        png, note = chart_cache.get_or_render(chart_key(stamp, chart_name, **chart_params), render_chart)
+        metrics.record_cache('chart', chart_cache.stats())
+        st.image(png, use_container_width=True)
+        st.caption(note)
+
+    @st.fragment
+    def history_tab():
+        from trip_store import PERIODS
+
+        st.subheader("Trip History")
+        store = load_trip_store()
+        info = store.stats()
+        if not info['trips']:
+            st.info("No trips stored yet: every Emission Scan and bulk-scored file is added here.")
+            return
+        h1, h2 = st.columns(2)
+        period = h1.radio("Period", list(PERIODS), format_func=str.title, horizontal=True)
+        split = h2.selectbox("Split by", [None] + CATEGORICAL_COLUMNS,
+                             format_func=lambda col: col.replace('_', ' ') if col else "—")
+        # Precomputed rollups: a few rows per bucket, whatever the number of trips
+        start = time.perf_counter()
+        with metrics.stage('history_rollup'):
+            table = store.rollup(period, by=[split] if split else ())
+        elapsed = time.perf_counter() - start
+
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Trips Stored", f"{table['Trips'].sum():,}")
+        col2.metric("Predicted CO₂", f"{table['CO2_kg'].sum() / 1000:,.1f} t")
+        col3.metric("Average CO₂", f"{table['CO2_kg'].sum() / table['Distance_km'].sum():.3f} kg/km")
+        if split:
+            st.bar_chart(table.pivot(index='Period', columns=split, values='CO2_kg'))
         else:
-            fig = plt.figure(figsize=(10, 6))
-            ax = fig.add_subplot(111, projection='3d')
-            
-            ax.plot_trisurf(df['Cargo_Weight_kg'], df['Avg_Speed_kmph'], df['CO2_Emission_kg'], 
-                           cmap=cm.viridis, linewidth=0.2, antialiased=True)
-            
-            ax.set_xlabel('Cargo Weight (kg)')
-            ax.set_ylabel('Average Speed (km/h)')
-            ax.set_zlabel('CO₂ Emissions (kg)')
-            ax.set_title(' Cargo Weight Impact Surface', pad=20)
-            
-            st.pyplot(fig)
+            st.bar_chart(table.set_index('Period')['CO2_kg'])
+        st.dataframe(table, hide_index=True, use_container_width=True)
+        st.caption(f"{len(table):,} rows read from the {period} rollups in {elapsed * 1000:.1f} ms; "
+                   f"{info['trips']:,} trips stored from {info['first_date']} to {info['last_date']}.")
+
+    tab1, tab2, tab3, tab4 = st.tabs(["📋 Dataset Explorer", "📈 Statistical Insights", "📊 3D Visual Analytics",
+                                      "🗓️ Trip History"])
+    
+    with tab1:
+        dataset_tab()
+    
+    with tab2:
+        # One streaming pass over the columnar store, so this works past RAM size
+        summary = load_trip_summary(stamp)
+        st.subheader("Statistical Overview")
+        st.dataframe(summary.describe(), use_container_width=True)
+        if not summary.exact:
+            st.caption("Quartiles are approximate: computed with a streaming quantile sketch.")
+        
+        st.subheader("Key Metrics")
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Total Records", summary.rows)
+        col2.metric("Average CO₂", f"{summary.moments['CO2_Emission_kg'].mean:.1f} kg")
+        col3.metric("Most Common Fuel", summary.mode('Fuel_Type'))
+
+        st.subheader("Category Frequencies")
+        freq_cols = st.columns(len(summary.categorical_columns))
+        for freq_col, name in zip(freq_cols, summary.categorical_columns):
+            freq_col.dataframe(summary.frequencies(name).rename_axis(name), use_container_width=True)
+    
+    with tab3:
+        charts_tab()
+    
+    with tab4:
+        history_tab()
+
 
 # =============================================
 # AI MODEL LAB MODULE
 # =============================================
 elif app_mode == "⚙️ AI Model Lab":
+    import numpy as np
+    import matplotlib.pyplot as plt
+    from matplotlib import cm
+
+    artifact_stamp = model_artifact_stamp()
+    predictor = load_model(artifact_stamp)
+    evaluation = load_model_evaluation(artifact_stamp)
     st.header("🧪 AI Model Laboratory")
     
     col1, col2 = st.columns(2, gap="large")
     
     with col1:
         st.subheader("Model Architecture")
-        st.markdown("""
+        training_data = (f"{predictor.training_rows:,} logistics records" if predictor.training_rows is not None
+                         else "not recorded in this model")
+        st.markdown(f"""
         <div class="card-3d">
             <h4>Random Forest Regressor</h4>
             <ul>
-                <li><strong>Ensemble Method:</strong> Bagging with 100 decision trees</li>
-                <li><strong>Training Data:</strong> 2,000 logistics records</li>
+                <li><strong>Ensemble Method:</strong> Bagging with {predictor.forest.n_trees} decision trees (max depth {predictor.forest.max_depth})</li>
+                <li><strong>Training Data:</strong> {training_data}</li>
                 <li><strong>Features:</strong> 7 operational parameters</li>
                 <li><strong>Target:</strong> CO₂ Emissions (kg)</li>
             </ul>
@@ -760,48 +1112,87 @@ elif app_mode == "⚙️ AI Model Lab":
         """, unsafe_allow_html=True)
         
         st.subheader("Performance Metrics")
-        st.markdown("""
-        <div class="card-3d">
-            <div style="display: grid; grid-template-columns: 1fr 1fr; gap: 1rem;">
-                <div style="background: linear-gradient(135deg, #00BCD4, #0097A7); padding: 1rem; border-radius: 10px; color: white;">
-                    <h4>R² Score</h4>
-                    <div style="font-size: 1.8rem; font-weight: 700;">0.92</div>
-                </div>
-                <div style="background: linear-gradient(135deg, #FF9800, #F57C00); padding: 1rem; border-radius: 10px; color: white;">
-                    <h4>Mean Error</h4>
-                    <div style="font-size: 1.8rem; font-weight: 700;">42.3 kg</div>
+
+        def performance_metrics(result):
+            st.markdown(f"""
+            <div class="card-3d">
+                <div style="display: grid; grid-template-columns: 1fr 1fr; gap: 1rem;">
+                    <div style="background: linear-gradient(135deg, #00BCD4, #0097A7); padding: 1rem; border-radius: 10px; color: white;">
+                        <h4>R² Score</h4>
+                        <div style="font-size: 1.8rem; font-weight: 700;">{result['r2']:.3f}</div>
+                    </div>
+                    <div style="background: linear-gradient(135deg, #FF9800, #F57C00); padding: 1rem; border-radius: 10px; color: white;">
+                        <h4>Mean Error</h4>
+                        <div style="font-size: 1.8rem; font-weight: 700;">{result['mae_kg']:.1f} kg</div>
+                    </div>
                 </div>
             </div>
-        </div>
-        """, unsafe_allow_html=True)
+            """, unsafe_allow_html=True)
+            timing = result['timing']
+            st.caption(f"Holdout of {result['rows']:,} trips · RMSE {result['rmse_kg']:.1f} kg · "
+                       f"single-trip p50 {timing['single_row_p50_ms']:.2f} ms / p99 {timing['single_row_p99_ms']:.2f} ms · "
+                       f"batch {timing['batch_rows_per_s']:,.0f} trips/s")
+            by_fuel = result['by_fuel']
+            st.dataframe({
+                'Fuel Type': list(by_fuel),
+                'Trips': [e['rows'] for e in by_fuel.values()],
+                'MAE (kg)': [round(e['mae_kg'], 1) for e in by_fuel.values()],
+                'RMSE (kg)': [round(e['rmse_kg'], 1) for e in by_fuel.values()],
+                'Bias (kg)': [round(e['bias_kg'], 1) for e in by_fuel.values()],
+            }, hide_index=True, use_container_width=True)
+
+        show_evaluation(evaluation, 'metrics', "⏳ Evaluating this model version on the holdout set...",
+                        performance_metrics)
     
     with col2:
         st.subheader(" Feature Importance")
         features = ['Distance', 'Fuel Type', 'Fuel Used', 'Avg Speed', 'Traffic', 'Weather', 'Cargo Weight']
-        importance = model.feature_importances_
+        importance = predictor.feature_importances
         
-        fig = plt.figure(figsize=(8, 6))
-        ax = fig.add_subplot(111, projection='3d')
+        with metrics.stage('matplotlib'):
+            fig = plt.figure(figsize=(8, 6))
+            ax = fig.add_subplot(111, projection='3d')
         
-        ypos = np.arange(len(features))
-        xpos = np.zeros_like(ypos)
-        zpos = np.zeros_like(ypos)
+            ypos = np.arange(len(features))
+            xpos = np.zeros_like(ypos)
+            zpos = np.zeros_like(ypos)
         
-        dx = np.ones_like(zpos) * 0.8
-        dy = np.ones_like(zpos) * 0.8
-        dz = importance * 100
+            dx = np.ones_like(zpos) * 0.8
+            dy = np.ones_like(zpos) * 0.8
+            dz = importance * 100
         
-        colors = cm.viridis(dz / max(dz))
+            colors = cm.viridis(dz / max(dz))
         
-        ax.bar3d(xpos, ypos, zpos, dx, dy, dz, color=colors, shade=True)
+            ax.bar3d(xpos, ypos, zpos, dx, dy, dz, color=colors, shade=True)
         
-        ax.set_yticks(ypos + 0.4)
-        ax.set_yticklabels(features)
-        ax.set_xlabel('')
-        ax.set_zlabel('Importance (%)')
-        ax.set_title(' Feature Importance', pad=20)
+            ax.set_yticks(ypos + 0.4)
+            ax.set_yticklabels(features)
+            ax.set_xlabel('')
+            ax.set_zlabel('Importance (%)')
+            ax.set_title(' Feature Importance', pad=20)
         
-        st.pyplot(fig)
+            st.pyplot(fig)
+
+        st.subheader(" Permutation Importance (holdout)")
+
+        def permutation_chart(result):
+            ranked = sorted(zip(features, result['features'].values()), key=lambda item: item[1]['mean_kg'])
+            means = np.array([e['mean_kg'] for _, e in ranked])
+            errors = np.array([[m - e['ci_low_kg'] for m, (_, e) in zip(means, ranked)],
+                               [e['ci_high_kg'] - m for m, (_, e) in zip(means, ranked)]])
+            with metrics.stage('matplotlib'):
+                fig, ax = plt.subplots(figsize=(8, 4))
+                ax.barh([name for name, _ in ranked], means, xerr=errors, capsize=4,
+                        color=cm.viridis(np.clip(means / max(means.max(), 1e-9), 0, 1)))
+                ax.set_xlabel('Holdout MAE increase when shuffled (kg CO₂)')
+                ax.axvline(0, color='#666', linewidth=0.8)
+                st.pyplot(fig)
+            st.caption(f"Mean of {result['repeats']} shuffles of {result['rows']:,} holdout trips with 95% "
+                       f"intervals; baseline MAE {result['baseline_mae_kg']:.1f} kg. Unlike impurity importance, "
+                       "this is not inflated for continuous features.")
+
+        show_evaluation(evaluation, 'permutation_importance', "⏳ Computing permutation importance...",
+                        permutation_chart)
         
         st.subheader("Model Training")
         st.markdown("""
@@ -828,4 +1219,18 @@ st.markdown("""
         Unauthorized copying, distribution, or use of any part of this platform is strictly prohibited without explicit permission.
     </p>
 </div>
-""", unsafe_allow_html=True)
\ No newline at end of file
+""", unsafe_allow_html=True)
+# =============================================
+# DEBUG METRICS PANEL (ECOVISION_METRICS=1)
+# =============================================
+rerun_stages = metrics.finish_rerun(app_mode)
+if rerun_stages:
+    with st.sidebar.expander("🛠️ Debug Metrics", expanded=False):
+        st.markdown("**Last rerun**")
+        st.table({'stage': [name for name, _ in rerun_stages],
+                  'ms': [f"{seconds * 1000:.1f}" for _, seconds in rerun_stages]})
+        count, mean = metrics.REGISTRY.summary('prediction_seconds')
+        if count:
+            st.caption(f"Predictions: {count} (mean {mean * 1000:.2f} ms)")
+        count, mean = metrics.REGISTRY.summary('page_rerun_seconds', (('page', app_mode),))
+        st.caption(f"Reruns of this page: {count} (mean {mean * 1000:.0f} ms)")
@@ -0,0 +1,196 @@
+"""Data Explorer 3D charts rendered to PNG, with a size-bounded render cache.
+
+Charts are drawn on standalone ``matplotlib.figure.Figure`` objects (no pyplot
+state), so renders from concurrent sessions do not interfere.
+"""
+import io
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+from matplotlib import cm
+from matplotlib.figure import Figure
+
+CHART_CACHE_BYTES = 64 * 1024 * 1024  # encoded PNG bytes kept across sessions
+FIGSIZE = (10, 6)
+DPI = 200  # same resolution st.pyplot uses
+POINT_BUDGETS = [1_000, 2_000, 5_000, 10_000, 20_000]
+DEFAULT_MAX_POINTS = 5_000  # scatter markers drawn at most
+DEFAULT_GRID_SIZE = 30  # cells per axis for the cargo impact surface
+SAMPLE_SEED = 42
+
+EMISSIONS_BY_FUEL = 'Emissions by Fuel Type'
+DISTANCE_VS_EMISSIONS = 'Distance vs Emissions'
+CARGO_IMPACT = 'Cargo Impact'
+CHART_TYPES = [EMISSIONS_BY_FUEL, DISTANCE_VS_EMISSIONS, CARGO_IMPACT]
+# Dataset columns each chart reads, so a render loads only those
+CHART_COLUMNS = {
+    EMISSIONS_BY_FUEL: ['Fuel_Type', 'Distance_km', 'Cargo_Weight_kg', 'CO2_Emission_kg'],
+    DISTANCE_VS_EMISSIONS: ['Distance_km', 'CO2_Emission_kg'],
+    CARGO_IMPACT: ['Cargo_Weight_kg', 'Avg_Speed_kmph', 'CO2_Emission_kg'],
+}
+
+
+# =============================================
+# LEVEL OF DETAIL
+# =============================================
+def stratified_sample(df, column, max_points, seed=SAMPLE_SEED):
+    """Row positions of at most max_points rows, sampled per category of column.
+
+    Each category gets a share proportional to its size, with a floor so that
+    rare categories stay visible.
+    """
+    if len(df) <= max_points:
+        return np.arange(len(df))
+    codes, _ = pd.factorize(df[column])
+    counts = np.bincount(codes[codes >= 0])
+    floor = max_points // (4 * len(counts))
+    alloc = np.minimum(counts, np.maximum(max_points * counts // counts.sum(), floor))
+    rng = np.random.default_rng(seed)
+    picks = [rng.choice(np.flatnonzero(codes == code), size=n, replace=False)
+             for code, n in enumerate(alloc) if n]
+    return np.sort(np.concatenate(picks))
+
+
+def grid_aggregate(x, y, bins, weights=None):
+    """Bin (x, y) onto a uniform bins x bins grid in one pass.
+
+    Returns (counts, weight sums or None, x edges, y edges); the last bin on
+    each axis includes its right edge, as in np.histogram2d.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    edges = []
+    cells = []
+    for values in (x, y):
+        lo, hi = values.min(), values.max()
+        if hi == lo:
+            hi = lo + 1.0
+        edges.append(np.linspace(lo, hi, bins + 1))
+        cells.append(np.minimum(((values - lo) * (bins / (hi - lo))).astype(np.int64), bins - 1))
+    flat = cells[0] * bins + cells[1]
+    counts = np.bincount(flat, minlength=bins * bins).reshape(bins, bins)
+    sums = None
+    if weights is not None:
+        sums = np.bincount(flat, weights=np.asarray(weights, dtype=np.float64),
+                           minlength=bins * bins).reshape(bins, bins)
+    return counts, sums, edges[0], edges[1]
+
+
+# =============================================
+# CHART RENDERERS
+# =============================================
+def _emissions_by_fuel(ax, df, max_points=DEFAULT_MAX_POINTS, **_):
+    rows = stratified_sample(df, 'Fuel_Type', max_points)
+    sample = df.iloc[rows]
+    for fuel in sample['Fuel_Type'].unique():
+        subset = sample[sample['Fuel_Type'] == fuel]
+        ax.scatter(subset['Distance_km'], subset['Cargo_Weight_kg'], subset['CO2_Emission_kg'],
+                   label=fuel, s=50, alpha=0.7)
+
+    ax.set_xlabel('Distance (km)')
+    ax.set_ylabel('Cargo Weight (kg)')
+    ax.set_zlabel('CO₂ Emissions (kg)')
+    ax.set_title(' Emissions by Fuel Type', pad=20)
+    ax.legend()
+    return f"Drew {len(rows):,} of {len(df):,} trips (stratified by fuel type)."
+
+
+def _distance_vs_emissions(ax, df, **_):
+    hist, _, xedges, yedges = grid_aggregate(df['Distance_km'], df['CO2_Emission_kg'], bins=20)
+
+    xpos, ypos = np.meshgrid(xedges[:-1], yedges[:-1])
+    xpos = xpos.flatten()
+    ypos = ypos.flatten()
+    zpos = np.zeros_like(xpos)
+
+    dx = dy = 0.8 * np.ones_like(zpos)
+    dz = hist.flatten()
+
+    ax.bar3d(xpos, ypos, zpos, dx, dy, dz, color='#4CAF50', zsort='average')
+
+    ax.set_xlabel('Distance (km)')
+    ax.set_ylabel('CO₂ Emissions (kg)')
+    ax.set_zlabel('Frequency')
+    ax.set_title(' Distance vs Emissions Distribution', pad=20)
+    return f"Drew {len(dz)} bars binning {len(df):,} trips."
+
+
+def _cargo_impact(ax, df, grid_size=DEFAULT_GRID_SIZE, **_):
+    # Mean emissions per (cargo, speed) cell instead of triangulating every trip
+    counts, sums, xedges, yedges = grid_aggregate(df['Cargo_Weight_kg'], df['Avg_Speed_kmph'], grid_size,
+                                                  weights=df['CO2_Emission_kg'])
+    filled = counts > 0
+    xcentres = (xedges[:-1] + xedges[1:]) / 2
+    ycentres = (yedges[:-1] + yedges[1:]) / 2
+    xgrid, ygrid = np.meshgrid(xcentres, ycentres, indexing='ij')
+    ax.plot_trisurf(xgrid[filled], ygrid[filled], sums[filled] / counts[filled],
+                    cmap=cm.viridis, linewidth=0.2, antialiased=True)
+
+    ax.set_xlabel('Cargo Weight (kg)')
+    ax.set_ylabel('Average Speed (km/h)')
+    ax.set_zlabel('CO₂ Emissions (kg)')
+    ax.set_title(' Cargo Weight Impact Surface', pad=20)
+    return f"Drew a {grid_size}x{grid_size} surface ({filled.sum()} filled cells) averaging {len(df):,} trips."
+
+
+RENDERERS = {
+    EMISSIONS_BY_FUEL: _emissions_by_fuel,
+    DISTANCE_VS_EMISSIONS: _distance_vs_emissions,
+    CARGO_IMPACT: _cargo_impact,
+}
+
+
+def render_chart_png(chart_type, df, figsize=FIGSIZE, dpi=DPI, **params):
+    """Draw one Data Explorer chart; returns (PNG bytes, note on what was drawn)"""
+    fig = Figure(figsize=figsize)
+    ax = fig.add_subplot(111, projection='3d')
+    note = RENDERERS[chart_type](ax, df, **params)
+    buf = io.BytesIO()
+    fig.savefig(buf, format='png', dpi=dpi, bbox_inches='tight')
+    return buf.getvalue(), note
+
+
+# =============================================
+# RENDER CACHE
+# =============================================
+class ChartCache:
+    """Thread-safe LRU of rendered (PNG, note) pairs, evicted by total PNG size"""
+
+    def __init__(self, max_bytes=CHART_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_render(self, key, render):
+        """Return the cached (png, note) for key, calling render() on a miss"""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+        chart = render()
+        size = len(chart[0])
+        with self._lock:
+            if key not in self._entries and size <= self.max_bytes:
+                self._entries[key] = chart
+                self.bytes += size
+                while self.bytes > self.max_bytes:
+                    _, (evicted, _) = self._entries.popitem(last=False)
+                    self.bytes -= len(evicted)
+        return chart
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses,
+                    'entries': len(self._entries), 'bytes': self.bytes, 'max_bytes': self.max_bytes}
+
+
+def chart_key(dataset_stamp, chart_type, figsize=FIGSIZE, dpi=DPI, **params):
+    """Cache key for one chart of one dataset version"""
+    return (dataset_stamp, chart_type, tuple(figsize), dpi, tuple(sorted(params.items())))
@@ -0,0 +1,226 @@
+"""Smaller variants of the emission forest, with an accuracy-versus-cost table.
+
+A variant is a comma-separated list of steps applied to the live forest:
+
+    trees=N      keep the first N trees
+    depth=D      cut every tree at depth D (internal nodes already hold the
+                 mean of their subtree, so they become leaves as they are)
+    prune=F      repeatedly merge sibling leaves whose values differ by at
+                 most F x the holdout target's standard deviation
+    f32          store thresholds and values as float32; thresholds are
+                 rounded down so float32 inputs take the same branches
+
+    python compress_model.py                                   # default variants
+    python compress_model.py --variant trees=25,depth=8,f32 --out-dir model_variants
+
+Each variant is written as a bundle; copy the chosen one over
+co2_emission_model.bundle to ship it.
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from emission_model import BUNDLE_FILE, MODEL_DIR, load_predictor
+from forest_engine import CompiledForest
+from model_bundle import write_bundle
+
+VARIANTS_DIR = 'model_variants'
+DEFAULT_VARIANTS = [
+    'base', 'f32', 'trees=25', 'trees=10', 'depth=8', 'depth=6', 'prune=0.01', 'prune=0.05',
+    'trees=25,depth=8,f32', 'trees=25,prune=0.01,f32',
+]
+SINGLE_ROW_CALLS = 300
+BATCH_ROWS = 10_000
+
+
+# =============================================
+# FOREST TRANSFORMS
+# =============================================
+def node_depths(forest):
+    """Depth of every node reachable from a root; -1 for unreachable nodes"""
+    depth = np.full(forest.node_count, -1, dtype=np.int32)
+    frontier = forest.roots
+    for d in range(forest.max_depth + 1):
+        depth[frontier] = d
+        internal = frontier[forest.children[frontier, 0] != frontier]
+        frontier = forest.children[internal].ravel()
+    return depth
+
+
+def _make_leaves(forest, nodes):
+    forest.feature[nodes] = 0
+    forest.threshold[nodes] = np.inf
+    forest.children[nodes] = nodes[:, None]
+
+
+def compact(forest):
+    """Drop unreachable nodes, keeping each tree's nodes contiguous and in order"""
+    depth = node_depths(forest)
+    keep = depth >= 0
+    new_index = np.cumsum(keep) - 1
+    return CompiledForest(
+        forest.feature[keep], forest.threshold[keep], new_index[forest.children[keep]],
+        forest.value[keep], new_index[forest.roots], depth.max(), forest.feature_names,
+    )
+
+
+def _copy(forest):
+    return CompiledForest(forest.feature.copy(), forest.threshold.copy(), forest.children.copy(),
+                          forest.value.copy(), forest.roots, forest.max_depth, forest.feature_names)
+
+
+def limit_trees(forest, n_trees):
+    return forest.select_trees(range(min(n_trees, forest.n_trees)))
+
+
+def limit_depth(forest, max_depth):
+    forest = _copy(forest)
+    depth = node_depths(forest)
+    cut = np.flatnonzero((depth == max_depth) & (forest.children[:, 0] != np.arange(forest.node_count)))
+    _make_leaves(forest, cut)
+    return compact(forest)
+
+
+def prune_leaves(forest, tolerance):
+    """Collapse sibling leaves whose values differ by at most tolerance"""
+    forest = _copy(forest)
+    nodes = np.arange(forest.node_count)
+    while True:
+        is_leaf = forest.children[:, 0] == nodes
+        left, right = forest.children[:, 0], forest.children[:, 1]
+        mergeable = (~is_leaf & is_leaf[left] & is_leaf[right]
+                     & (np.abs(forest.value[left] - forest.value[right]) <= tolerance))
+        if not mergeable.any():
+            return compact(forest)
+        _make_leaves(forest, np.flatnonzero(mergeable))
+
+
+def to_float32(forest):
+    threshold = forest.threshold.astype(np.float32)
+    # Round toward -inf so (float32 x > threshold) matches the float64 comparison exactly
+    above = threshold.astype(np.float64) > forest.threshold
+    threshold[above] = np.nextafter(threshold[above], np.float32(-np.inf))
+    return CompiledForest(forest.feature, threshold, forest.children, forest.value.astype(np.float32),
+                          forest.roots, forest.max_depth, forest.feature_names)
+
+
+def apply_variant(forest, spec, target_std):
+    """Apply the steps of a variant spec such as 'trees=25,depth=8,f32'"""
+    for step in spec.split(','):
+        name, _, arg = step.partition('=')
+        if name == 'base':
+            continue
+        elif name == 'trees':
+            forest = limit_trees(forest, int(arg))
+        elif name == 'depth':
+            forest = limit_depth(forest, int(arg))
+        elif name == 'prune':
+            forest = prune_leaves(forest, float(arg) * target_std)
+        elif name == 'f32':
+            forest = to_float32(forest)
+        else:
+            raise ValueError(f"Unknown variant step {step!r}")
+    return forest
+
+
+# =============================================
+# REPORT
+# =============================================
+def forest_bytes(forest):
+    """Bytes of node arrays a loaded forest keeps resident"""
+    return sum(a.nbytes for a in (forest.feature, forest.threshold, forest.children, forest.value, forest.roots))
+
+
+def measure(forest, X, y, reference):
+    """Holdout error, latency and memory of one forest"""
+    predictions = forest.predict(X)
+    one_row = X[:1]
+    forest.predict(one_row)
+    calls = []
+    for _ in range(SINGLE_ROW_CALLS):
+        start = time.perf_counter()
+        forest.predict(one_row)
+        calls.append(time.perf_counter() - start)
+    batch = np.resize(X, (BATCH_ROWS, X.shape[1]))
+    batch_best = float('inf')
+    for _ in range(3):
+        start = time.perf_counter()
+        forest.predict(batch)
+        batch_best = min(batch_best, time.perf_counter() - start)
+    return {
+        'trees': forest.n_trees,
+        'nodes': forest.node_count,
+        'max_depth': forest.max_depth,
+        'mae_kg': float(np.abs(predictions - y).mean()),
+        'rmse_kg': float(np.sqrt(((predictions - y) ** 2).mean())),
+        'max_drift_kg': float(np.abs(predictions - reference).max()),
+        'p50_ms': float(np.percentile(calls, 50) * 1000),
+        'p99_ms': float(np.percentile(calls, 99) * 1000),
+        'batch_ms': batch_best * 1000,
+        'memory_bytes': forest_bytes(forest),
+    }
+
+
+def holdout_set(predictor, holdout_csv=None, model_dir=MODEL_DIR):
+    """Encoded holdout features and targets (the same holdout the Model Lab evaluates on)"""
+    from model_evaluation import holdout_trips
+
+    trips, _ = holdout_trips(holdout_csv, model_dir)
+    X = predictor.forest._as_array(predictor.encode(trips))
+    return X, trips['CO2_Emission_kg'].to_numpy(dtype=np.float64)
+
+
+def compress(variants=DEFAULT_VARIANTS, model_dir=MODEL_DIR, out_dir=None, holdout_csv=None):
+    """Build, write and measure each variant; returns {spec: results}"""
+    from model_bundle import read_header
+
+    predictor = load_predictor(model_dir)
+    X, y = holdout_set(predictor, holdout_csv, model_dir)
+    reference = predictor.forest.predict(X)
+    out_dir = out_dir or os.path.join(model_dir, VARIANTS_DIR)
+    os.makedirs(out_dir, exist_ok=True)
+    bundle = os.path.join(model_dir, BUNDLE_FILE)
+    metadata = read_header(bundle)[0]['metadata'] if os.path.exists(bundle) else {}
+    metadata.setdefault('feature_importances', predictor.feature_importances.tolist())
+    metadata.setdefault('training_rows', predictor.training_rows)
+
+    results = {}
+    for spec in variants:
+        forest = apply_variant(predictor.forest, spec, y.std())
+        path = os.path.join(out_dir, f"co2_emission_model-{spec.replace(',', '_').replace('=', '')}.bundle")
+        write_bundle(path, forest, predictor.vocabularies(),
+                     dict(metadata, variant=spec, n_estimators=forest.n_trees))
+        results[spec] = dict(measure(forest, X, y, reference), bundle_bytes=os.path.getsize(path), path=path)
+    return results
+
+
+def print_report(results):
+    print(f"{'variant':<26} {'trees':>5} {'nodes':>8} {'MAE kg':>8} {'RMSE kg':>8} {'drift kg':>9} "
+          f"{'p50 ms':>7} {'p99 ms':>7} {'10k ms':>7} {'bundle MB':>9} {'memory MB':>9}")
+    for spec, r in results.items():
+        print(f"{spec:<26} {r['trees']:>5} {r['nodes']:>8,} {r['mae_kg']:>8.1f} {r['rmse_kg']:>8.1f} "
+              f"{r['max_drift_kg']:>9.1f} {r['p50_ms']:>7.3f} {r['p99_ms']:>7.3f} {r['batch_ms']:>7.1f} "
+              f"{r['bundle_bytes'] / 1e6:>9.2f} {r['memory_bytes'] / 1e6:>9.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build and compare compressed model variants")
+    parser.add_argument('--variant', action='append', help="variant spec; repeat for several (default: a standard set)")
+    parser.add_argument('--model-dir', default=MODEL_DIR)
+    parser.add_argument('--out-dir', default=None, help=f"where variant bundles go (default <model-dir>/{VARIANTS_DIR})")
+    parser.add_argument('--holdout', default=None,
+                        help="CSV of trips with CO2_Emission_kg (default: holdout_trips.csv, else synthetic)")
+    parser.add_argument('--json', default=None, help="also write the results to this JSON file")
+    args = parser.parse_args(argv)
+    results = compress(args.variant or DEFAULT_VARIANTS, args.model_dir, args.out_dir, args.holdout)
+    print_report(results)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
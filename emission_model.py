@@ -0,0 +1,344 @@
+import os
+
+import numpy as np
+
+from forest_engine import CompiledForest, NativeForest
+from model_bundle import read_bundle
+
+# Constants
+AVG_CO2_PER_KM = 0.15  # kg CO2 per km per kg cargo (industry average)
+TREE_ABSORPTION_PER_YEAR = 21.77  # kg CO2 per tree per year (average)
+FEATURE_COLUMNS = ['Distance_km', 'Fuel_Type', 'Fuel_Consumed_Liters', 'Avg_Speed_kmph',
+                   'Traffic_Level', 'Weather_Condition', 'Cargo_Weight_kg']
+CATEGORICAL_COLUMNS = ['Fuel_Type', 'Traffic_Level', 'Weather_Condition']
+MODEL_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_FILES = ['co2_emission_model.pkl', 'label_encoder_fuel.pkl',
+               'label_encoder_traffic.pkl', 'label_encoder_weather.pkl']
+BUNDLE_FILE = 'co2_emission_model.bundle'  # see model_bundle.py
+MANIFEST_FILE = 'model_manifest.json'  # written by train_model.py
+BULK_CHUNK_ROWS = 50_000  # trips encoded and predicted per batch in bulk mode
+COMPILED_MAX_ROWS = 1_000  # above this, sklearn's Cython tree walk is faster (see NativeForest)
+UNKNOWN_POLICIES = ('error', 'reject', 'fallback', 'flag')  # handling of unseen categories, see TripEncoder
+BULK_UNKNOWN_POLICY = 'flag'  # bulk scoring keeps rows with unseen categories, unscored
+INTERVAL_QUANTILES = (0.05, 0.95)  # spread of the per-tree predictions reported around each estimate
+EMPTY_LABEL = '(empty)'  # how empty categories are counted in the encoding report
+FALLBACK_CATEGORIES = {'Fuel_Type': 'Diesel', 'Traffic_Level': 'Medium', 'Weather_Condition': 'Clear'}
+
+
+def calculate_trees_needed(co2_kg, years=5):
+    """Calculate how many trees needed to offset CO2 over given years"""
+    return co2_kg / (TREE_ABSORPTION_PER_YEAR * years)
+
+
+def industry_average_emission(distance_km, cargo_weight_kg):
+    """Industry-average CO2 (kg) for a trip of the given distance and cargo"""
+    return distance_km * cargo_weight_kg * AVG_CO2_PER_KM / 1000
+
+
+def model_artifact_stamp(model_dir=MODEL_DIR):
+    """Identify the current model artifacts by path, mtime and size"""
+    stamp = []
+    names = [BUNDLE_FILE] if os.path.exists(os.path.join(model_dir, BUNDLE_FILE)) else MODEL_FILES
+    for name in names:
+        info = os.stat(os.path.join(model_dir, name))
+        stamp.append((name, info.st_mtime_ns, info.st_size))
+    return tuple(stamp)
+
+
+class LabelVocabulary:
+    """LabelEncoder-compatible transform over a fixed, sorted class list"""
+
+    def __init__(self, classes):
+        self.classes_ = np.asarray(sorted(classes), dtype=object)
+
+    def transform(self, values):
+        values = np.asarray(values, dtype=object)
+        codes = np.searchsorted(self.classes_, values)
+        codes = np.minimum(codes, len(self.classes_) - 1)
+        unknown = self.classes_[codes] != values
+        if unknown.any():
+            raise ValueError(f"y contains previously unseen labels: {sorted(set(values[unknown]))}")
+        return codes
+
+
+class UnknownCategoryError(ValueError):
+    """Trips contain categories the model was not trained on"""
+
+
+class TripEncoder:
+    """Maps raw trips to the model's feature matrix in one pass.
+
+    The three vocabularies share one lookup index, so every categorical value
+    in a batch is resolved by a single hash lookup; columns of category dtype
+    are resolved per category instead of per row. Unseen categories follow
+    ``unknown``:
+
+        error     raise UnknownCategoryError
+        reject    drop the row
+        fallback  use the column's FALLBACK_CATEGORIES class
+        flag      keep the row (encoded with the fallback) and mark it unknown
+
+    An empty category counts as unseen. Rows with an empty number cannot be
+    scored at all: 'error' raises ValueError, 'reject' drops them and
+    'fallback' and 'flag' keep them with NaN features.
+    """
+
+    def __init__(self, vocabularies, unknown='error', fallback=None):
+        import pandas as pd
+
+        _check_policy(unknown)
+        self.unknown = unknown
+        self.vocabularies = {col: sorted(vocabularies[col]) for col in CATEGORICAL_COLUMNS}
+        fallback = dict(FALLBACK_CATEGORIES, **(fallback or {}))
+        labels = sorted({label for classes in self.vocabularies.values() for label in classes})
+        self._index = pd.Index(labels, dtype=object)
+        # Row c maps a position in the shared index to column c's code; the extra last slot catches misses
+        self._lookup = np.full((len(CATEGORICAL_COLUMNS), len(labels) + 1), -1, dtype=np.int64)
+        for c, col in enumerate(CATEGORICAL_COLUMNS):
+            classes = self.vocabularies[col]
+            self._lookup[c, self._index.get_indexer(classes)] = np.arange(len(classes))
+        self._fallback = np.array([self.vocabularies[col].index(fallback[col]) if fallback[col] in self.vocabularies[col]
+                                   else 0 for col in CATEGORICAL_COLUMNS])
+        self._numeric = [i for i, col in enumerate(FEATURE_COLUMNS) if col not in CATEGORICAL_COLUMNS]
+        self._categorical = [FEATURE_COLUMNS.index(col) for col in CATEGORICAL_COLUMNS]
+
+    def encode(self, trips, unknown=None):
+        """Return (features, unscored_rows, report) for a frame of raw trips.
+
+        features is FEATURE_COLUMNS as float64 on the trips' index (rejected
+        rows dropped). unscored_rows marks the input rows the policy drops
+        ('reject') or leaves unscored ('flag', and rows with empty numbers
+        under 'fallback'). report counts rows with unseen or empty categories
+        per column and label ('unknown'), rows with empty numbers per column
+        ('empty') and the unscored rows.
+        """
+        import pandas as pd
+
+        unknown = unknown or self.unknown
+        _check_policy(unknown)
+        missing = [col for col in FEATURE_COLUMNS if col not in trips.columns]
+        if missing:
+            raise ValueError(f"Trips are missing columns: {', '.join(missing)}")
+        X = np.empty((len(trips), len(FEATURE_COLUMNS)))
+        for i in self._numeric:
+            X[:, i] = trips[FEATURE_COLUMNS[i]].to_numpy(dtype=np.float64)
+        empty = np.isnan(X[:, self._numeric])
+        empty_rows = empty.any(axis=1)
+        if unknown == 'error' and empty_rows.any():
+            raise ValueError("Trips have empty feature values")
+
+        labels, takes = [], []
+        for col in CATEGORICAL_COLUMNS:
+            values = trips[col]
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                labels.append(values.cat.categories.to_numpy(dtype=object))
+                takes.append(values.cat.codes.to_numpy())
+            else:
+                labels.append(values.to_numpy(dtype=object))
+                takes.append(None)
+        found = self._index.get_indexer(np.concatenate(labels))
+        codes = np.empty((len(trips), len(CATEGORICAL_COLUMNS)), dtype=np.int64)
+        start = 0
+        for c, (column_labels, take) in enumerate(zip(labels, takes)):
+            column_codes = self._lookup[c, found[start:start + len(column_labels)]]
+            start += len(column_labels)
+            codes[:, c] = column_codes if take is None else np.append(column_codes, -1)[take]
+
+        unseen = codes < 0
+        unknown_rows = unseen.any(axis=1)
+        report = {'rows': len(trips), 'unknown_rows': int(unknown_rows.sum()), 'empty_rows': int(empty_rows.sum()),
+                  'policy': unknown, 'unknown': {}, 'empty': {}}
+        if report['unknown_rows']:
+            for c, col in enumerate(CATEGORICAL_COLUMNS):
+                if not unseen[:, c].any():
+                    continue
+                values = pd.Series(trips[col].to_numpy(dtype=object)[unseen[:, c]])
+                if unknown == 'error' and values.isna().any():
+                    raise ValueError("Trips have empty feature values")
+                report['unknown'][col] = {str(k): int(v) for k, v in values.fillna(EMPTY_LABEL).value_counts().items()}
+            if unknown == 'error':
+                raise UnknownCategoryError("Unknown categories: " + "; ".join(
+                    f"{col}: {', '.join(counts)}" for col, counts in report['unknown'].items()))
+            codes = np.where(unseen, self._fallback, codes)
+        for j, i in enumerate(self._numeric):
+            if empty[:, j].any():
+                report['empty'][FEATURE_COLUMNS[i]] = int(empty[:, j].sum())
+        X[:, self._categorical] = codes
+        unscored_rows = empty_rows if unknown == 'fallback' else unknown_rows | empty_rows
+        report['unscored_rows'] = int(unscored_rows.sum())
+        features = pd.DataFrame(X, columns=FEATURE_COLUMNS, index=trips.index)
+        if unknown == 'reject' and report['unscored_rows']:
+            features = features[~unscored_rows]
+        return features, unscored_rows, report
+
+
+def _check_policy(unknown):
+    if unknown not in UNKNOWN_POLICIES:
+        raise ValueError(f"Unknown-category policy must be one of {', '.join(UNKNOWN_POLICIES)}, not {unknown!r}")
+
+
+# =============================================
+# PREDICTOR
+# =============================================
+class EmissionPredictor:
+    """The compiled forest and its label encoders, with no UI attached.
+
+    ``model`` is the original sklearn forest when loaded from the pickles and
+    None when loaded from a bundle.
+    """
+
+    def __init__(self, forest, le_fuel, le_traffic, le_weather, model=None, feature_importances=None,
+                 training_rows=None):
+        self.forest = forest
+        self.le_fuel = le_fuel
+        self.le_traffic = le_traffic
+        self.le_weather = le_weather
+        self.model = model
+        self._feature_importances = feature_importances
+        self._training_rows = training_rows
+        self._native = None
+        self.encoder = TripEncoder(self.vocabularies())
+
+    @property
+    def feature_importances(self):
+        """Impurity-based importances in FEATURE_COLUMNS order"""
+        if self.model is not None:
+            return self.model.feature_importances_
+        return np.asarray(self._feature_importances)
+
+    @property
+    def training_rows(self):
+        """Trips the forest was fitted on, or None if the bundle does not record it"""
+        if self.model is not None:
+            # Bootstrap weights at a tree's root sum to the rows it drew (all of them unless max_samples)
+            return int(self.model.estimators_[0].tree_.weighted_n_node_samples[0])
+        return self._training_rows
+
+    def vocabularies(self):
+        """Class lists for each categorical column"""
+        return {
+            'Fuel_Type': list(self.le_fuel.classes_),
+            'Traffic_Level': list(self.le_traffic.classes_),
+            'Weather_Condition': list(self.le_weather.classes_),
+        }
+
+    def encode(self, trips, unknown='error'):
+        """Return the model feature frame with categorical columns label-encoded"""
+        return self.encoder.encode(trips, unknown)[0]
+
+    @property
+    def native(self):
+        """The forest on sklearn's tree walk, built on first use (also from a bundle)"""
+        if self._native is None:
+            self._native = (NativeForest.from_sklearn(self.model) if self.model is not None
+                            else NativeForest.from_compiled(self.forest))
+        return self._native
+
+    def predict_encoded(self, features):
+        """Predict CO2 (kg) for already-encoded features"""
+        if len(features) <= COMPILED_MAX_ROWS:
+            return self.forest.predict(features)
+        return self.native.predict(features)
+
+    def _predict_interval(self, features, quantiles):
+        # Same split as predict_encoded: sklearn's tree walk wins on large batches
+        if len(features) <= COMPILED_MAX_ROWS:
+            return self.forest.predict_interval(features, quantiles)
+        return self.native.predict_interval(features, quantiles)
+
+    def predict_interval_encoded(self, features, quantiles=INTERVAL_QUANTILES):
+        """Mean and per-tree quantiles of CO2 (kg) for encoded features, as (n_rows, 1 + len(quantiles))"""
+        mean, _, bounds = self._predict_interval(features, quantiles)
+        return np.column_stack([mean, bounds])
+
+    def predict(self, trips, unknown='error'):
+        """Predict CO2 (kg) for a frame of raw trips (NaN for unscored rows; rejected rows left out)"""
+        features, unscored_rows, _ = self.encoder.encode(trips, unknown)
+        predicted = self.predict_encoded(features)
+        if unknown != 'reject' and unscored_rows.any():
+            predicted = np.where(unscored_rows, np.nan, predicted)
+        return predicted
+
+    def predict_trip(self, distance_km, fuel_type, fuel_consumed_liters, avg_speed_kmph,
+                     traffic_level, weather_condition, cargo_weight_kg):
+        """Predict CO2 (kg) for a single trip"""
+        import pandas as pd
+
+        trip = pd.DataFrame([{
+            'Distance_km': distance_km,
+            'Fuel_Type': fuel_type,
+            'Fuel_Consumed_Liters': fuel_consumed_liters,
+            'Avg_Speed_kmph': avg_speed_kmph,
+            'Traffic_Level': traffic_level,
+            'Weather_Condition': weather_condition,
+            'Cargo_Weight_kg': cargo_weight_kg,
+        }])
+        return float(self.predict(trip)[0])
+
+    def score(self, trips, unknown=BULK_UNKNOWN_POLICY, intervals=True):
+        """Return trips with predicted and industry-average CO2 columns added.
+
+        With ``intervals`` the spread of the per-tree predictions is added too
+        (Predicted_CO2_Std_kg and one Predicted_CO2_Pnn_kg per INTERVAL_QUANTILES
+        entry), from the same tree walk as the estimate. Rows with unseen or
+        empty categories or empty numbers follow ``unknown`` (see TripEncoder);
+        with 'flag' they get empty predictions and Unknown_Category=True. The
+        encoder's report for the batch is left in ``scored.attrs['encoding']``.
+        """
+        features, unscored_rows, report = self.encoder.encode(trips, unknown)
+        columns = {}
+        if intervals:
+            predicted, std, bounds = self._predict_interval(features, INTERVAL_QUANTILES)
+            columns['Predicted_CO2_Std_kg'] = std
+            for q, bound in zip(INTERVAL_QUANTILES, bounds.T):
+                columns[f"Predicted_CO2_P{q * 100:02.0f}_kg"] = bound
+        else:
+            predicted = np.asarray(self.predict_encoded(features), dtype=np.float64)
+        trips = (trips[~unscored_rows] if unknown == 'reject' else trips).copy()
+        if unknown == 'flag':
+            trips['Unknown_Category'] = unscored_rows
+        if unknown != 'reject':
+            predicted[unscored_rows] = np.nan
+            for values in columns.values():
+                values[unscored_rows] = np.nan
+        trips['Predicted_CO2_kg'] = predicted
+        for name, values in columns.items():
+            trips[name] = values
+        trips['Industry_Avg_CO2_kg'] = industry_average_emission(trips['Distance_km'], trips['Cargo_Weight_kg'])
+        trips.attrs['encoding'] = report
+        return trips
+
+    def score_chunks(self, trip_file, chunk_rows=BULK_CHUNK_ROWS, unknown=BULK_UNKNOWN_POLICY):
+        """Read a trip CSV in chunks and yield each chunk scored"""
+        import pandas as pd
+
+        # Reading categoricals as category dtype lets the encoder map each label once per chunk
+        dtype = {col: 'category' for col in CATEGORICAL_COLUMNS}
+        for chunk in pd.read_csv(trip_file, chunksize=chunk_rows, dtype=dtype):
+            yield self.score(chunk, unknown)
+
+
+def load_pickled_predictor(model_dir=MODEL_DIR):
+    """Load the pickled sklearn model and encoders from model_dir"""
+    # Deferred so bundle-only processes never import joblib or sklearn
+    import joblib
+
+    model, le_fuel, le_traffic, le_weather = (joblib.load(os.path.join(model_dir, name)) for name in MODEL_FILES)
+    # Flatten the trees once so small batches skip sklearn's per-call overhead
+    return EmissionPredictor(CompiledForest.from_sklearn(model), le_fuel, le_traffic, le_weather, model=model)
+
+
+def load_predictor(model_dir=MODEL_DIR):
+    """Load the model bundle from model_dir, falling back to the pickles"""
+    path = os.path.join(model_dir, BUNDLE_FILE)
+    if not os.path.exists(path):
+        return load_pickled_predictor(model_dir)
+    forest, vocabularies, metadata = read_bundle(path)
+    return EmissionPredictor(
+        forest,
+        LabelVocabulary(vocabularies['Fuel_Type']),
+        LabelVocabulary(vocabularies['Traffic_Level']),
+        LabelVocabulary(vocabularies['Weather_Condition']),
+        feature_importances=metadata.get('feature_importances'),
+        training_rows=metadata.get('training_rows'),
+    )
@@ -0,0 +1,323 @@
+import time
+
+import numpy as np
+
+BLOCK_CELLS = 2_000_000  # rows x trees walked per block in batch prediction
+
+
+# =============================================
+# COMPILED RANDOM FOREST
+# =============================================
+def _float_dtype(values):
+    return np.float32 if getattr(values, 'dtype', None) == np.float32 else np.float64
+
+
+class CompiledForest:
+    """A regression forest flattened into contiguous node arrays.
+
+    All trees share one set of arrays; ``roots`` holds the index of each
+    tree's root node. Leaves point to themselves so every row can be walked
+    a fixed number of steps without branching on leaf status.
+    """
+
+    def __init__(self, feature, threshold, children, value, roots, max_depth, feature_names=None):
+        self.feature = np.ascontiguousarray(feature, dtype=np.int32)
+        # float32 thresholds and values are kept as given (see compress_model.py)
+        self.threshold = np.ascontiguousarray(threshold, dtype=_float_dtype(threshold))
+        self.children = np.ascontiguousarray(children, dtype=np.int32).reshape(-1, 2)
+        self.value = np.ascontiguousarray(value, dtype=_float_dtype(value))
+        self.roots = np.ascontiguousarray(roots, dtype=np.int32)
+        self.max_depth = int(max_depth)
+        self.feature_names = list(feature_names) if feature_names is not None else None
+        # Interleaved (left, right) pairs: child of node i is children_flat[2 * i + went_right]
+        self._children_flat = self.children.ravel()
+
+    @classmethod
+    def from_sklearn(cls, model):
+        """Flatten a fitted single-output RandomForestRegressor"""
+        features, thresholds, children, values, roots = [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            n = tree.node_count
+            nodes = np.arange(n)
+            is_leaf = tree.children_left == -1
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(np.where(is_leaf, np.inf, tree.threshold))
+            children.append(np.column_stack([
+                np.where(is_leaf, nodes, tree.children_left),
+                np.where(is_leaf, nodes, tree.children_right),
+            ]) + offset)
+            values.append(tree.value[:, 0, 0])
+            roots.append(offset)
+            max_depth = max(max_depth, tree.max_depth)
+            offset += n
+        return cls(
+            np.concatenate(features), np.concatenate(thresholds),
+            np.concatenate(children), np.concatenate(values),
+            np.array(roots), max_depth,
+            getattr(model, 'feature_names_in_', None),
+        )
+
+    @classmethod
+    def concat(cls, forests):
+        """One forest holding every tree of forests, in order"""
+        children, roots = [], []
+        offset = 0
+        for forest in forests:
+            children.append(forest.children + offset)
+            roots.append(forest.roots + offset)
+            offset += forest.node_count
+        return cls(
+            np.concatenate([f.feature for f in forests]), np.concatenate([f.threshold for f in forests]),
+            np.concatenate(children), np.concatenate([f.value for f in forests]),
+            np.concatenate(roots), max(f.max_depth for f in forests),
+            forests[0].feature_names,
+        )
+
+    def select_trees(self, trees):
+        """A forest holding only the trees at the given positions"""
+        ends = np.append(self.roots[1:], self.node_count)
+        parts = []
+        for tree in trees:
+            start, stop = int(self.roots[tree]), int(ends[tree])
+            parts.append(CompiledForest(
+                self.feature[start:stop], self.threshold[start:stop],
+                self.children[start:stop] - start, self.value[start:stop],
+                [0], self.max_depth, self.feature_names,
+            ))
+        return CompiledForest.concat(parts)
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @property
+    def node_count(self):
+        return len(self.feature)
+
+    def _as_array(self, X):
+        """Return X as a 2D float32 array in training column order"""
+        if hasattr(X, 'columns') and self.feature_names is not None:
+            if list(X.columns) != self.feature_names:
+                X = X[self.feature_names]
+            X = X.to_numpy()
+        # sklearn compares float32 inputs against float64 thresholds
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        return X
+
+    def _walk(self, X, out):
+        n = len(X)
+        # Column-major copy so feature f of row r lives at f * n + r
+        x_flat = np.ascontiguousarray(X.T).ravel()
+        row_offset = np.arange(n, dtype=np.int32)[:, None]
+        idx = np.tile(self.roots, (n, 1))
+        for _ in range(self.max_depth):
+            pos = self.feature[idx]
+            pos *= n
+            pos += row_offset
+            went_right = x_flat[pos] > self.threshold[idx]
+            idx *= 2
+            idx += went_right
+            idx = self._children_flat[idx]
+        out[:] = self.value[idx]
+
+    def predict_trees(self, X):
+        """Return the per-tree predictions as an (n_rows, n_trees) array"""
+        X = self._as_array(X)
+        out = np.empty((len(X), self.n_trees))
+        block = max(BLOCK_CELLS // self.n_trees, 1)
+        for start in range(0, len(X), block):
+            self._walk(X[start:start + block], out[start:start + block])
+        return out
+
+    def predict(self, X):
+        """Predict like RandomForestRegressor.predict (mean over trees)"""
+        return self.predict_trees(X).mean(axis=1)
+
+    def predict_interval(self, X, quantiles=(0.05, 0.95)):
+        """Return (mean, std, bounds) of the per-tree predictions; bounds is (n_rows, len(quantiles)).
+
+        Blocks of per-tree outputs are reduced as they are walked, so the full
+        (n_rows, n_trees) array never exists (see _reduce_tree_blocks).
+        """
+        X = self._as_array(X)
+        block = max(BLOCK_CELLS // self.n_trees, 1)
+        out = np.empty((min(block, len(X)), self.n_trees))
+
+        def blocks():
+            for start in range(0, len(X), block):
+                trees = out[:min(block, len(X) - start)]
+                self._walk(X[start:start + block], trees)
+                yield trees
+
+        return _reduce_tree_blocks(blocks(), len(X), self.n_trees, quantiles)
+
+
+class NativeForest:
+    """The same trees walked by sklearn's Cython code, for batches above a few thousand rows.
+
+    Built from a fitted RandomForestRegressor, or from a CompiledForest (e.g.
+    one read from a bundle) by handing its node arrays to sklearn's Tree the
+    way unpickling does. sklearn is only imported when one is built.
+    """
+
+    def __init__(self, trees, feature_names=None):
+        self.trees = list(trees)
+        self.feature_names = list(feature_names) if feature_names is not None else None
+
+    @classmethod
+    def from_sklearn(cls, model):
+        """Wrap the trees of a fitted RandomForestRegressor"""
+        return cls([estimator.tree_ for estimator in model.estimators_], getattr(model, 'feature_names_in_', None))
+
+    @classmethod
+    def from_compiled(cls, forest):
+        """Rebuild sklearn Tree objects from a CompiledForest's node arrays"""
+        from sklearn.tree._tree import NODE_DTYPE, Tree
+
+        n_features = len(forest.feature_names) if forest.feature_names else int(forest.feature.max()) + 1
+        ends = np.append(forest.roots[1:], forest.node_count)
+        trees = []
+        for start, stop in zip(forest.roots, ends):
+            start, stop = int(start), int(stop)
+            children = forest.children[start:stop] - start
+            is_leaf = children[:, 0] == np.arange(stop - start)
+            nodes = np.zeros(stop - start, dtype=NODE_DTYPE)
+            nodes['left_child'] = np.where(is_leaf, -1, children[:, 0])
+            nodes['right_child'] = np.where(is_leaf, -1, children[:, 1])
+            nodes['feature'] = np.where(is_leaf, -2, forest.feature[start:stop])
+            nodes['threshold'] = np.where(is_leaf, -2.0, forest.threshold[start:stop])
+            nodes['n_node_samples'] = 1
+            nodes['weighted_n_node_samples'] = 1.0
+            tree = Tree(n_features, np.array([1], dtype=np.intp), 1)
+            tree.__setstate__({
+                'max_depth': forest.max_depth,
+                'node_count': stop - start,
+                'nodes': nodes,
+                'values': np.asarray(forest.value[start:stop], dtype=np.float64).reshape(-1, 1, 1),
+            })
+            trees.append(tree)
+        return cls(trees, forest.feature_names)
+
+    @property
+    def n_trees(self):
+        return len(self.trees)
+
+    def _as_array(self, X):
+        if hasattr(X, 'columns') and self.feature_names is not None:
+            if list(X.columns) != self.feature_names:
+                X = X[self.feature_names]
+            X = X.to_numpy()
+        # sklearn's trees only walk C-ordered float32 rows
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        return X
+
+    def predict(self, X):
+        """Mean over trees, accumulated tree by tree like RandomForestRegressor.predict"""
+        X = self._as_array(X)
+        total = np.zeros(len(X))
+        for tree in self.trees:
+            total += tree.predict(X).ravel()
+        return total / self.n_trees
+
+    def predict_interval(self, X, quantiles=(0.05, 0.95)):
+        """CompiledForest.predict_interval on sklearn's tree walk, reduced in the same blocks"""
+        X = self._as_array(X)
+        block = max(BLOCK_CELLS // self.n_trees, 1)
+        out = np.empty((min(block, len(X)), self.n_trees))
+
+        def blocks():
+            for start in range(0, len(X), block):
+                rows = X[start:start + block]
+                trees = out[:len(rows)]
+                for i, tree in enumerate(self.trees):
+                    trees[:, i] = tree.predict(rows).ravel()
+                yield trees
+
+        return _reduce_tree_blocks(blocks(), len(X), self.n_trees, quantiles)
+
+
+def _reduce_tree_blocks(blocks, n, n_trees, quantiles):
+    """Mean, std and quantiles of consecutive (rows, n_trees) blocks of per-tree outputs.
+
+    Each block is sorted in place once and the quantiles are interpolated
+    from it (numpy's 'linear' method).
+    """
+    mean = np.empty(n)
+    std = np.empty(n)
+    bounds = np.empty((n, len(quantiles)))
+    position = np.asarray(quantiles, dtype=np.float64) * (n_trees - 1)
+    below = np.floor(position).astype(np.intp)
+    above = np.minimum(below + 1, n_trees - 1)
+    weight = position - below
+    start = 0
+    for trees in blocks:
+        end = start + len(trees)
+        mean[start:end] = trees.mean(axis=1)
+        std[start:end] = trees.std(axis=1)
+        trees.sort(axis=1)
+        bounds[start:end] = trees[:, below] * (1 - weight) + trees[:, above] * weight
+        start = end
+    return mean, std, bounds
+
+
+# =============================================
+# PARITY AND LATENCY CHECK
+# =============================================
+def check_parity(model, forest, X, rtol=1e-9, atol=1e-6):
+    """Return the max absolute difference after asserting parity with sklearn"""
+    expected = model.predict(X)
+    got = forest.predict(X)
+    np.testing.assert_allclose(got, expected, rtol=rtol, atol=atol)
+    return float(np.max(np.abs(got - expected)))
+
+
+def _best_time(fn, repeats):
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _random_trips(model, n, seed=0):
+    """Random encoded trips spanning the ranges the model was trained on"""
+    rng = np.random.default_rng(seed)
+    import pandas as pd
+    return pd.DataFrame({
+        'Distance_km': rng.uniform(1, 5000, n),
+        'Fuel_Type': rng.integers(0, 4, n),
+        'Fuel_Consumed_Liters': rng.uniform(0.1, 600, n),
+        'Avg_Speed_kmph': rng.uniform(1, 120, n),
+        'Traffic_Level': rng.integers(0, 3, n),
+        'Weather_Condition': rng.integers(0, 3, n),
+        'Cargo_Weight_kg': rng.uniform(1, 12000, n),
+    })[list(model.feature_names_in_)]
+
+
+if __name__ == '__main__':
+    import joblib
+
+    model = joblib.load('co2_emission_model.pkl')
+    start = time.perf_counter()
+    forest = CompiledForest.from_sklearn(model)
+    print(f"Compiled {forest.n_trees} trees / {forest.node_count} nodes "
+          f"in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    for n in (1, 7, 1000, 100_000):
+        diff = check_parity(model, forest, _random_trips(model, n, seed=n))
+        print(f"parity ok for {n:>7} rows (max abs diff {diff:.2e})")
+
+    print(f"{'rows':>8} {'sklearn ms':>12} {'compiled ms':>12} {'speedup':>8}")
+    for n, repeats in ((1, 50), (100, 20), (10_000, 5), (100_000, 3)):
+        X = _random_trips(model, n)
+        t_sk = _best_time(lambda: model.predict(X), repeats)
+        t_cf = _best_time(lambda: forest.predict(X), repeats)
+        print(f"{n:>8} {t_sk * 1000:>12.3f} {t_cf * 1000:>12.3f} {t_sk / t_cf:>7.1f}x")
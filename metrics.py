@@ -0,0 +1,270 @@
+"""Process-wide timers, counters and gauges with Prometheus text export.
+
+Instrumentation is off unless ``ECOVISION_METRICS`` is set to a non-empty
+value other than ``0``; while off, ``timer()`` returns a shared no-op context
+manager and the record functions return immediately. When on:
+
+    ECOVISION_METRICS_FILE=/var/lib/node_exporter/ecovision.prom   # textfile, rewritten after reruns
+    ECOVISION_METRICS_PORT=9464                                     # GET /metrics on a local endpoint
+
+Stage timings recorded while a Streamlit rerun is in progress are also kept
+per thread, so the sidebar debug panel can show where the last rerun went.
+"""
+import logging
+import os
+import threading
+import time
+from contextlib import nullcontext
+
+ENABLED = os.environ.get('ECOVISION_METRICS', '') not in ('', '0')
+TEXTFILE = os.environ.get('ECOVISION_METRICS_FILE')
+PORT = os.environ.get('ECOVISION_METRICS_PORT')
+TEXTFILE_INTERVAL = 1.0  # seconds between textfile rewrites
+NAMESPACE = 'ecovision'
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+HELP = {
+    'page_rerun_seconds': ('histogram', "Wall time of one Streamlit script rerun, by page"),
+    'stage_seconds': ('histogram', "Wall time of an instrumented stage inside a rerun"),
+    'prediction_seconds': ('histogram', "Single-trip prediction latency, including the prediction cache"),
+    'reruns_total': ('counter', "Script reruns, by page"),
+    'cache_hits': ('gauge', "Cache hits since the cache was created"),
+    'cache_misses': ('gauge', "Cache misses since the cache was created"),
+    'cache_hit_ratio': ('gauge', "Cache hits / lookups"),
+    'cache_entries': ('gauge', "Entries currently held by a cache"),
+}
+
+_NULL_TIMER = nullcontext()
+_log = logging.getLogger(__name__)
+
+
+class Registry:
+    """Thread-safe store of labelled counters, gauges and histograms"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}  # (name, labels) -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def inc(self, name, value=1, labels=()):
+        key = (name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set(self, name, value, labels=()):
+        with self._lock:
+            self.gauges[(name, labels)] = value
+
+    def observe(self, name, value, labels=()):
+        key = (name, labels)
+        with self._lock:
+            series = self.histograms.get(key)
+            if series is None:
+                series = self.histograms[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    def summary(self, name, labels=()):
+        """(count, mean) of one histogram series"""
+        with self._lock:
+            series = self.histograms.get((name, labels))
+            if not series or not series[-1]:
+                return 0, 0.0
+            return series[-1], series[-2] / series[-1]
+
+    def render(self):
+        """Prometheus text exposition format"""
+        with self._lock:
+            counters = dict(self.counters)
+            gauges = dict(self.gauges)
+            histograms = {key: list(series) for key, series in self.histograms.items()}
+        names = sorted({name for name, _ in list(counters) + list(gauges) + list(histograms)})
+        lines = []
+        for name in names:
+            full = f"{NAMESPACE}_{name}"
+            kind, text = HELP.get(name, ('untyped', name))
+            lines.append(f"# HELP {full} {text}")
+            lines.append(f"# TYPE {full} {kind}")
+            for (n, labels), value in sorted(counters.items()):
+                if n == name:
+                    lines.append(f"{full}{_labels(labels)} {value}")
+            for (n, labels), value in sorted(gauges.items()):
+                if n == name:
+                    lines.append(f"{full}{_labels(labels)} {value}")
+            for (n, labels), series in sorted(histograms.items()):
+                if n != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(self.buckets, series):
+                    cumulative += count
+                    lines.append(f"{full}_bucket{_labels(labels + (('le', repr(bound)),))} {cumulative}")
+                lines.append(f"{full}_bucket{_labels(labels + (('le', '+Inf'),))} {series[-1]}")
+                lines.append(f"{full}_sum{_labels(labels)} {series[-2]}")
+                lines.append(f"{full}_count{_labels(labels)} {series[-1]}")
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in labels)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(labels, escaped)) + '}'
+
+
+REGISTRY = Registry()
+_local = threading.local()
+
+
+# =============================================
+# RECORDING
+# =============================================
+class _Timer:
+    __slots__ = ('name', 'labels', 'start')
+
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        REGISTRY.observe(self.name, elapsed, self.labels)
+        stages = getattr(_local, 'stages', None)
+        if stages is not None:
+            stages.append((dict(self.labels).get('stage', self.name.replace('_seconds', '')), elapsed))
+        return False
+
+
+def timer(name, **labels):
+    """Context manager recording its wall time into histogram `name`"""
+    if not ENABLED:
+        return _NULL_TIMER
+    return _Timer(name, tuple(sorted(labels.items())))
+
+
+def stage(name):
+    """Time one stage of a rerun (model load, encode, predict, html, matplotlib, ...)"""
+    if not ENABLED:
+        return _NULL_TIMER
+    return _Timer('stage_seconds', (('stage', name),))
+
+
+def inc(name, value=1, **labels):
+    if ENABLED:
+        REGISTRY.inc(name, value, tuple(sorted(labels.items())))
+
+
+def observe(name, value, **labels):
+    if ENABLED:
+        REGISTRY.observe(name, value, tuple(sorted(labels.items())))
+
+
+def record_cache(cache_name, stats):
+    """Export a cache's stats() dict (hits, misses and entries/size) as gauges"""
+    if not ENABLED:
+        return
+    labels = (('cache', cache_name),)
+    lookups = stats['hits'] + stats['misses']
+    REGISTRY.set('cache_hits', stats['hits'], labels)
+    REGISTRY.set('cache_misses', stats['misses'], labels)
+    REGISTRY.set('cache_hit_ratio', stats['hits'] / lookups if lookups else 0.0, labels)
+    REGISTRY.set('cache_entries', stats.get('entries', stats.get('size', 0)), labels)
+
+
+# =============================================
+# RERUNS
+# =============================================
+def start_rerun():
+    """Begin collecting this thread's stage timings for one script rerun"""
+    if ENABLED:
+        _local.stages = []
+        _local.start = time.perf_counter()
+        _ensure_endpoint()
+
+
+def finish_rerun(page):
+    """Record the rerun's duration; returns [(stage, seconds)] with the total last"""
+    if not ENABLED or getattr(_local, 'stages', None) is None:
+        return []
+    elapsed = time.perf_counter() - _local.start
+    labels = (('page', page),)
+    REGISTRY.observe('page_rerun_seconds', elapsed, labels)
+    REGISTRY.inc('reruns_total', 1, labels)
+    stages = _local.stages + [('total', elapsed)]
+    _local.stages = None
+    if TEXTFILE:
+        _write_textfile_throttled()
+    return stages
+
+
+# =============================================
+# EXPORT
+# =============================================
+_export_lock = threading.Lock()
+_last_textfile = 0.0
+_server = None
+_endpoint_failed = False  # the port could not be bound; not retried on later reruns
+
+
+def write_textfile(path):
+    """Atomically write the current metrics for a textfile collector"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(REGISTRY.render())
+    os.replace(tmp_path, path)
+
+
+def _write_textfile_throttled():
+    global _last_textfile
+    with _export_lock:
+        now = time.monotonic()
+        if now - _last_textfile < TEXTFILE_INTERVAL:
+            return
+        _last_textfile = now
+    write_textfile(TEXTFILE)
+
+
+def _ensure_endpoint():
+    global _server, _endpoint_failed
+    if not PORT or _server is not None or _endpoint_failed:
+        return
+    with _export_lock:
+        if _server is None and not _endpoint_failed:
+            try:
+                _server = serve(int(PORT))
+            except OSError as e:
+                _endpoint_failed = True
+                _log.warning("Metrics endpoint disabled: cannot listen on port %s (%s)", PORT, e)
+
+
+def serve(port, host='127.0.0.1'):
+    """Serve GET /metrics from a daemon thread; returns the server"""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != '/metrics':
+                self.send_error(404)
+                return
+            body = REGISTRY.render().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,165 @@
+"""Single-file model bundle: compiled forest arrays plus category vocabularies.
+
+Layout::
+
+    8 bytes   magic  b'ECOBNDL\\0'
+    8 bytes   header length (little-endian uint64)
+    header    UTF-8 JSON: format version, payload sha256, array table,
+              vocabularies and metadata
+    payload   raw little-endian arrays, each aligned to 64 bytes
+
+The payload is opened with ``np.memmap`` so worker processes on one host share
+the page-cache copy of the tree arrays instead of each unpickling a private one.
+
+    python model_bundle.py build      # write the bundle from the pickled artifacts
+    python model_bundle.py compare    # startup time and RSS: pickles vs bundle
+"""
+import hashlib
+import json
+import os
+import struct
+import sys
+
+import numpy as np
+
+from forest_engine import CompiledForest
+
+MAGIC = b'ECOBNDL\0'
+BUNDLE_FORMAT_VERSION = 1
+ALIGNMENT = 64
+FOREST_ARRAYS = ['feature', 'threshold', 'children', 'value', 'roots']
+
+
+class BundleError(ValueError):
+    """The bundle is missing, corrupt or of an unsupported version"""
+
+
+def _pad(n):
+    return -n % ALIGNMENT
+
+
+def write_bundle(path, forest, vocabularies, metadata=None):
+    """Write forest arrays and {name: classes} vocabularies to a single bundle file"""
+    table = {}
+    chunks = []
+    offset = 0
+    for name in FOREST_ARRAYS:
+        array = np.ascontiguousarray(getattr(forest, name))
+        data = array.astype(array.dtype.newbyteorder('<'), copy=False).tobytes()
+        table[name] = {'dtype': array.dtype.newbyteorder('<').str, 'shape': list(array.shape), 'offset': offset}
+        chunks.append(data + b'\0' * _pad(len(data)))
+        offset += len(data) + _pad(len(data))
+    payload = b''.join(chunks)
+
+    header = {
+        'format_version': BUNDLE_FORMAT_VERSION,
+        'sha256': hashlib.sha256(payload).hexdigest(),
+        'arrays': table,
+        'max_depth': forest.max_depth,
+        'feature_names': forest.feature_names,
+        'vocabularies': {name: [str(c) for c in classes] for name, classes in vocabularies.items()},
+        'metadata': metadata or {},
+    }
+    header_bytes = json.dumps(header).encode()
+    # Pad the header so the payload starts on an aligned boundary
+    header_bytes += b' ' * _pad(len(MAGIC) + 8 + len(header_bytes))
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(struct.pack('<Q', len(header_bytes)))
+        f.write(header_bytes)
+        f.write(payload)
+    os.replace(tmp_path, path)
+
+
+def read_header(path):
+    """Return (header dict, payload offset) without touching the payload"""
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise BundleError(f"{path} is not a model bundle")
+        (header_len,) = struct.unpack('<Q', f.read(8))
+        header = json.loads(f.read(header_len))
+    if header.get('format_version') != BUNDLE_FORMAT_VERSION:
+        raise BundleError(f"{path} has unsupported bundle version {header.get('format_version')}")
+    return header, len(MAGIC) + 8 + header_len
+
+
+def read_bundle(path, verify=True):
+    """Memory-map a bundle and return (forest, vocabularies, metadata)"""
+    header, payload_offset = read_header(path)
+    payload = np.memmap(path, dtype=np.uint8, mode='r', offset=payload_offset)
+    if verify and hashlib.sha256(payload).hexdigest() != header['sha256']:
+        raise BundleError(f"{path} failed its checksum")
+
+    arrays = {}
+    for name, spec in header['arrays'].items():
+        dtype = np.dtype(spec['dtype'])
+        count = int(np.prod(spec['shape']))
+        arrays[name] = np.frombuffer(payload, dtype=dtype, count=count,
+                                     offset=spec['offset']).reshape(spec['shape'])
+    forest = CompiledForest(arrays['feature'], arrays['threshold'], arrays['children'],
+                            arrays['value'], arrays['roots'], header['max_depth'],
+                            header['feature_names'])
+    return forest, header['vocabularies'], header['metadata']
+
+
+def build_from_pickles(model_dir, path):
+    """Convert the four pickled artifacts in model_dir into a bundle at path"""
+    from emission_model import load_pickled_predictor
+
+    predictor = load_pickled_predictor(model_dir)
+    write_bundle(path, predictor.forest, predictor.vocabularies(), {
+        'source': 'co2_emission_model.pkl',
+        'feature_importances': predictor.feature_importances.tolist(),
+        'n_estimators': predictor.forest.n_trees,
+        'training_rows': predictor.training_rows,
+    })
+
+
+# =============================================
+# STARTUP TIME AND MEMORY COMPARISON
+# =============================================
+_PROBE = """
+import os, time, json
+start = time.perf_counter()
+import emission_model
+predictor = emission_model.{loader}()
+predictor.forest.predict([[500, 1, 25, 60, 2, 0, 3000]])
+elapsed = time.perf_counter() - start
+status = dict(line.split(':', 1) for line in open('/proc/self/status'))
+kb = lambda key: int(status.get(key, '0 kB').split()[0])
+print(json.dumps({{'seconds': elapsed, 'rss_kb': kb('VmRSS'),
+                   'rss_anon_kb': kb('RssAnon'), 'rss_file_kb': kb('RssFile')}}))
+"""
+
+
+def compare_startup(repeats=3):
+    """Time a cold process load of the pickles vs the bundle and report memory"""
+    import subprocess
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    print(f"{'loader':<10} {'startup s':>10} {'RSS MB':>8} {'private MB':>11} {'file-backed MB':>15}")
+    for label, loader in (('pickles', 'load_pickled_predictor'), ('bundle', 'load_predictor')):
+        runs = []
+        for _ in range(repeats):
+            out = subprocess.run([sys.executable, '-W', 'ignore', '-c', _PROBE.format(loader=loader)],
+                                 cwd=here, capture_output=True, text=True, check=True)
+            runs.append(json.loads(out.stdout.strip().splitlines()[-1]))
+        best = min(runs, key=lambda r: r['seconds'])
+        print(f"{label:<10} {best['seconds']:>10.3f} {best['rss_kb'] / 1024:>8.1f} "
+              f"{best['rss_anon_kb'] / 1024:>11.1f} {best['rss_file_kb'] / 1024:>15.1f}")
+
+
+if __name__ == '__main__':
+    from emission_model import BUNDLE_FILE, MODEL_DIR
+
+    command = sys.argv[1] if len(sys.argv) > 1 else 'build'
+    if command == 'build':
+        target = os.path.join(MODEL_DIR, BUNDLE_FILE)
+        build_from_pickles(MODEL_DIR, target)
+        print(f"Wrote {target} ({os.path.getsize(target) / 1024:.0f} KiB)")
+    elif command == 'compare':
+        compare_startup()
+    else:
+        sys.exit(f"unknown command {command!r} (expected build or compare)")
@@ -0,0 +1,201 @@
+"""Holdout evaluation of the loaded model, run once per model version.
+
+``EvaluationJob`` computes the error metrics, then permutation importance, in
+a background thread. Each section is stored in ``model_evaluation.json`` next
+to the artifacts as soon as it is ready, keyed by the model's content (the
+bundle checksum) and the holdout set. The next process, or the next version
+of the same model, reads that file instead of evaluating again.
+
+The holdout is ``holdout_trips.csv`` in the model directory if present
+(trip dataset columns including ``CO2_Emission_kg``), otherwise synthetic
+trips drawn with a different seed than training.
+
+    python model_evaluation.py          # evaluate now and print the result
+"""
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from emission_model import BUNDLE_FILE, FEATURE_COLUMNS, MODEL_DIR, model_artifact_stamp
+
+EVALUATION_FILE = 'model_evaluation.json'
+HOLDOUT_FILE = 'holdout_trips.csv'
+HOLDOUT_ROWS = 5_000
+HOLDOUT_SEED = 2024  # train_model.py trains on seed 42
+TIMING_CALLS = 200  # single-row predictions timed for the latency percentiles
+PERMUTATION_REPEATS = 10  # shuffles per feature
+PERMUTATION_SEED = 0
+SECTIONS = ('metrics', 'permutation_importance')
+
+
+def holdout_trips(holdout_csv=None, model_dir=MODEL_DIR):
+    """Return (trips, description) for the holdout set"""
+    import pandas as pd
+
+    holdout_csv = holdout_csv or os.path.join(model_dir, HOLDOUT_FILE)
+    if os.path.exists(holdout_csv):
+        info = os.stat(holdout_csv)
+        return pd.read_csv(holdout_csv), f"{os.path.basename(holdout_csv)}:{info.st_size}:{info.st_mtime_ns}"
+    from train_model import generate_trips
+
+    return generate_trips(HOLDOUT_ROWS, seed=HOLDOUT_SEED), f"synthetic:{HOLDOUT_SEED}:{HOLDOUT_ROWS}"
+
+
+def model_key(model_dir=MODEL_DIR):
+    """Content identity of the model artifacts (bundle checksum when there is a bundle)"""
+    bundle = os.path.join(model_dir, BUNDLE_FILE)
+    if os.path.exists(bundle):
+        from model_bundle import read_header
+
+        return read_header(bundle)[0]['sha256']
+    return json.dumps(model_artifact_stamp(model_dir))
+
+
+# =============================================
+# EVALUATION
+# =============================================
+def _errors(predicted, actual):
+    residual = predicted - actual
+    return {
+        'rows': int(len(actual)),
+        'mae_kg': float(np.abs(residual).mean()),
+        'rmse_kg': float(np.sqrt((residual ** 2).mean())),
+        'bias_kg': float(residual.mean()),
+    }
+
+
+def evaluate(predictor, trips):
+    """R², MAE, RMSE, per-fuel errors and prediction timing on labelled trips"""
+    actual = trips['CO2_Emission_kg'].to_numpy(dtype=np.float64)
+    features = predictor.encode(trips)
+    start = time.perf_counter()
+    predicted = np.asarray(predictor.predict_encoded(features), dtype=np.float64)
+    batch_seconds = time.perf_counter() - start
+
+    one_row = features.iloc[:1]
+    calls = []
+    for _ in range(TIMING_CALLS):
+        start = time.perf_counter()
+        predictor.forest.predict(one_row)
+        calls.append(time.perf_counter() - start)
+
+    result = _errors(predicted, actual)
+    total = ((actual - actual.mean()) ** 2).sum()
+    result['r2'] = float(1 - ((predicted - actual) ** 2).sum() / total) if total else float('nan')
+    fuels = trips['Fuel_Type'].astype(str).to_numpy()
+    result['by_fuel'] = {fuel: _errors(predicted[fuels == fuel], actual[fuels == fuel])
+                         for fuel in sorted(set(fuels))}
+    result['timing'] = {
+        'single_row_p50_ms': float(np.percentile(calls, 50) * 1000),
+        'single_row_p99_ms': float(np.percentile(calls, 99) * 1000),
+        'batch_rows_per_s': float(len(trips) / batch_seconds) if batch_seconds else float('nan'),
+    }
+    return result
+
+
+def permutation_importance(predictor, trips, repeats=PERMUTATION_REPEATS, seed=PERMUTATION_SEED, workers=None):
+    """Holdout MAE increase (kg) when each feature is shuffled, with 95% intervals.
+
+    Every feature's repeats are stacked into one batch so each costs a single
+    prediction call; features are scored concurrently on a thread pool (the
+    tree walk spends its time in numpy kernels that release the GIL).
+    """
+    import pandas as pd
+
+    actual = trips['CO2_Emission_kg'].to_numpy(dtype=np.float64)
+    X = predictor.encode(trips)[FEATURE_COLUMNS].to_numpy(dtype=np.float64)
+    n = len(X)
+    baseline = float(np.abs(np.asarray(predictor.predict_encoded(pd.DataFrame(X, columns=FEATURE_COLUMNS)))
+                            - actual).mean())
+    rng = np.random.default_rng(seed)
+    orders = [[rng.permutation(n) for _ in range(repeats)] for _ in FEATURE_COLUMNS]
+
+    def score(column):
+        stacked = np.tile(X, (repeats, 1))
+        for r, order in enumerate(orders[column]):
+            stacked[r * n:(r + 1) * n, column] = X[order, column]
+        predicted = np.asarray(predictor.predict_encoded(pd.DataFrame(stacked, columns=FEATURE_COLUMNS)))
+        return np.abs(predicted.reshape(repeats, n) - actual).mean(axis=1) - baseline
+
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        drops = list(pool.map(score, range(len(FEATURE_COLUMNS))))
+
+    features = {}
+    for name, drop in zip(FEATURE_COLUMNS, drops):
+        half_width = 1.96 * drop.std(ddof=1) / np.sqrt(repeats) if repeats > 1 else 0.0
+        features[name] = {'mean_kg': float(drop.mean()), 'std_kg': float(drop.std(ddof=1)) if repeats > 1 else 0.0,
+                          'ci_low_kg': float(drop.mean() - half_width), 'ci_high_kg': float(drop.mean() + half_width)}
+    return {'baseline_mae_kg': baseline, 'repeats': repeats, 'rows': n, 'features': features}
+
+
+def load_cached(model_dir, key, holdout):
+    """Stored sections for this model and holdout ({} if none match)"""
+    try:
+        with open(os.path.join(model_dir, EVALUATION_FILE)) as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if cached.get('model_key') != key or cached.get('holdout') != holdout:
+        return {}
+    return cached.get('sections', {})
+
+
+def save_cached(model_dir, key, holdout, sections):
+    path = os.path.join(model_dir, EVALUATION_FILE)
+    with open(f"{path}.tmp", 'w') as f:
+        json.dump({'model_key': key, 'holdout': holdout, 'sections': sections}, f, indent=2)
+    os.replace(f"{path}.tmp", path)
+
+
+class EvaluationJob:
+    """Evaluate a predictor once in a daemon thread, reusing stored sections.
+
+    ``results`` fills in section by section ('metrics', then
+    'permutation_importance'); ``ready(section)`` tells whether one is there.
+    """
+
+    def __init__(self, predictor, model_dir=MODEL_DIR):
+        self.predictor = predictor
+        self.model_dir = model_dir
+        self.results = {}
+        self.error = None
+        self._ready = {name: threading.Event() for name in SECTIONS}
+        self._thread = threading.Thread(target=self._run, name='model-evaluation', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        try:
+            key = model_key(self.model_dir)
+            trips, holdout = holdout_trips(model_dir=self.model_dir)
+            sections = load_cached(self.model_dir, key, holdout)
+            for name, compute in (('metrics', evaluate), ('permutation_importance', permutation_importance)):
+                if name not in sections:
+                    sections[name] = compute(self.predictor, trips)
+                    save_cached(self.model_dir, key, holdout, sections)
+                self.results[name] = sections[name]
+                self._ready[name].set()
+        except Exception as e:  # surfaced on the page rather than lost in the thread
+            self.error = e
+        finally:
+            for event in self._ready.values():
+                event.set()
+
+    def ready(self, section='metrics'):
+        return self._ready[section].is_set()
+
+    def wait(self, section=SECTIONS[-1], timeout=None):
+        return self._ready[section].wait(timeout)
+
+
+if __name__ == '__main__':
+    from emission_model import load_predictor
+
+    job = EvaluationJob(load_predictor())
+    job.wait()
+    if job.error:
+        raise job.error
+    print(json.dumps(job.results, indent=2))
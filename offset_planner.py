@@ -0,0 +1,116 @@
+"""Tree-planting plans for many emission figures at once, with age-dependent absorption.
+
+A planted tree absorbs ``mature_kg * (1 - exp(-age / growth_years))`` in its
+age-th year and survives each year with probability ``1 - mortality``. One
+cumulative per-tree curve up to the longest horizon sizes every plan with a
+single array division, and the year-by-year schedule for all plans is built
+by broadcasting, not a loop over plans. ``growth_years=0, mortality=0``
+reproduces the flat ``calculate_trees_needed``.
+
+    python offset_planner.py scored_trips.csv.gz --emissions-column Predicted_CO2_kg --label Route_ID --years 10 -o schedule.csv
+"""
+import argparse
+
+import numpy as np
+
+from emission_model import TREE_ABSORPTION_PER_YEAR
+
+GROWTH_YEARS = 5.0  # years for absorption to reach ~63% of a mature tree's
+ANNUAL_MORTALITY = 0.03  # share of surviving trees lost each year
+MAX_HORIZON_YEARS = 100
+SCHEDULE_COLUMNS = ['Plan', 'Year', 'Trees_Planted', 'Trees_Alive', 'Absorbed_kg', 'Cumulative_kg',
+                    'Remaining_kg']
+
+
+def absorption_curve(max_years, mature_kg=TREE_ABSORPTION_PER_YEAR, growth_years=GROWTH_YEARS,
+                     mortality=ANNUAL_MORTALITY):
+    """Per planted tree, years 1..max_years: (surviving share, kg absorbed that year, cumulative kg)"""
+    age = np.arange(1, max_years + 1, dtype=np.float64)
+    survival = (1.0 - mortality) ** age
+    ramp = 1.0 - np.exp(-age / growth_years) if growth_years > 0 else np.ones_like(age)
+    annual = survival * mature_kg * ramp
+    return survival, annual, np.cumsum(annual)
+
+
+def _horizons(emissions_kg, years):
+    emissions_kg = np.atleast_1d(np.asarray(emissions_kg, dtype=np.float64))
+    years = np.broadcast_to(np.asarray(years), emissions_kg.shape).astype(np.int64)
+    if (years < 1).any() or (years > MAX_HORIZON_YEARS).any():
+        raise ValueError(f"Offset horizons must be between 1 and {MAX_HORIZON_YEARS} years")
+    if np.isnan(emissions_kg).any() or (emissions_kg < 0).any():
+        raise ValueError("Emissions must be non-negative numbers")
+    return emissions_kg, years
+
+
+def plan_offsets(emissions_kg, years, **curve):
+    """Trees to plant now so each emission figure is absorbed within its horizon.
+
+    emissions_kg and years are arrays (or a scalar years for all); returns a
+    dict of arrays: trees (whole trees, rounded up), trees_exact and
+    per_tree_kg (cumulative absorption of one planted tree over the horizon).
+    """
+    emissions_kg, years = _horizons(emissions_kg, years)
+    _, _, cumulative = absorption_curve(int(years.max()), **curve)
+    per_tree = cumulative[years - 1]
+    exact = emissions_kg / per_tree
+    return {'emissions_kg': emissions_kg, 'years': years, 'trees_exact': exact,
+            'trees': np.ceil(exact - 1e-9).astype(np.int64), 'per_tree_kg': per_tree}
+
+
+def schedule_table(plan, labels=None, **curve):
+    """Year-by-year schedule for every plan as a long DataFrame (SCHEDULE_COLUMNS)"""
+    import pandas as pd
+
+    years = plan['years']
+    survival, annual, cumulative = absorption_curve(int(years.max()), **curve)
+    trees = plan['trees'].astype(np.float64)[:, None]
+    active = np.arange(1, len(cumulative) + 1)[None, :] <= years[:, None]  # (plans, years)
+    plan_index, year_index = np.nonzero(active)
+    absorbed_to_date = (trees * cumulative)[active]
+    labels = np.arange(len(years)) if labels is None else np.asarray(labels)
+    return pd.DataFrame({
+        'Plan': labels[plan_index],
+        'Year': year_index + 1,
+        'Trees_Planted': plan['trees'][plan_index],
+        'Trees_Alive': (trees * survival)[active],
+        'Absorbed_kg': (trees * annual)[active],
+        'Cumulative_kg': absorbed_to_date,
+        'Remaining_kg': np.maximum(plan['emissions_kg'][plan_index] - absorbed_to_date, 0.0),
+    }, columns=SCHEDULE_COLUMNS)
+
+
+def export_schedule(table, path):
+    """Write a schedule table as CSV (gzip when path ends in .gz)"""
+    table.to_csv(path, index=False, float_format='%.3f', compression='gzip' if str(path).endswith('.gz') else None)
+    return path
+
+
+def main(argv=None):
+    import pandas as pd
+
+    parser = argparse.ArgumentParser(description="Size tree plantings for many emission figures at once")
+    parser.add_argument('emissions', help="CSV with one emission figure (kg CO2) per row")
+    parser.add_argument('--emissions-column', dest='column', default='CO2_Emission_kg')
+    parser.add_argument('--label', default=None, help="column naming each plan (route, business unit)")
+    parser.add_argument('--years', default='10', help="horizon in years, or the name of a column of horizons")
+    parser.add_argument('--growth-years', type=float, default=GROWTH_YEARS)
+    parser.add_argument('--mortality', type=float, default=ANNUAL_MORTALITY)
+    parser.add_argument('-o', '--output', default='offset_schedule.csv')
+    args = parser.parse_args(argv)
+
+    frame = pd.read_csv(args.emissions)
+    skipped = int(frame[args.column].isna().sum())  # e.g. trips bulk scoring left unscored
+    frame = frame[frame[args.column].notna()]
+    years = frame[args.years].to_numpy() if args.years in frame.columns else int(args.years)
+    curve = {'growth_years': args.growth_years, 'mortality': args.mortality}
+    plan = plan_offsets(frame[args.column].to_numpy(), years, **curve)
+    table = schedule_table(plan, frame[args.label].to_numpy() if args.label else None, **curve)
+    export_schedule(table, args.output)
+    print(f"{len(plan['trees']):,} plans, {plan['trees'].sum():,} trees to plant, "
+          f"{plan['emissions_kg'].sum():,.0f} kg CO2; schedule ({len(table):,} rows) in {args.output}")
+    if skipped:
+        print(f"{skipped:,} rows without an emission figure skipped")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+class PredictionCache:
+    """Thread-safe bounded LRU of single-trip predictions.
+
+    Keys are the encoded 7-feature tuples fed to the model, so two scans with
+    the same inputs share one entry regardless of which session made them.
+    """
+
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def predict(self, features, predict_fn):
+        """Return predict_fn(features) for one encoded row, from cache when possible.
+
+        predict_fn may return one value or one row of values (an estimate with
+        its interval) per trip; either is cached as returned.
+        """
+        row = np.asarray(features, dtype=float).reshape(1, -1)
+        key = tuple(row[0].tolist())
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return np.array([self._entries[key]])
+            self.misses += 1
+        value = np.asarray(predict_fn(row), dtype=float)[0]
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return np.array([value])
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """Return hit/miss counters and current size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
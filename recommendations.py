@@ -0,0 +1,62 @@
+"""Optimization recommendations from counterfactual trips scored by the model.
+
+Each option replaces the scanned trip with one or more changed trips (a
+different fuel, a shorter route, the load split across two vehicles). The
+original trip and every counterfactual are predicted together in one batch,
+and the options are ranked by predicted savings.
+"""
+import numpy as np
+
+ROUTE_CUTS = (0.05, 0.10, 0.15, 0.20)  # shorter routes; fuel burned shrinks in proportion
+LOAD_SPLITS = (0.9, 0.8, 0.7, 0.6, 0.5)  # share kept on this vehicle; the rest rides a second one on the same route
+CATEGORIES = ('route', 'fuel', 'load')
+
+
+def counterfactuals(trip, fuels):
+    """[(category, action, trips)]; trips together replace the original trip"""
+    options = []
+    for cut in ROUTE_CUTS:
+        options.append(('route', f"Shorten the route by {cut:.0%}", [dict(
+            trip, Distance_km=trip['Distance_km'] * (1 - cut),
+            Fuel_Consumed_Liters=trip['Fuel_Consumed_Liters'] * (1 - cut))]))
+    for fuel in fuels:
+        if fuel != trip['Fuel_Type']:
+            options.append(('fuel', f"Switch to {fuel}", [dict(trip, Fuel_Type=fuel)]))
+    for share in LOAD_SPLITS:
+        options.append(('load', f"Split the load {share:.0%} / {1 - share:.0%} across two vehicles", [
+            dict(trip, Cargo_Weight_kg=trip['Cargo_Weight_kg'] * share),
+            dict(trip, Cargo_Weight_kg=trip['Cargo_Weight_kg'] * (1 - share)),
+        ]))
+    return options
+
+
+def recommend(predictor, trip):
+    """Baseline prediction and every option ranked by predicted savings (kg CO2), best first"""
+    import pandas as pd
+
+    options = counterfactuals(trip, predictor.vocabularies()['Fuel_Type'])
+    rows = [trip] + [t for _, _, trips in options for t in trips]
+    predicted = np.asarray(predictor.predict(pd.DataFrame(rows)), dtype=np.float64)
+    baseline = float(predicted[0])
+    ranked = []
+    start = 1
+    for category, action, trips in options:
+        total = float(predicted[start:start + len(trips)].sum())
+        start += len(trips)
+        ranked.append({
+            'category': category,
+            'action': action,
+            'predicted_kg': total,
+            'savings_kg': baseline - total,
+            'savings_pct': (baseline - total) / baseline * 100 if baseline else 0.0,
+        })
+    ranked.sort(key=lambda option: option['savings_kg'], reverse=True)
+    return {'baseline_kg': baseline, 'options': ranked, 'trips_scored': len(rows)}
+
+
+def best_by_category(recommendations):
+    """The highest-saving option in each category"""
+    best = {}
+    for option in recommendations['options']:
+        best.setdefault(option['category'], option)
+    return best
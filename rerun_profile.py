@@ -0,0 +1,277 @@
+"""Server CPU per interaction for the Streamlit app, measured over its websocket.
+
+Starts ``streamlit run`` headless, connects the way a browser does and plays
+a fixed sequence of interactions: editing trip inputs, scanning, the what-if
+panel, switching page and the Data Explorer widgets. Each interaction sends
+what the browser would send: nothing for a widget inside a form until it is
+submitted, a fragment rerun for a widget inside an ``st.fragment``, a full
+rerun otherwise. The server's user + system CPU time (from /proc, so Linux
+only), wall time and bytes pushed to the browser are recorded until the run
+finishes. The first round warms the caches and is not counted; CPU time comes
+in clock ticks (10 ms), so each figure is a mean over the other rounds. The
+server's resident memory is sampled after every round, so a long run shows
+whether memory keeps growing.
+
+    python rerun_profile.py                                   # writes rerun_profile.json
+    python rerun_profile.py --app old_app.py --output before.json
+    python rerun_profile.py --output after.json --compare before.json
+    python rerun_profile.py --rounds 100 --option runner.postScriptGC=true
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'carbon_emission_predictor.py')
+RESULTS_FILE = 'rerun_profile.json'
+ROUNDS = 10
+STARTUP_TIMEOUT = 60.0
+RUN_TIMEOUT = 300.0
+
+# (name, label of the widget, value); the value may depend on the round so caches see new trips,
+# cycling within the widget's range so long runs stay valid
+INTERACTIONS = [
+    ('open Emission Scan', None, None),
+    ('edit Distance', "Distance (km)", lambda r: 600 + 25 * (r % 160)),
+    ('edit Cargo Weight', "Cargo Weight (kg)", lambda r: 2000 + 100 * (r % 160)),
+    ('click SCAN EMISSIONS', "SCAN EMISSIONS", True),
+    ('what-if on', "Show how the prediction responds to the trip inputs", True),
+    ('what-if points', "Points per numeric axis", lambda r: 30 + r % 70),
+    ('switch to Data Explorer', "app_mode", "📈 Data Explorer"),
+    ('explorer export format', "Export format", "CSV"),
+    ('explorer chart', "Select Visualization", "Cargo Impact"),
+    ('explorer grid size', "Surface grid size", lambda r: 20 + r % 40),
+]
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _rss_bytes(pid):
+    """Resident set size of a process (Linux /proc)"""
+    with open(f'/proc/{pid}/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+def _cpu_seconds(pid):
+    """User + system CPU seconds used so far by a process (Linux /proc)"""
+    with open(f'/proc/{pid}/stat') as f:
+        fields = f.read().rsplit(')', 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+
+
+class Session:
+    """One browser session: widgets seen so far, pending form values, rerun requests"""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.widgets = {}  # label (or key) -> (id, kind, form_id, fragment_id, proto)
+        self.pending = {}  # form_id -> {widget id: WidgetState}
+        self.page_script_hash = ''
+        self.exceptions = []
+
+    async def run(self, states=(), fragment_id=''):
+        """Send one rerun request and read until it finishes; returns (bytes received, messages)"""
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+
+        msg = BackMsg()
+        msg.rerun_script.page_script_hash = self.page_script_hash
+        msg.rerun_script.fragment_id = fragment_id
+        msg.rerun_script.widget_states.widgets.extend(states)
+        await self.connection.write_message(msg.SerializeToString(), binary=True)
+        return await self._read_until_finished()
+
+    async def _read_until_finished(self):
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+        received = messages = 0
+        while True:
+            raw = await asyncio.wait_for(self.connection.read_message(), RUN_TIMEOUT)
+            if raw is None:
+                raise RuntimeError("The Streamlit server closed the connection")
+            received += len(raw)
+            messages += 1
+            msg = ForwardMsg()
+            msg.ParseFromString(raw)
+            kind = msg.WhichOneof('type')
+            if kind == 'new_session':
+                self.page_script_hash = msg.new_session.page_script_hash
+            elif kind == 'delta':
+                self._track(msg.delta)
+            elif kind == 'script_finished' and msg.script_finished in (
+                    ForwardMsg.FINISHED_SUCCESSFULLY, ForwardMsg.FINISHED_FRAGMENT_RUN_SUCCESSFULLY):
+                return received, messages
+
+    def _track(self, delta):
+        if not delta.HasField('new_element'):
+            return
+        element = delta.new_element
+        kind = element.WhichOneof('type')
+        if kind == 'exception':
+            self.exceptions.append(element.exception.message)
+            return
+        proto = getattr(element, kind)
+        if not hasattr(proto, 'id') or not hasattr(proto, 'label'):
+            return
+        label = 'app_mode' if '-app_mode' in proto.id else proto.label
+        self.widgets[label] = (proto.id, kind, getattr(proto, 'form_id', ''), delta.fragment_id, proto)
+
+    def widget_state(self, label, value):
+        from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+        widget_id, kind, _, _, proto = self.widgets[label]
+        state = WidgetState(id=widget_id)
+        if kind == 'button':
+            state.trigger_value = True
+        elif kind == 'checkbox':
+            state.bool_value = value
+        elif kind == 'radio':
+            state.int_value = list(proto.options).index(value)
+        elif kind == 'selectbox':
+            state.string_value = value
+        elif kind == 'slider':
+            state.double_array_value.data.append(value)
+        elif kind == 'number_input' and proto.data_type == proto.INT:
+            state.int_value = value
+        else:
+            state.double_value = value
+        return state
+
+    async def interact(self, label, value):
+        """Change one widget as a browser would; returns (messages sent, bytes, messages received)"""
+        _, kind, form_id, fragment_id, proto = self.widgets[label]
+        state = self.widget_state(label, value)
+        if form_id and not (kind == 'button' and proto.is_form_submitter):
+            self.pending.setdefault(form_id, {})[state.id] = state  # held in the browser until submit
+            return 0, 0, 0
+        states = list(self.pending.pop(form_id, {}).values()) + [state] if form_id else [state]
+        return (1,) + await self.run(states, fragment_id)
+
+
+async def _play(url, server_pid, round_index):
+    from tornado.websocket import websocket_connect
+
+    connection = await websocket_connect(url, max_message_size=1 << 30)
+    session = Session(connection)
+    timings = {}
+    try:
+        for name, label, value in INTERACTIONS:
+            if callable(value):
+                value = value(round_index)
+            cpu, wall = _cpu_seconds(server_pid), time.perf_counter()
+            if label is None:
+                sent, received, messages = (1,) + await session.run()
+            else:
+                sent, received, messages = await session.interact(label, value)
+            timings[name] = {'cpu': _cpu_seconds(server_pid) - cpu, 'wall': time.perf_counter() - wall,
+                             'sent': sent, 'bytes': received, 'messages': messages}
+    finally:
+        connection.close()
+    if session.exceptions:
+        raise RuntimeError(f"The app raised: {session.exceptions[0]}")
+    return timings
+
+
+def _wait_for_server(port, process):
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("streamlit exited during startup")
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError("streamlit did not start listening in time")
+
+
+def profile(app=APP, rounds=ROUNDS, options=()):
+    """Mean server CPU, wall time and bytes per interaction over rounds (plus one warm-up).
+
+    options are extra Streamlit config settings ('runner.postScriptGC=true').
+    The server's RSS after each round, warm-up included, is returned as rss_mb.
+    """
+    port = _free_port()
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'streamlit', 'run', app, '--server.headless', 'true',
+         '--server.port', str(port), '--browser.gatherUsageStats', 'false']
+        + [f'--{option}' for option in options],
+        cwd=os.path.dirname(os.path.abspath(app)), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    samples, rss = [], []
+    try:
+        _wait_for_server(port, process)
+        url = f'ws://127.0.0.1:{port}/_stcore/stream'
+        for r in range(rounds + 1):
+            samples.append(asyncio.run(_play(url, process.pid, r)))
+            rss.append(_rss_bytes(process.pid) / 2 ** 20)
+    finally:
+        process.terminate()
+        process.wait()
+    samples = samples[1:]
+    results = {}
+    for name, _, _ in INTERACTIONS:
+        runs = [s[name] for s in samples]
+        results[name] = {key: statistics.mean(r[key] for r in runs)
+                         for key in ('cpu', 'wall', 'sent', 'bytes', 'messages')}
+    return {'app': os.path.basename(app), 'rounds': rounds, 'options': list(options), 'results': results,
+            'rss_mb': rss}
+
+
+def report(results, old=None):
+    """Print the per-interaction table, with the old CPU time alongside when given"""
+    header = f"  {'interaction':<26} {'cpu ms':>8} {'wall ms':>8} {'sent':>5} {'kB out':>8}"
+    if old:
+        header += f" {'old cpu ms':>11} {'ratio':>7}"
+    print(header)
+    for name, r in results['results'].items():
+        line = (f"  {name:<26} {r['cpu'] * 1000:>8.0f} {r['wall'] * 1000:>8.0f} {r['sent']:>5.0f} "
+                f"{r['bytes'] / 1024:>8.1f}")
+        if old and name in old['results']:
+            before = old['results'][name]['cpu']
+            ratio = f"{r['cpu'] / before:>6.2f}x" if before else f"{'-':>7}"
+            line += f" {before * 1000:>11.0f} {ratio}"
+        print(line)
+    total = sum(r['cpu'] for r in results['results'].values())
+    print(f"  {'whole sequence':<26} {total * 1000:>8.0f}" + (
+        f"{'':>24} {sum(r['cpu'] for r in old['results'].values()) * 1000:>11.0f}" if old else ''))
+    rss = results.get('rss_mb')
+    if rss and len(rss) > 1:
+        # Growth is measured from the end of the warm-up round, once the caches are filled
+        print(f"  server RSS: {rss[1]:.0f} MB after the first counted round, {rss[-1]:.0f} MB after the last "
+              f"({rss[-1] - rss[1]:+.1f} MB over {len(rss) - 2} rounds; peak {max(rss):.0f} MB)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Server CPU per interaction for the Streamlit app")
+    parser.add_argument('--app', default=APP)
+    parser.add_argument('--rounds', type=int, default=ROUNDS)
+    parser.add_argument('--output', default=RESULTS_FILE)
+    parser.add_argument('--compare', default=None, help="earlier results file to compare against")
+    parser.add_argument('--option', action='append', default=[],
+                        help="Streamlit config setting for the server, e.g. runner.postScriptGC=true")
+    args = parser.parse_args(argv)
+
+    results = profile(args.app, args.rounds, args.option)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    old = None
+    if args.compare:
+        with open(args.compare) as f:
+            old = json.load(f)
+    report(results, old)
+    print(f"Wrote {args.output}")
+
+
+if __name__ == '__main__':
+    main()
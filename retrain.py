@@ -0,0 +1,207 @@
+"""Incremental retraining of the emission forest from accumulated trip logs.
+
+Trip logs are CSV files (same columns as the trip dataset, including
+``CO2_Emission_kg``) dropped into or appended to a log directory. Each run
+reads only the bytes added since the previous run, fits a small batch of new
+trees on those trips, appends them to the compiled forest of the current
+bundle and retires the oldest trees beyond ``--max-trees``. The result is
+written as a numbered bundle under ``model_versions/`` and then published as
+``co2_emission_model.bundle``, which ``load_model()`` reloads on its next
+call. Run cost depends on the new records only; the history is never re-read.
+
+    python retrain.py                       # ingest trip_logs/*.csv
+    python retrain.py --logs /data/trips --new-trees 30 --max-trees 300
+"""
+import argparse
+import glob
+import io
+import json
+import os
+import shutil
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from emission_model import BUNDLE_FILE, FEATURE_COLUMNS, MODEL_DIR, TripEncoder
+from forest_engine import CompiledForest
+from model_bundle import build_from_pickles, read_bundle, write_bundle
+
+TARGET_COLUMN = 'CO2_Emission_kg'
+TRIP_LOG_DIR = 'trip_logs'
+VERSIONS_DIR = 'model_versions'
+STATE_FILE = 'retrain_state.json'
+NEW_TREES = 20  # trees grown per run
+MAX_TREES = 200  # oldest trees are retired beyond this
+MIN_NEW_ROWS = 500  # fewer new trips than this waits for the next run
+
+
+# =============================================
+# TRIP LOG INGESTION
+# =============================================
+def load_state(model_dir=MODEL_DIR):
+    """Last published version and how far each log file has been consumed"""
+    try:
+        with open(os.path.join(model_dir, STATE_FILE)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {'version': 0, 'offsets': {}, 'runs': []}
+
+
+def save_state(state, model_dir=MODEL_DIR):
+    path = os.path.join(model_dir, STATE_FILE)
+    with open(f"{path}.tmp", 'w') as f:
+        json.dump(state, f, indent=2)
+    os.replace(f"{path}.tmp", path)
+
+
+def read_new_records(log_dir, offsets):
+    """Trips appended to log_dir since offsets; returns (frame, new offsets).
+
+    Only complete lines are consumed, so a log that is being written to is
+    picked up where it left off on the next run.
+    """
+    frames = []
+    offsets = dict(offsets)
+    for path in sorted(glob.glob(os.path.join(log_dir, '*.csv'))):
+        name = os.path.basename(path)
+        with open(path, 'rb') as f:
+            header = f.readline()
+            start = max(offsets.get(name, 0), len(header))
+            if start > os.fstat(f.fileno()).st_size:
+                start = len(header)  # the file was replaced by a shorter one
+            f.seek(start)
+            data = f.read()
+        end = data.rfind(b'\n') + 1
+        if end:
+            frames.append(pd.read_csv(io.BytesIO(header + data[:end])))
+        offsets[name] = start + end
+    trips = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    return trips, offsets
+
+
+def encode_records(trips, vocabularies):
+    """Encode trips with the bundle's vocabularies; returns (X, y, rows skipped).
+
+    Rows with missing values or categories the forest has never seen are
+    skipped: adding a class would renumber the codes the existing trees split on.
+    """
+    missing = [col for col in FEATURE_COLUMNS + [TARGET_COLUMN] if col not in trips.columns]
+    if missing:
+        raise ValueError(f"Trip logs are missing columns: {', '.join(missing)}")
+    complete = trips[FEATURE_COLUMNS + [TARGET_COLUMN]].notna().all(axis=1).to_numpy()
+    X, unknown_rows, _ = TripEncoder(vocabularies, unknown='reject').encode(trips[complete])
+    y = trips[TARGET_COLUMN].to_numpy(dtype=np.float64)[complete][~unknown_rows]
+    return X, y, int((~complete).sum() + unknown_rows.sum())
+
+
+# =============================================
+# ENSEMBLE UPDATE
+# =============================================
+def grow_forest(forest, metadata, X, y, version, new_trees=NEW_TREES, max_trees=MAX_TREES,
+                max_depth=12, min_samples_split=5, n_jobs=-1):
+    """Append trees fitted on (X, y) to forest; returns (forest, metadata)"""
+    from sklearn.ensemble import RandomForestRegressor
+
+    model = RandomForestRegressor(n_estimators=new_trees, max_depth=max_depth,
+                                  min_samples_split=min_samples_split, random_state=version, n_jobs=n_jobs)
+    model.fit(X, y)
+    grown = CompiledForest.concat([forest, CompiledForest.from_sklearn(model)])
+    tree_versions = metadata.get('tree_versions', [0] * forest.n_trees) + [version] * new_trees
+
+    # Each tree carries the importance profile of the batch it was fitted in
+    old_importances = np.asarray(metadata.get('feature_importances', np.zeros(len(FEATURE_COLUMNS))))
+    importances = np.concatenate([np.tile(old_importances, (forest.n_trees, 1)),
+                                  np.tile(model.feature_importances_, (new_trees, 1))])
+    if grown.n_trees > max_trees:
+        keep = np.arange(grown.n_trees - max_trees, grown.n_trees)
+        grown = grown.select_trees(keep)
+        tree_versions = [tree_versions[i] for i in keep]
+        importances = importances[keep]
+
+    # Counts every trip fitted on so far, including batches whose trees have since been retired
+    training_rows = metadata.get('training_rows')
+    metadata = dict(metadata, source='retrain.py', version=version, n_estimators=grown.n_trees,
+                    tree_versions=tree_versions, feature_importances=importances.mean(axis=0).tolist(),
+                    training_rows=None if training_rows is None else training_rows + len(y))
+    return grown, metadata
+
+
+def publish(model_dir, version, forest, vocabularies, metadata):
+    """Write the numbered bundle, then atomically swap it in as the live one"""
+    versions_dir = os.path.join(model_dir, VERSIONS_DIR)
+    os.makedirs(versions_dir, exist_ok=True)
+    versioned = os.path.join(versions_dir, f"co2_emission_model-v{version:04d}.bundle")
+    write_bundle(versioned, forest, vocabularies, metadata)
+    live = os.path.join(model_dir, BUNDLE_FILE)
+    # Processes that memory-mapped the old bundle keep reading the old inode
+    shutil.copyfile(versioned, f"{live}.tmp")
+    os.replace(f"{live}.tmp", live)
+    return versioned
+
+
+def retrain(model_dir=MODEL_DIR, log_dir=None, new_trees=NEW_TREES, max_trees=MAX_TREES,
+            min_rows=MIN_NEW_ROWS, max_depth=12, min_samples_split=5, n_jobs=-1, verbose=True):
+    """Run one incremental update; returns the run record, or None if there was too little new data"""
+    log_dir = log_dir or os.path.join(model_dir, TRIP_LOG_DIR)
+    start = time.perf_counter()
+    state = load_state(model_dir)
+    bundle = os.path.join(model_dir, BUNDLE_FILE)
+    if not os.path.exists(bundle):
+        build_from_pickles(model_dir, bundle)
+    forest, vocabularies, metadata = read_bundle(bundle)
+
+    trips, offsets = read_new_records(log_dir, state['offsets'])
+    if len(trips) < min_rows:
+        if verbose:
+            print(f"{len(trips):,} new trips in {log_dir}; waiting for at least {min_rows:,}")
+        return None
+    X, y, skipped = encode_records(trips, vocabularies)
+    read_seconds = time.perf_counter() - start
+    if not len(X):
+        # Nothing usable; consume the records so they are not re-read every run
+        save_state(dict(state, offsets=offsets), model_dir)
+        if verbose:
+            print(f"All {skipped:,} new trips were skipped (missing values or unknown categories)")
+        return None
+
+    version = state['version'] + 1
+    forest, metadata = grow_forest(forest, metadata, X, y, version, new_trees, max_trees,
+                                   max_depth, min_samples_split, n_jobs)
+    path = publish(model_dir, version, forest, vocabularies, metadata)
+
+    run = {
+        'version': version,
+        'finished_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'new_rows': len(trips),
+        'trained_rows': len(X),
+        'skipped_rows': skipped,
+        'n_trees': forest.n_trees,
+        'seconds': {'read': round(read_seconds, 3), 'total': round(time.perf_counter() - start, 3)},
+        'bundle': os.path.relpath(path, model_dir),
+    }
+    save_state({'version': version, 'offsets': offsets, 'runs': state['runs'] + [run]}, model_dir)
+    if verbose:
+        print(f"v{version}: {run['trained_rows']:,} new trips ({skipped:,} skipped), "
+              f"{forest.n_trees} trees, read {run['seconds']['read']:.2f} s, "
+              f"total {run['seconds']['total']:.2f} s -> {path}")
+    return run
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Grow the emission forest on newly logged trips")
+    parser.add_argument('--model-dir', default=MODEL_DIR)
+    parser.add_argument('--logs', default=None, help=f"trip log directory (default <model-dir>/{TRIP_LOG_DIR})")
+    parser.add_argument('--new-trees', type=int, default=NEW_TREES)
+    parser.add_argument('--max-trees', type=int, default=MAX_TREES)
+    parser.add_argument('--min-rows', type=int, default=MIN_NEW_ROWS)
+    parser.add_argument('--max-depth', type=int, default=12)
+    parser.add_argument('--jobs', type=int, default=-1)
+    args = parser.parse_args(argv)
+    retrain(args.model_dir, args.logs, args.new_trees, args.max_trees, args.min_rows,
+            args.max_depth, n_jobs=args.jobs)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,182 @@
+"""Headless trip scoring: batch CSV scoring, single-trip prediction and a local HTTP endpoint.
+
+    python score_cli.py score trips.csv -o scored.csv.gz
+    python score_cli.py score trips.csv -o scored.csv.gz --store   # also append to the trip history
+    python score_cli.py predict --distance 500 --fuel Diesel --fuel-liters 25 --speed 60 \\
+        --traffic Medium --weather Clear --cargo 3000
+    python score_cli.py serve --port 8765
+"""
+import argparse
+import io
+import json
+import sys
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+
+from emission_model import (BULK_CHUNK_ROWS, BULK_UNKNOWN_POLICY, CATEGORICAL_COLUMNS, FEATURE_COLUMNS,
+                            UNKNOWN_POLICIES, UnknownCategoryError, calculate_trees_needed,
+                            industry_average_emission, load_predictor)
+from trip_store import TRIP_STORE_FILE, TripStore
+
+
+def score_file(predictor, src, dest, chunk_rows=BULK_CHUNK_ROWS, unknown=BULK_UNKNOWN_POLICY, store=None):
+    """Stream-score a trip CSV into dest; returns (trips read, trips dropped or left unscored).
+
+    With a TripStore, the scored trips are appended to the trip history as well.
+    """
+    rows = 0
+    unknown_rows = 0
+    compression = 'gzip' if str(dest).endswith('.gz') else None
+    for chunk in predictor.score_chunks(src, chunk_rows=chunk_rows, unknown=unknown):
+        unknown_rows += chunk.attrs['encoding']['unscored_rows']
+        if store is not None:
+            store.add(chunk, source='bulk')
+        if dest == '-':
+            chunk.to_csv(sys.stdout, header=rows == 0, index=False)
+        else:
+            chunk.to_csv(dest, mode='w' if rows == 0 else 'a', header=rows == 0,
+                         index=False, compression=compression)
+        rows += chunk.attrs['encoding']['rows']
+    return rows, unknown_rows
+
+
+def trip_result(trip, prediction):
+    """JSON-ready result for one trip"""
+    return {
+        'Predicted_CO2_kg': prediction,
+        'Industry_Avg_CO2_kg': industry_average_emission(trip['Distance_km'], trip['Cargo_Weight_kg']),
+        'Trees_Needed_1y': calculate_trees_needed(prediction, 1),
+    }
+
+
+# =============================================
+# HTTP SCORING ENDPOINT
+# =============================================
+def make_handler(predictor):
+    class ScoringHandler(BaseHTTPRequestHandler):
+        """GET /health, POST /predict (JSON trip or list) and POST /score (CSV)"""
+
+        def _send(self, status, body, content_type='application/json'):
+            if not isinstance(body, bytes):
+                body = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _body(self):
+            return self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+        def do_GET(self):
+            if self.path == '/health':
+                self._send(200, {'status': 'ok', 'trees': predictor.forest.n_trees})
+            else:
+                self._send(404, {'error': f'unknown path {self.path}'})
+
+        def do_POST(self):
+            try:
+                if self.path == '/predict':
+                    payload = json.loads(self._body())
+                    trips = payload if isinstance(payload, list) else [payload]
+                    frame = pd.DataFrame(trips, columns=FEATURE_COLUMNS)
+                    # JSON clients may send numbers as strings, e.g. "500"
+                    numeric = [col for col in FEATURE_COLUMNS if col not in CATEGORICAL_COLUMNS]
+                    frame[numeric] = frame[numeric].apply(pd.to_numeric).astype(float)
+                    predictions = predictor.predict(frame)
+                    results = [trip_result(trip, float(p))
+                               for trip, p in zip(frame[numeric].to_dict('records'), predictions)]
+                    self._send(200, {'predictions': results})
+                elif self.path == '/score':
+                    scored = predictor.score(pd.read_csv(io.BytesIO(self._body())))
+                    self._send(200, scored.to_csv(index=False).encode(), 'text/csv')
+                else:
+                    self._send(404, {'error': f'unknown path {self.path}'})
+            except (ValueError, KeyError, TypeError) as e:
+                self._send(400, {'error': str(e)})
+
+    return ScoringHandler
+
+
+def serve(predictor, host, port):
+    server = ThreadingHTTPServer((host, port), make_handler(predictor))
+    print(f"Scoring endpoint on http://{host}:{port} (POST /predict, POST /score, GET /health)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+# =============================================
+# COMMAND LINE
+# =============================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score logistics trips with the CO2 emission model")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p_score = sub.add_parser('score', help="score a trip CSV in chunks")
+    p_score.add_argument('trips', help="input CSV, or - for stdin")
+    p_score.add_argument('-o', '--output', default='-', help="output CSV (.gz to compress), default stdout")
+    p_score.add_argument('--chunk-rows', type=int, default=BULK_CHUNK_ROWS)
+    p_score.add_argument('--unknown', choices=UNKNOWN_POLICIES, default=BULK_UNKNOWN_POLICY,
+                         help="trips with unseen categories: error aborts, reject drops them, fallback "
+                              "substitutes a default class, flag keeps them unscored (default %(default)s)")
+    p_score.add_argument('--store', nargs='?', const=TRIP_STORE_FILE, default=None,
+                         help="append the scored trips to the trip history (default file %(const)s)")
+
+    p_predict = sub.add_parser('predict', help="predict a single trip")
+    p_predict.add_argument('--distance', type=float, required=True, help="km")
+    p_predict.add_argument('--fuel', required=True)
+    p_predict.add_argument('--fuel-liters', type=float, required=True)
+    p_predict.add_argument('--speed', type=float, required=True, help="average km/h")
+    p_predict.add_argument('--traffic', required=True)
+    p_predict.add_argument('--weather', required=True)
+    p_predict.add_argument('--cargo', type=float, required=True, help="kg")
+
+    p_serve = sub.add_parser('serve', help="run a local HTTP scoring endpoint")
+    p_serve.add_argument('--host', default='127.0.0.1')
+    p_serve.add_argument('--port', type=int, default=8765)
+
+    args = parser.parse_args(argv)
+    predictor = load_predictor()
+
+    if args.command == 'score':
+        store = TripStore(args.store) if args.store else None
+        start = time.perf_counter()
+        try:
+            rows, unknown_rows = score_file(predictor, sys.stdin if args.trips == '-' else args.trips,
+                                            args.output, chunk_rows=args.chunk_rows, unknown=args.unknown,
+                                            store=store)
+        except UnknownCategoryError as e:
+            sys.exit(f"{e} (use --unknown to score around them)")
+        except (ValueError, OSError) as e:
+            sys.exit(f"Cannot score {args.trips}: {e}")
+        finally:
+            if store is not None:
+                store.close()
+        elapsed = time.perf_counter() - start
+        print(f"Scored {rows:,} trips in {elapsed:.2f}s ({rows / max(elapsed, 1e-9):,.0f} trips/s)",
+              file=sys.stderr)
+        if unknown_rows:
+            print(f"{unknown_rows:,} trips had empty values or unknown categories ({args.unknown})",
+                  file=sys.stderr)
+    elif args.command == 'predict':
+        trip = {'Distance_km': args.distance, 'Fuel_Type': args.fuel,
+                'Fuel_Consumed_Liters': args.fuel_liters, 'Avg_Speed_kmph': args.speed,
+                'Traffic_Level': args.traffic, 'Weather_Condition': args.weather,
+                'Cargo_Weight_kg': args.cargo}
+        try:
+            prediction = float(predictor.predict(pd.DataFrame([trip]))[0])
+        except (UnknownCategoryError, ValueError) as e:
+            sys.exit(f"Cannot predict this trip: {e}")
+        print(json.dumps(trip_result(trip, prediction), indent=2))
+    else:
+        serve(predictor, args.host, args.port)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""What-if sweeps of one or two trip features, scored in a single batched predict.
+
+The current trip is copied once per grid cell with the swept columns
+overwritten, so a 20 x 25 grid is one 500-row prediction rather than 500
+separate scans.
+"""
+import numpy as np
+from matplotlib.figure import Figure
+
+from emission_model import CATEGORICAL_COLUMNS, FEATURE_COLUMNS
+
+# Sweep ranges default to the ranges the model was trained on (see train_model.py)
+SWEEP_RANGES = {
+    'Distance_km': (50.0, 2000.0),
+    'Fuel_Consumed_Liters': (10.0, 500.0),
+    'Avg_Speed_kmph': (30.0, 100.0),
+    'Cargo_Weight_kg': (500.0, 10000.0),
+}
+FEATURE_LABELS = {
+    'Distance_km': 'Distance (km)',
+    'Fuel_Type': 'Fuel Type',
+    'Fuel_Consumed_Liters': 'Fuel Consumed (L)',
+    'Avg_Speed_kmph': 'Average Speed (km/h)',
+    'Traffic_Level': 'Traffic Level',
+    'Weather_Condition': 'Weather Condition',
+    'Cargo_Weight_kg': 'Cargo Weight (kg)',
+}
+DEFAULT_POINTS = 25
+
+
+def sweep_values(predictor, feature, lo=None, hi=None, points=DEFAULT_POINTS):
+    """Values to sweep: every class for categoricals, an even grid for numbers"""
+    if feature in CATEGORICAL_COLUMNS:
+        return list(predictor.vocabularies()[feature])
+    default_lo, default_hi = SWEEP_RANGES[feature]
+    return list(np.linspace(default_lo if lo is None else lo, default_hi if hi is None else hi, points))
+
+
+def _encoded(predictor, feature, values):
+    if feature not in CATEGORICAL_COLUMNS:
+        return np.asarray(values, dtype=np.float64)
+    encoder = {'Fuel_Type': predictor.le_fuel, 'Traffic_Level': predictor.le_traffic,
+               'Weather_Condition': predictor.le_weather}[feature]
+    return np.asarray(encoder.transform(np.asarray(values, dtype=object)), dtype=np.float64)
+
+
+def sweep(predictor, trip, x_feature, x_values, y_feature=None, y_values=None):
+    """Predicted CO2 (kg) over the grid; shape (len(y_values), len(x_values)) or (len(x_values),)
+
+    trip is one raw trip (dict of FEATURE_COLUMNS values); the whole grid is
+    scored with one predict_encoded call.
+    """
+    import pandas as pd
+
+    # Encoding the one base row directly skips a one-row DataFrame, which costs more than the grid walk
+    base = np.array([_encoded(predictor, feature, [trip[feature]])[0] for feature in FEATURE_COLUMNS])
+    xs = _encoded(predictor, x_feature, x_values)
+    ys = _encoded(predictor, y_feature, y_values) if y_feature else np.zeros(1)
+    grid = np.tile(base, (len(ys) * len(xs), 1))
+    grid[:, FEATURE_COLUMNS.index(x_feature)] = np.tile(xs, len(ys))
+    if y_feature:
+        grid[:, FEATURE_COLUMNS.index(y_feature)] = np.repeat(ys, len(xs))
+    predicted = np.asarray(predictor.predict_encoded(pd.DataFrame(grid, columns=FEATURE_COLUMNS)))
+    return predicted.reshape(len(ys), len(xs)) if y_feature else predicted
+
+
+def _tick_labels(feature, values):
+    if feature in CATEGORICAL_COLUMNS:
+        return [str(v) for v in values]
+    return [f"{v:,.0f}" for v in values]
+
+
+def render_heatmap(grid, x_feature, x_values, y_feature, y_values, trip=None, figsize=(9, 4.5)):
+    """Heatmap of a two-feature sweep, with the current trip marked when it lies on the grid"""
+    fig = Figure(figsize=figsize)
+    ax = fig.add_subplot(111)
+    image = ax.imshow(grid, aspect='auto', origin='lower', cmap='viridis')
+    fig.colorbar(image, ax=ax, label='Predicted CO₂ (kg)')
+    for axis, feature, values in ((ax.xaxis, x_feature, x_values), (ax.yaxis, y_feature, y_values)):
+        step = max(len(values) // 8, 1)
+        axis.set_ticks(range(0, len(values), step))
+        axis.set_ticklabels(_tick_labels(feature, values)[::step])
+    ax.set_xlabel(FEATURE_LABELS[x_feature])
+    ax.set_ylabel(FEATURE_LABELS[y_feature])
+    if trip is not None:
+        position = [_nearest(values, trip[feature]) for feature, values in ((x_feature, x_values), (y_feature, y_values))]
+        if None not in position:
+            ax.plot(*position, marker='o', markersize=10, markerfacecolor='none', markeredgecolor='white')
+    ax.set_title('What-if: predicted emissions', pad=12)
+    return fig
+
+
+def _nearest(values, current):
+    """Grid index of the current value (exact match for categories)"""
+    if isinstance(current, str):
+        return values.index(current) if current in values else None
+    lo, hi = min(values), max(values)
+    if not lo <= current <= hi:
+        return None
+    return int(np.argmin(np.abs(np.asarray(values) - current)))
@@ -0,0 +1,74 @@
+"""Per-page cold-start report for the Streamlit app.
+
+Each page is rendered in a fresh interpreter with Streamlit's AppTest harness,
+recording the time to first render, the time of a warm rerun and which heavy
+libraries the page pulled in. Import costs of those libraries are measured on
+their own in fresh interpreters too.
+
+    python startup_report.py
+"""
+import json
+import os
+import subprocess
+import sys
+
+APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'carbon_emission_predictor.py')
+PAGES = ["📊 Emission Scan", "🌳 Offset Simulator", "📈 Data Explorer", "⚙️ AI Model Lab", "🔬 Fuel Science"]
+HEAVY_MODULES = ['pandas', 'matplotlib.pyplot', 'sklearn.ensemble', 'joblib']
+
+_PAGE_PROBE = """
+import json, sys, time
+sys.path.insert(0, {app_dir!r})
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file({app!r}, default_timeout=300)
+at.session_state['app_mode'] = {page!r}
+start = time.perf_counter()
+at.run()
+first = time.perf_counter() - start
+start = time.perf_counter()
+at.run()
+warm = time.perf_counter() - start
+print(json.dumps({{'first': first, 'warm': warm, 'errors': len(at.exception),
+                   'loaded': [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+_IMPORT_PROBE = """
+import time
+start = time.perf_counter()
+import {module}
+print(time.perf_counter() - start)
+"""
+
+
+def _run(code):
+    out = subprocess.run([sys.executable, '-W', 'ignore', '-c', code], capture_output=True,
+                         text=True, check=True, cwd=os.path.dirname(APP))
+    return out.stdout.strip().splitlines()[-1]
+
+
+def import_costs():
+    """Seconds to import each heavy module in a fresh interpreter"""
+    return {module: float(_run(_IMPORT_PROBE.format(module=module))) for module in HEAVY_MODULES}
+
+
+def page_costs():
+    """First-render and warm-rerun seconds for each page in a fresh interpreter"""
+    results = {}
+    for page in PAGES:
+        code = _PAGE_PROBE.format(app_dir=os.path.dirname(APP), app=APP, page=page, heavy=HEAVY_MODULES)
+        results[page] = json.loads(_run(code))
+    return results
+
+
+if __name__ == '__main__':
+    print("Import cost (fresh interpreter)")
+    for module, seconds in import_costs().items():
+        print(f"  {module:<20} {seconds * 1000:>8.0f} ms")
+
+    print("\nTime to first render per page (fresh interpreter)")
+    print(f"  {'page':<22} {'first ms':>9} {'rerun ms':>9}  heavy modules loaded")
+    for page, r in page_costs().items():
+        note = ', '.join(r['loaded']) or '-'
+        if r['errors']:
+            note += f"  ({r['errors']} exception(s))"
+        print(f"  {page:<22} {r['first'] * 1000:>9.0f} {r['warm'] * 1000:>9.0f}  {note}")
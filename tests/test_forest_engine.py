@@ -0,0 +1,270 @@
+"""Parity of CompiledForest with the sklearn forest it was flattened from.
+
+    python -m pytest tests
+"""
+import os
+
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+
+import forest_engine
+from emission_model import (BUNDLE_FILE, COMPILED_MAX_ROWS, MODEL_DIR, MODEL_FILES, load_pickled_predictor,
+                            load_predictor)
+from forest_engine import CompiledForest, NativeForest, check_parity
+from model_bundle import BundleError, read_bundle, write_bundle
+from train_model import encode_features, fit_encoders, generate_trips
+
+PARITY_RTOL = 1e-9
+PARITY_ATOL = 1e-9
+QUANTILES = (0.05, 0.5, 0.95)
+
+# Rows are passed as bare arrays on purpose; the forest was fitted on named columns
+pytestmark = pytest.mark.filterwarnings('ignore:X does not have valid feature names')
+
+
+@pytest.fixture(scope='module')
+def trips():
+    return generate_trips(3_000, seed=7)
+
+
+@pytest.fixture(scope='module')
+def encoders(trips):
+    return fit_encoders(trips)
+
+
+@pytest.fixture(scope='module')
+def model(trips, encoders):
+    model = RandomForestRegressor(n_estimators=12, max_depth=10, min_samples_split=5, random_state=0)
+    return model.fit(encode_features(trips, encoders), trips['CO2_Emission_kg'])
+
+
+@pytest.fixture(scope='module')
+def forest(model):
+    return CompiledForest.from_sklearn(model)
+
+
+@pytest.fixture(scope='module')
+def rows(model):
+    return forest_engine._random_trips(model, 2_000, seed=1)
+
+
+def _threshold_rows(forest, rows):
+    """Rows sitting exactly on, and one float32 step either side of, split thresholds"""
+    internal = np.flatnonzero(forest.children[:, 0] != np.arange(forest.node_count))
+    picked = np.random.default_rng(2).choice(internal, 200, replace=False)
+    base = rows.iloc[:len(picked)].to_numpy(dtype=np.float32)
+    out = []
+    for row, node in zip(base, picked):
+        value = np.float32(forest.threshold[node])
+        for x in (value, np.nextafter(value, np.float32(-np.inf)), np.nextafter(value, np.float32(np.inf))):
+            row = row.copy()
+            row[forest.feature[node]] = x
+            out.append(row)
+    return np.array(out)
+
+
+def assert_parity(model, forest, X):
+    np.testing.assert_allclose(forest.predict(X), model.predict(X), rtol=PARITY_RTOL, atol=PARITY_ATOL)
+
+
+# =============================================
+# PREDICTION PARITY
+# =============================================
+def test_random_rows_match_sklearn(model, forest, rows):
+    assert_parity(model, forest, rows)
+
+
+def test_training_rows_match_sklearn(model, forest, trips, encoders):
+    assert_parity(model, forest, encode_features(trips, encoders))
+
+
+def test_rows_on_split_thresholds_match_sklearn(model, forest, rows):
+    assert_parity(model, forest, _threshold_rows(forest, rows))
+
+
+@pytest.mark.parametrize('value', [0.0, -1.0, 1e-30, 1e30, -1e30, np.finfo(np.float32).max])
+def test_extreme_values_match_sklearn(model, forest, rows, value):
+    X = rows.iloc[:5].to_numpy(dtype=np.float64)
+    for col in range(X.shape[1]):
+        extreme = X.copy()
+        extreme[:, col] = value
+        assert_parity(model, forest, extreme)
+
+
+def test_single_row(model, forest, rows):
+    one = rows.iloc[:1]
+    assert_parity(model, forest, one)
+    np.testing.assert_array_equal(forest.predict(one.to_numpy()[0]), forest.predict(one))
+
+
+def test_columns_are_reordered_by_name(model, forest, rows):
+    shuffled = rows[list(reversed(rows.columns))]
+    np.testing.assert_array_equal(forest.predict(shuffled), forest.predict(rows))
+
+
+def test_blocks_match_one_pass(model, forest, rows, monkeypatch):
+    expected = forest.predict_trees(rows)
+    monkeypatch.setattr(forest_engine, 'BLOCK_CELLS', forest.n_trees * 7)
+    np.testing.assert_array_equal(forest.predict_trees(rows), expected)
+    assert_parity(model, forest, rows)
+
+
+@pytest.mark.skipif(not os.path.exists(os.path.join(MODEL_DIR, MODEL_FILES[0])), reason="no pickled model")
+def test_shipped_model_matches_sklearn():
+    predictor = load_pickled_predictor()
+    X = forest_engine._random_trips(predictor.model, 5_000, seed=3)
+    assert_parity(predictor.model, predictor.forest, X)
+
+
+def test_check_parity_reports_max_difference(model, forest, rows):
+    assert check_parity(model, forest, rows) <= PARITY_ATOL
+
+
+def test_per_tree_outputs_match_estimators(model, forest, rows):
+    X = rows.to_numpy(dtype=np.float32)
+    expected = np.column_stack([tree.predict(X) for tree in model.estimators_])
+    np.testing.assert_array_equal(forest.predict_trees(rows), expected)
+
+
+# =============================================
+# NATIVE TREE WALK
+# =============================================
+def test_native_forest_from_compiled_matches_sklearn(model, forest, rows):
+    native = NativeForest.from_compiled(forest)
+    assert native.n_trees == forest.n_trees
+    assert_parity(model, native, rows)
+    assert_parity(model, native, _threshold_rows(forest, rows))
+
+
+def test_native_forest_keeps_float32_forests(forest, rows):
+    small = CompiledForest(forest.feature, forest.threshold.astype(np.float32), forest.children,
+                           forest.value.astype(np.float32), forest.roots, forest.max_depth, forest.feature_names)
+    np.testing.assert_allclose(NativeForest.from_compiled(small).predict(rows), small.predict(rows),
+                               rtol=PARITY_RTOL, atol=PARITY_ATOL)
+
+
+@pytest.fixture
+def bundle_predictor(forest, encoders, tmp_path):
+    write_bundle(tmp_path / BUNDLE_FILE, forest, {col: enc.classes_ for col, enc in encoders.items()})
+    return load_predictor(tmp_path)
+
+
+def test_bundle_predictor_uses_native_walk_for_large_batches(model, bundle_predictor, rows):
+    assert bundle_predictor.model is None
+    small = rows.iloc[:COMPILED_MAX_ROWS]
+    bundle_predictor.predict_encoded(small)
+    assert bundle_predictor._native is None
+    large = rows.iloc[:COMPILED_MAX_ROWS + 1]
+    np.testing.assert_allclose(bundle_predictor.predict_encoded(large), model.predict(large),
+                               rtol=PARITY_RTOL, atol=PARITY_ATOL)
+    assert isinstance(bundle_predictor._native, NativeForest)
+
+
+# =============================================
+# PREDICTION INTERVALS
+# =============================================
+def test_interval_matches_numpy(forest, rows, monkeypatch):
+    monkeypatch.setattr(forest_engine, 'BLOCK_CELLS', forest.n_trees * 300)
+    trees = forest.predict_trees(rows)
+    mean, std, bounds = forest.predict_interval(rows, QUANTILES)
+    np.testing.assert_allclose(mean, trees.mean(axis=1), rtol=1e-12)
+    np.testing.assert_allclose(std, trees.std(axis=1), rtol=1e-12, atol=1e-12)
+    np.testing.assert_allclose(bounds, np.quantile(trees, QUANTILES, axis=1).T, rtol=1e-12)
+
+
+@pytest.mark.parametrize('source', ['sklearn', 'compiled'])
+def test_native_interval_matches_compiled(model, forest, rows, source):
+    native = NativeForest.from_sklearn(model) if source == 'sklearn' else NativeForest.from_compiled(forest)
+    for got, expected in zip(native.predict_interval(rows, QUANTILES), forest.predict_interval(rows, QUANTILES)):
+        np.testing.assert_allclose(got, expected, rtol=PARITY_RTOL, atol=PARITY_ATOL)
+
+
+def test_bundle_predictor_takes_native_interval_path(forest, bundle_predictor, rows, monkeypatch):
+    calls = []
+    native_interval = NativeForest.predict_interval
+    monkeypatch.setattr(NativeForest, 'predict_interval',
+                        lambda self, *args: calls.append(len(args[0])) or native_interval(self, *args))
+    large = rows.iloc[:COMPILED_MAX_ROWS + 1]
+    got = bundle_predictor.predict_interval_encoded(large, QUANTILES)
+    assert calls == [len(large)]
+    mean, _, bounds = forest.predict_interval(large, QUANTILES)
+    np.testing.assert_allclose(got, np.column_stack([mean, bounds]), rtol=PARITY_RTOL, atol=PARITY_ATOL)
+    bundle_predictor.predict_interval_encoded(rows.iloc[:10], QUANTILES)
+    assert calls == [len(large)]
+
+
+# =============================================
+# CONCAT AND SELECT_TREES
+# =============================================
+def test_select_trees_keeps_the_chosen_trees(forest, rows):
+    picked = [9, 0, 4, 4]
+    selected = forest.select_trees(picked)
+    assert selected.n_trees == len(picked)
+    np.testing.assert_array_equal(selected.predict_trees(rows), forest.predict_trees(rows)[:, picked])
+
+
+def test_concat_of_split_forest_matches_whole(model, forest, rows):
+    halves = [forest.select_trees(range(0, 5)), forest.select_trees(range(5, forest.n_trees))]
+    joined = CompiledForest.concat(halves)
+    assert joined.n_trees == forest.n_trees
+    assert joined.node_count == forest.node_count
+    np.testing.assert_array_equal(joined.predict_trees(rows), forest.predict_trees(rows))
+    assert_parity(model, joined, rows)
+
+
+def test_concat_of_separate_forests(model, forest, rows, trips, encoders):
+    other = RandomForestRegressor(n_estimators=3, max_depth=4, random_state=1)
+    other.fit(encode_features(trips, encoders), trips['CO2_Emission_kg'])
+    other_forest = CompiledForest.from_sklearn(other)
+    joined = CompiledForest.concat([forest, other_forest])
+    assert joined.max_depth == max(forest.max_depth, other_forest.max_depth)
+    expected = np.hstack([forest.predict_trees(rows), other_forest.predict_trees(rows)])
+    np.testing.assert_array_equal(joined.predict_trees(rows), expected)
+    np.testing.assert_allclose(joined.predict(rows),
+                               (model.predict(rows) * 12 + other.predict(rows) * 3) / 15, rtol=PARITY_RTOL)
+
+
+# =============================================
+# BUNDLE ROUND TRIP
+# =============================================
+def test_bundle_round_trip(model, forest, rows, encoders, tmp_path):
+    path = tmp_path / 'model.bundle'
+    vocabularies = {col: enc.classes_ for col, enc in encoders.items()}
+    write_bundle(path, forest, vocabularies, {'source': 'test', 'training_rows': 3_000})
+    loaded, loaded_vocabularies, metadata = read_bundle(path)
+
+    for name in ('feature', 'threshold', 'children', 'value', 'roots'):
+        np.testing.assert_array_equal(getattr(loaded, name), getattr(forest, name))
+    assert loaded.max_depth == forest.max_depth
+    assert loaded.feature_names == forest.feature_names
+    assert loaded_vocabularies == {col: list(classes) for col, classes in vocabularies.items()}
+    assert metadata == {'source': 'test', 'training_rows': 3_000}
+    np.testing.assert_array_equal(loaded.predict(rows), forest.predict(rows))
+    assert_parity(model, loaded, rows)
+
+
+def test_bundle_keeps_float32_arrays(forest, rows, tmp_path):
+    small = CompiledForest(forest.feature, forest.threshold.astype(np.float32), forest.children,
+                           forest.value.astype(np.float32), forest.roots, forest.max_depth, forest.feature_names)
+    write_bundle(tmp_path / 'small.bundle', small, {})
+    loaded = read_bundle(tmp_path / 'small.bundle')[0]
+    assert loaded.threshold.dtype == np.float32 and loaded.value.dtype == np.float32
+    np.testing.assert_array_equal(loaded.predict(rows), small.predict(rows))
+
+
+def test_corrupt_bundle_is_rejected(forest, tmp_path):
+    path = tmp_path / 'model.bundle'
+    write_bundle(path, forest, {})
+    data = bytearray(path.read_bytes())
+    data[-1] ^= 0xFF
+    path.write_bytes(bytes(data))
+    with pytest.raises(BundleError, match='checksum'):
+        read_bundle(path)
+
+
+def test_non_bundle_is_rejected(tmp_path):
+    path = tmp_path / 'model.pkl'
+    path.write_bytes(b'not a bundle at all')
+    with pytest.raises(BundleError):
+        read_bundle(path)
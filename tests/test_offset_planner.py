@@ -0,0 +1,101 @@
+"""plan_offsets and schedule_table against the flat calculate_trees_needed.
+
+    python -m pytest tests
+"""
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from emission_model import TREE_ABSORPTION_PER_YEAR, calculate_trees_needed
+from offset_planner import (MAX_HORIZON_YEARS, SCHEDULE_COLUMNS, absorption_curve, export_schedule, plan_offsets,
+                            schedule_table)
+
+FLAT = {'growth_years': 0, 'mortality': 0}
+
+
+@pytest.fixture(scope='module')
+def emissions():
+    return np.random.default_rng(4).lognormal(6, 2, 500)
+
+
+@pytest.fixture(scope='module')
+def horizons(emissions):
+    return np.random.default_rng(5).integers(1, 31, len(emissions))
+
+
+# =============================================
+# AGAINST calculate_trees_needed
+# =============================================
+@pytest.mark.parametrize('years', [1, 5, 10, 30])
+def test_flat_curve_matches_calculate_trees_needed(emissions, years):
+    plan = plan_offsets(emissions, years, **FLAT)
+    np.testing.assert_allclose(plan['trees_exact'], calculate_trees_needed(emissions, years), rtol=1e-12)
+    np.testing.assert_array_equal(plan['trees'], np.ceil(calculate_trees_needed(emissions, years) - 1e-9))
+    np.testing.assert_allclose(plan['per_tree_kg'], TREE_ABSORPTION_PER_YEAR * years)
+
+
+def test_flat_curve_matches_per_plan_horizons(emissions, horizons):
+    plan = plan_offsets(emissions, horizons, **FLAT)
+    expected = [calculate_trees_needed(kg, years) for kg, years in zip(emissions, horizons)]
+    np.testing.assert_allclose(plan['trees_exact'], expected, rtol=1e-12)
+
+
+def test_whole_trees_are_not_rounded_up():
+    kg = TREE_ABSORPTION_PER_YEAR * 10 * np.array([1, 7, 250])
+    np.testing.assert_array_equal(plan_offsets(kg, 10, **FLAT)['trees'], [1, 7, 250])
+
+
+def test_growth_and_losses_need_more_trees_than_the_flat_rate(emissions, horizons):
+    plan = plan_offsets(emissions, horizons)
+    assert (plan['trees_exact'] > calculate_trees_needed(emissions, horizons)).all()
+    assert (plan['trees'] >= np.ceil(calculate_trees_needed(emissions, horizons) - 1e-9)).all()
+
+
+def test_scalar_matches_batch(emissions, horizons):
+    batch = plan_offsets(emissions, horizons)
+    for i in (0, 17, 499):
+        one = plan_offsets(emissions[i], horizons[i])
+        assert one['trees'][0] == batch['trees'][i]
+        assert one['trees_exact'][0] == pytest.approx(batch['trees_exact'][i], rel=1e-12)
+
+
+# =============================================
+# ABSORPTION CURVE AND SCHEDULE
+# =============================================
+def test_absorption_curve_matches_a_loop():
+    survival, annual, cumulative = absorption_curve(20, growth_years=4, mortality=0.05)
+    alive, total = 1.0, 0.0
+    for age in range(1, 21):
+        alive *= 0.95
+        total += alive * TREE_ABSORPTION_PER_YEAR * (1 - np.exp(-age / 4))
+        assert survival[age - 1] == pytest.approx(alive, rel=1e-12)
+        assert cumulative[age - 1] == pytest.approx(total, rel=1e-12)
+    np.testing.assert_allclose(np.diff(cumulative), annual[1:], rtol=1e-9)
+
+
+def test_schedule_reaches_each_target_by_its_horizon(emissions, horizons):
+    plan = plan_offsets(emissions, horizons)
+    table = schedule_table(plan, labels=[f"route-{i}" for i in range(len(emissions))])
+    assert list(table.columns) == SCHEDULE_COLUMNS
+    assert len(table) == horizons.sum()
+    last = table.groupby('Plan', sort=False).tail(1)
+    np.testing.assert_array_equal(last['Year'], horizons)
+    assert (last['Cumulative_kg'].to_numpy() >= emissions * (1 - 1e-9)).all()
+    assert (last['Remaining_kg'] <= emissions * 1e-9).all()
+
+
+def test_schedule_round_trips_through_csv(emissions):
+    plan = plan_offsets(emissions[:20], 5)
+    table = schedule_table(plan)
+    read = pd.read_csv(io.BytesIO(export_schedule(table, io.BytesIO()).getvalue()))
+    assert list(read.columns) == SCHEDULE_COLUMNS
+    np.testing.assert_allclose(read['Cumulative_kg'], table['Cumulative_kg'], atol=1e-3)
+
+
+@pytest.mark.parametrize('emissions_kg, years', [(100.0, 0), (100.0, MAX_HORIZON_YEARS + 1), (-1.0, 5),
+                                                  (np.nan, 5)])
+def test_bad_inputs_are_rejected(emissions_kg, years):
+    with pytest.raises(ValueError):
+        plan_offsets(emissions_kg, years)
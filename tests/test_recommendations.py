@@ -0,0 +1,88 @@
+"""Counterfactual recommendations against scoring each option on its own.
+
+    python -m pytest tests
+"""
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+
+from emission_model import CATEGORICAL_COLUMNS, EmissionPredictor, LabelVocabulary
+from forest_engine import CompiledForest
+from recommendations import CATEGORIES, LOAD_SPLITS, ROUTE_CUTS, best_by_category, counterfactuals, recommend
+from train_model import encode_features, fit_encoders, generate_trips
+
+
+@pytest.fixture(scope='module')
+def predictor():
+    trips = generate_trips(2_000, seed=13)
+    encoders = fit_encoders(trips)
+    model = RandomForestRegressor(n_estimators=8, max_depth=8, random_state=0)
+    model.fit(encode_features(trips, encoders), trips['CO2_Emission_kg'])
+    return EmissionPredictor(CompiledForest.from_sklearn(model),
+                             *(LabelVocabulary(list(encoders[col].classes_)) for col in CATEGORICAL_COLUMNS))
+
+
+@pytest.fixture(params=[0, 1, 2])
+def trip(request):
+    trip = generate_trips(3, seed=21).iloc[request.param]
+    return {col: trip[col] for col in ['Distance_km', 'Fuel_Type', 'Fuel_Consumed_Liters', 'Avg_Speed_kmph',
+                                       'Traffic_Level', 'Weather_Condition', 'Cargo_Weight_kg']}
+
+
+def _predict_one_by_one(predictor, trips):
+    return sum(float(predictor.predict(pd.DataFrame([t]))[0]) for t in trips)
+
+
+def test_batched_ranking_matches_scoring_each_option(predictor, trip):
+    result = recommend(predictor, trip)
+    baseline = _predict_one_by_one(predictor, [trip])
+    assert result['baseline_kg'] == pytest.approx(baseline, rel=1e-12)
+
+    expected = {}
+    for category, action, trips in counterfactuals(trip, predictor.vocabularies()['Fuel_Type']):
+        expected[action] = (category, _predict_one_by_one(predictor, trips))
+    assert {option['action'] for option in result['options']} == set(expected)
+    for option in result['options']:
+        category, predicted = expected[option['action']]
+        assert option['category'] == category
+        assert option['predicted_kg'] == pytest.approx(predicted, rel=1e-12)
+        assert option['savings_kg'] == pytest.approx(baseline - predicted, rel=1e-9, abs=1e-9)
+        assert option['savings_pct'] == pytest.approx((baseline - predicted) / baseline * 100, rel=1e-9, abs=1e-9)
+
+
+def test_options_are_ranked_best_first(predictor, trip):
+    savings = [option['savings_kg'] for option in recommend(predictor, trip)['options']]
+    assert savings == sorted(savings, reverse=True)
+
+
+def test_every_counterfactual_is_scored_in_one_batch(predictor, trip, monkeypatch):
+    batches = []
+    predict = predictor.predict
+    monkeypatch.setattr(predictor, 'predict', lambda trips, *args: batches.append(len(trips)) or predict(trips, *args))
+    result = recommend(predictor, trip)
+    fuels = len(predictor.vocabularies()['Fuel_Type']) - 1
+    assert result['trips_scored'] == 1 + len(ROUTE_CUTS) + fuels + 2 * len(LOAD_SPLITS)
+    assert batches == [result['trips_scored']]
+
+
+def test_counterfactuals_change_only_what_they_describe(trip):
+    fuels = ['Diesel', 'Electric', 'Petrol']
+    options = counterfactuals(trip, fuels)
+    assert {category for category, _, _ in options} == set(CATEGORIES)
+    for category, _, trips in options:
+        changed = {col for t in trips for col in t if t[col] != trip[col]}
+        assert changed <= {'route': {'Distance_km', 'Fuel_Consumed_Liters'}, 'fuel': {'Fuel_Type'},
+                           'load': {'Cargo_Weight_kg'}}[category]
+        if category == 'load':
+            assert sum(t['Cargo_Weight_kg'] for t in trips) == pytest.approx(trip['Cargo_Weight_kg'])
+    switched = [trips[0]['Fuel_Type'] for category, _, trips in options if category == 'fuel']
+    assert sorted(switched) == sorted(set(fuels) - {trip['Fuel_Type']})
+
+
+def test_best_by_category_picks_each_categorys_top_option(predictor, trip):
+    result = recommend(predictor, trip)
+    best = best_by_category(result)
+    assert set(best) == set(CATEGORIES)
+    for category, option in best.items():
+        assert option['savings_kg'] == max(o['savings_kg'] for o in result['options'] if o['category'] == category)
@@ -0,0 +1,78 @@
+"""What-if sweeps against predicting each grid cell as its own trip.
+
+    python -m pytest tests
+"""
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+
+from emission_model import CATEGORICAL_COLUMNS, FEATURE_COLUMNS, EmissionPredictor, LabelVocabulary
+from forest_engine import CompiledForest
+from sensitivity import SWEEP_RANGES, _nearest, render_heatmap, sweep, sweep_values
+from train_model import encode_features, fit_encoders, generate_trips
+
+
+@pytest.fixture(scope='module')
+def predictor():
+    trips = generate_trips(2_000, seed=17)
+    encoders = fit_encoders(trips)
+    model = RandomForestRegressor(n_estimators=8, max_depth=8, random_state=0)
+    model.fit(encode_features(trips, encoders), trips['CO2_Emission_kg'])
+    return EmissionPredictor(CompiledForest.from_sklearn(model),
+                             *(LabelVocabulary(list(encoders[col].classes_)) for col in CATEGORICAL_COLUMNS))
+
+
+@pytest.fixture(scope='module')
+def trip():
+    trip = generate_trips(1, seed=23).iloc[0]
+    return {col: trip[col] for col in FEATURE_COLUMNS}
+
+
+def _cell_by_cell(predictor, trip, changes):
+    return np.array([predictor.predict(pd.DataFrame([dict(trip, **change)]))[0] for change in changes])
+
+
+@pytest.mark.parametrize('feature', FEATURE_COLUMNS)
+def test_one_feature_sweep_matches_each_trip(predictor, trip, feature):
+    values = sweep_values(predictor, feature, points=7)
+    got = sweep(predictor, trip, feature, values)
+    assert got.shape == (len(values),)
+    np.testing.assert_allclose(got, _cell_by_cell(predictor, trip, [{feature: v} for v in values]), rtol=1e-12)
+
+
+@pytest.mark.parametrize('x_feature, y_feature', [('Distance_km', 'Cargo_Weight_kg'),
+                                                  ('Avg_Speed_kmph', 'Traffic_Level'),
+                                                  ('Fuel_Type', 'Weather_Condition')])
+def test_two_feature_grid_matches_each_trip(predictor, trip, x_feature, y_feature):
+    xs = sweep_values(predictor, x_feature, points=6)
+    ys = sweep_values(predictor, y_feature, points=4)
+    grid = sweep(predictor, trip, x_feature, xs, y_feature, ys)
+    assert grid.shape == (len(ys), len(xs))
+    expected = _cell_by_cell(predictor, trip, [{x_feature: x, y_feature: y} for y in ys for x in xs])
+    np.testing.assert_allclose(grid, expected.reshape(len(ys), len(xs)), rtol=1e-12)
+
+
+def test_sweep_values(predictor):
+    assert sweep_values(predictor, 'Fuel_Type') == predictor.vocabularies()['Fuel_Type']
+    lo, hi = SWEEP_RANGES['Distance_km']
+    values = sweep_values(predictor, 'Distance_km', points=5)
+    assert values[0] == lo and values[-1] == hi and len(values) == 5
+    assert sweep_values(predictor, 'Distance_km', lo=10, hi=20, points=3) == [10, 15, 20]
+
+
+def test_nearest_grid_cell():
+    assert _nearest([10.0, 20.0, 30.0], 24.0) == 1
+    assert _nearest([10.0, 20.0, 30.0], 31.0) is None
+    assert _nearest(['Diesel', 'Petrol'], 'Petrol') == 1
+    assert _nearest(['Diesel', 'Petrol'], 'Electric') is None
+
+
+@pytest.mark.parametrize('on_grid', [True, False])
+def test_heatmap_marks_the_trip_only_on_the_grid(predictor, trip, on_grid):
+    xs = sweep_values(predictor, 'Distance_km', points=5)
+    ys = sweep_values(predictor, 'Fuel_Type')
+    grid = sweep(predictor, trip, 'Distance_km', xs, 'Fuel_Type', ys)
+    marked = dict(trip, Distance_km=xs[2] if on_grid else xs[-1] + 1)
+    fig = render_heatmap(grid, 'Distance_km', xs, 'Fuel_Type', ys, trip=marked)
+    assert len(fig.axes[0].lines) == int(on_grid)
@@ -0,0 +1,116 @@
+"""StreamingSummary against DataFrame.describe(), and QuantileSketch error bounds.
+
+    python -m pytest tests
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from stream_stats import QuantileSketch, StreamingSummary, summarize_csv, summarize_dataset
+from train_model import generate_trips
+
+QUANTILES = np.linspace(0.01, 0.99, 99)
+CATEGORICAL = ['Fuel_Type', 'Traffic_Level', 'Weather_Condition']
+
+
+@pytest.fixture(scope='module')
+def trips():
+    trips = generate_trips(5_000, seed=3).drop(columns='Route_ID')
+    trips[CATEGORICAL] = trips[CATEGORICAL].astype(object)
+    # A few holes, which describe() and value_counts() skip
+    trips.loc[::97, 'Distance_km'] = np.nan
+    trips.loc[::89, 'Fuel_Type'] = np.nan
+    return trips
+
+
+def _summary(trips, chunk_rows, capacity=100_000):
+    numeric = [c for c in trips.columns if c not in CATEGORICAL]
+    summary = StreamingSummary(numeric, CATEGORICAL, capacity)
+    for start in range(0, len(trips), chunk_rows):
+        summary.update_frame(trips.iloc[start:start + chunk_rows])
+    return summary
+
+
+# =============================================
+# STREAMING SUMMARY
+# =============================================
+@pytest.mark.parametrize('chunk_rows', [1, 333, 5_000])
+def test_describe_matches_pandas(trips, chunk_rows):
+    summary = _summary(trips, chunk_rows)
+    assert summary.exact
+    expected = trips.describe()
+    pd.testing.assert_frame_equal(summary.describe(), expected[summary.numeric_columns], rtol=1e-12)
+
+
+def test_frequencies_match_value_counts(trips):
+    summary = _summary(trips, 700)
+    assert summary.rows == len(trips)
+    for col in CATEGORICAL:
+        expected = trips[col].value_counts()
+        got = summary.frequencies(col)
+        assert got.to_dict() == expected.to_dict()
+        assert summary.mode(col) == expected.index[0]
+
+
+def test_empty_column_describes_as_nan():
+    summary = StreamingSummary(['x'], [])
+    summary.update_frame(pd.DataFrame({'x': [np.nan, np.nan]}))
+    table = summary.describe()
+    assert table.loc['count', 'x'] == 0
+    assert table['x'].drop('count').isna().all()
+
+
+def test_summarize_csv_matches_pandas(trips, tmp_path):
+    path = tmp_path / 'trips.csv'
+    trips.to_csv(path, index=False)
+    summary = summarize_csv(path, chunk_rows=1_234)
+    expected = pd.read_csv(path).describe()
+    pd.testing.assert_frame_equal(summary.describe(), expected[summary.numeric_columns], rtol=1e-12)
+
+
+def test_summarize_dataset_matches_pandas_to_float32(trips, tmp_path):
+    path = tmp_path / 'trips.csv'
+    trips.to_csv(path, index=False)
+    summary = summarize_dataset(str(path), slice_rows=1_000)
+    expected = pd.read_csv(path).describe()
+    pd.testing.assert_frame_equal(summary.describe(), expected[summary.numeric_columns], rtol=1e-6)
+    assert summary.frequencies('Fuel_Type').to_dict() == trips['Fuel_Type'].value_counts().to_dict()
+
+
+# =============================================
+# QUANTILE SKETCH
+# =============================================
+def _rank_error(sketch, values):
+    estimates = np.asarray(sketch.quantiles(QUANTILES))
+    ranks = np.searchsorted(np.sort(values), estimates) / len(values)
+    return np.abs(ranks - QUANTILES).max()
+
+
+def test_sketch_is_exact_below_capacity():
+    values = np.random.default_rng(0).normal(size=999)
+    sketch = QuantileSketch(capacity=1_000)
+    sketch.update(values)
+    assert sketch.exact
+    np.testing.assert_array_equal(sketch.quantiles(QUANTILES), np.quantile(values, QUANTILES))
+
+
+@pytest.mark.parametrize('distribution', ['normal', 'lognormal', 'uniform'])
+@pytest.mark.parametrize('capacity', [200, 1_000])
+def test_sketch_rank_error_is_bounded(distribution, capacity):
+    values = getattr(np.random.default_rng(1), distribution)(size=300_000)
+    sketch = QuantileSketch(capacity)
+    for start in range(0, len(values), 7_777):
+        sketch.update(values[start:start + 7_777])
+    assert not sketch.exact
+    # Each level's compactions shift a rank by at most about 1/capacity of the stream
+    assert _rank_error(sketch, values) <= len(sketch.levels) / capacity
+    # Memory stays at most capacity items per level, and every input keeps its weight
+    assert all(len(level) < capacity for level in sketch.levels)
+    assert sum(len(level) * 2 ** h for h, level in enumerate(sketch.levels)) == len(values)
+
+
+def test_sketch_ignores_nan():
+    sketch = QuantileSketch(capacity=10)
+    sketch.update([np.nan] * 50 + list(range(100)))
+    assert sum(len(level) * 2 ** h for h, level in enumerate(sketch.levels)) == 100
+    assert np.isnan(QuantileSketch().quantiles([0.5])[0])
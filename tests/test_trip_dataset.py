@@ -0,0 +1,62 @@
+"""Loading and exporting the trip dataset.
+
+    python -m pytest tests
+"""
+import gzip
+import os
+import zipfile
+
+import pytest
+
+from trip_dataset import EXPORT_FORMATS, export_dataset, export_path, load_dataset
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    path = tmp_path / 'trips.csv'
+    path.write_text("Distance_km,Fuel_Type\n120.125,Diesel\n80.5,Petrol\n")
+    return str(path)
+
+
+def test_csv_exports_keep_the_source_bytes(dataset, tmp_path):
+    source = open(dataset, 'rb').read()
+    with open(export_dataset(dataset, 'csv', tmp_path / 'exports'), 'rb') as f:
+        assert f.read() == source
+    with gzip.open(export_dataset(dataset, 'csv.gz', tmp_path / 'exports')) as f:
+        assert f.read() == source
+    with zipfile.ZipFile(export_dataset(dataset, 'npz', tmp_path / 'exports')) as zf:
+        assert set(zf.namelist()) == {'schema.json', 'Distance_km.npy', 'Fuel_Type.npy'}
+
+
+def test_new_dataset_version_removes_old_exports_in_every_format(dataset, tmp_path):
+    export_dir = str(tmp_path / 'exports')
+    old = [export_dataset(dataset, fmt, export_dir) for fmt in EXPORT_FORMATS]
+    other = os.path.join(export_dir, 'other-1-2.csv')
+    open(other, 'w').close()
+    with open(dataset, 'a') as f:
+        f.write("42.0,Electric\n")
+
+    new = export_dataset(dataset, 'csv', export_dir)
+    assert new == export_path(dataset, 'csv', export_dir)
+    assert sorted(os.listdir(export_dir)) == sorted([os.path.basename(new), 'other-1-2.csv'])
+    assert not any(os.path.exists(path) for path in old)
+
+
+def test_existing_export_is_reused(dataset, tmp_path):
+    path = export_dataset(dataset, 'csv.gz', tmp_path / 'exports')
+    mtime = os.stat(path).st_mtime_ns
+    assert export_dataset(dataset, 'csv.gz', tmp_path / 'exports') == path
+    assert os.stat(path).st_mtime_ns == mtime
+
+
+def test_unknown_format_is_rejected(dataset, tmp_path):
+    with pytest.raises(ValueError, match='format'):
+        export_dataset(dataset, 'xlsx', tmp_path / 'exports')
+
+
+def test_load_dataset_reads_only_the_asked_columns_and_rows(dataset):
+    full = load_dataset(dataset)
+    head = load_dataset(dataset, columns=['Fuel_Type'], rows=slice(0, 1))
+    assert list(head.columns) == ['Fuel_Type'] and len(head) == 1
+    assert head['Fuel_Type'].tolist() == full['Fuel_Type'].tolist()[:1]
+    assert list(head['Fuel_Type'].cat.categories) == ['Diesel', 'Petrol']
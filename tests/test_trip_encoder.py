@@ -0,0 +1,131 @@
+"""TripEncoder's unknown-category policies, including empty cells.
+
+    python -m pytest tests
+"""
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+
+from emission_model import (CATEGORICAL_COLUMNS, EMPTY_LABEL, FEATURE_COLUMNS, EmissionPredictor, LabelVocabulary,
+                            TripEncoder, UnknownCategoryError)
+from forest_engine import CompiledForest
+from train_model import encode_features, fit_encoders, generate_trips
+
+# Row 1 has an unseen fuel, row 2 an empty weather cell and row 3 an empty distance
+UNSEEN_ROW, EMPTY_CATEGORY_ROW, EMPTY_NUMBER_ROW = 1, 2, 3
+
+
+@pytest.fixture(scope='module')
+def encoders():
+    return fit_encoders(generate_trips(2_000, seed=11))
+
+
+@pytest.fixture(scope='module')
+def vocabularies(encoders):
+    return {col: list(enc.classes_) for col, enc in encoders.items()}
+
+
+@pytest.fixture(scope='module')
+def predictor(encoders):
+    trips = generate_trips(2_000, seed=11)
+    model = RandomForestRegressor(n_estimators=5, max_depth=6, random_state=0)
+    model.fit(encode_features(trips, encoders), trips['CO2_Emission_kg'])
+    return EmissionPredictor(CompiledForest.from_sklearn(model),
+                             *(LabelVocabulary(list(encoders[col].classes_)) for col in CATEGORICAL_COLUMNS))
+
+
+@pytest.fixture(params=['object', 'category'])
+def trips(request):
+    trips = generate_trips(6, seed=5)[FEATURE_COLUMNS]
+    trips['Distance_km'] = trips['Distance_km'].astype(float)
+    trips[CATEGORICAL_COLUMNS] = trips[CATEGORICAL_COLUMNS].astype(object)
+    trips.loc[UNSEEN_ROW, 'Fuel_Type'] = 'Hydrogen'
+    trips.loc[EMPTY_CATEGORY_ROW, 'Weather_Condition'] = np.nan
+    trips.loc[EMPTY_NUMBER_ROW, 'Distance_km'] = np.nan
+    if request.param == 'category':
+        trips = trips.astype({col: 'category' for col in CATEGORICAL_COLUMNS})
+    return trips
+
+
+def test_clean_trips_encode_like_the_label_encoders(vocabularies, encoders):
+    trips = generate_trips(500, seed=3)
+    features, unscored_rows, report = TripEncoder(vocabularies).encode(trips)
+    np.testing.assert_array_equal(features.to_numpy(), encode_features(trips, encoders).to_numpy(dtype=np.float64))
+    assert not unscored_rows.any()
+    assert report == {'rows': 500, 'unknown_rows': 0, 'empty_rows': 0, 'policy': 'error', 'unknown': {},
+                      'empty': {}, 'unscored_rows': 0}
+
+
+def test_error_raises_on_unseen_category(vocabularies, trips):
+    with pytest.raises(UnknownCategoryError, match='Hydrogen'):
+        TripEncoder(vocabularies).encode(trips.drop(index=[EMPTY_CATEGORY_ROW, EMPTY_NUMBER_ROW]))
+
+
+@pytest.mark.parametrize('empty_row', [EMPTY_CATEGORY_ROW, EMPTY_NUMBER_ROW])
+def test_error_raises_on_empty_cells(vocabularies, trips, empty_row):
+    with pytest.raises(ValueError, match='empty'):
+        TripEncoder(vocabularies).encode(trips.loc[[0, empty_row]])
+
+
+def test_reject_drops_unseen_and_empty_rows(vocabularies, trips):
+    features, unscored_rows, report = TripEncoder(vocabularies, unknown='reject').encode(trips)
+    dropped = [UNSEEN_ROW, EMPTY_CATEGORY_ROW, EMPTY_NUMBER_ROW]
+    assert list(np.flatnonzero(unscored_rows)) == dropped
+    assert list(features.index) == [i for i in trips.index if i not in dropped]
+    assert not features.isna().any().any()
+    assert report['unknown'] == {'Fuel_Type': {'Hydrogen': 1}, 'Weather_Condition': {EMPTY_LABEL: 1}}
+    assert report['empty'] == {'Distance_km': 1}
+    assert (report['unknown_rows'], report['empty_rows'], report['unscored_rows']) == (2, 1, 3)
+
+
+def test_fallback_encodes_categories_and_leaves_empty_numbers_unscored(vocabularies, trips):
+    encoder = TripEncoder(vocabularies, unknown='fallback')
+    features, unscored_rows, report = encoder.encode(trips)
+    assert list(np.flatnonzero(unscored_rows)) == [EMPTY_NUMBER_ROW]
+    assert len(features) == len(trips)
+    assert features.loc[UNSEEN_ROW, 'Fuel_Type'] == vocabularies['Fuel_Type'].index('Diesel')
+    assert features.loc[EMPTY_CATEGORY_ROW, 'Weather_Condition'] == vocabularies['Weather_Condition'].index('Clear')
+    assert np.isnan(features.loc[EMPTY_NUMBER_ROW, 'Distance_km'])
+    assert report['unscored_rows'] == 1
+
+
+def test_flag_keeps_every_row_and_marks_unscored(vocabularies, trips):
+    features, unscored_rows, report = TripEncoder(vocabularies, unknown='flag').encode(trips)
+    assert list(np.flatnonzero(unscored_rows)) == [UNSEEN_ROW, EMPTY_CATEGORY_ROW, EMPTY_NUMBER_ROW]
+    assert len(features) == len(trips)
+    assert report['unknown'] == {'Fuel_Type': {'Hydrogen': 1}, 'Weather_Condition': {EMPTY_LABEL: 1}}
+    assert report['empty'] == {'Distance_km': 1}
+    assert report['unscored_rows'] == 3
+
+
+def test_unknown_policy_is_checked(vocabularies, trips):
+    with pytest.raises(ValueError, match='policy'):
+        TripEncoder(vocabularies, unknown='ignore')
+    with pytest.raises(ValueError, match='policy'):
+        TripEncoder(vocabularies).encode(trips, unknown='ignore')
+
+
+# =============================================
+# SCORING
+# =============================================
+def test_score_flag_leaves_unscored_rows_empty(predictor, trips):
+    scored = predictor.score(trips, unknown='flag')
+    unscored = [UNSEEN_ROW, EMPTY_CATEGORY_ROW, EMPTY_NUMBER_ROW]
+    assert list(scored.index[scored['Unknown_Category']]) == unscored
+    assert scored.loc[unscored, 'Predicted_CO2_kg'].isna().all()
+    assert scored.loc[unscored, 'Predicted_CO2_Std_kg'].isna().all()
+    assert scored.drop(index=unscored)['Predicted_CO2_kg'].notna().all()
+    assert scored.attrs['encoding']['unscored_rows'] == 3
+
+
+def test_score_reject_matches_clean_rows(predictor, trips):
+    scored = predictor.score(trips, unknown='reject', intervals=False)
+    clean = trips.drop(index=[UNSEEN_ROW, EMPTY_CATEGORY_ROW, EMPTY_NUMBER_ROW])
+    assert list(scored.index) == list(clean.index)
+    np.testing.assert_array_equal(scored['Predicted_CO2_kg'], predictor.predict(clean))
+
+
+def test_predict_fallback_is_empty_only_for_empty_numbers(predictor, trips):
+    predicted = predictor.predict(trips, unknown='fallback')
+    assert list(np.flatnonzero(np.isnan(predicted))) == [EMPTY_NUMBER_ROW]
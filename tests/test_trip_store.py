@@ -0,0 +1,86 @@
+"""TripStore's incrementally maintained rollups against a rescan of the trips.
+
+    python -m pytest tests
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from emission_model import CATEGORICAL_COLUMNS, EMPTY_LABEL, industry_average_emission
+from train_model import generate_trips
+from trip_store import PERIODS, TRIP_DATE_COLUMN, TripStore
+
+DEFAULT_DAY = '2025-03-15'
+
+
+def _scored(n, seed):
+    """Trips shaped like score() output, dated across a few months, with some gaps"""
+    rng = np.random.default_rng(seed)
+    trips = generate_trips(n, seed=seed)
+    trips[CATEGORICAL_COLUMNS] = trips[CATEGORICAL_COLUMNS].astype(object)
+    trips['Predicted_CO2_kg'] = trips['CO2_Emission_kg'] * rng.uniform(0.9, 1.1, n)
+    trips['Industry_Avg_CO2_kg'] = industry_average_emission(trips['Distance_km'], trips['Cargo_Weight_kg'])
+    days = np.datetime64('2025-01-01') + rng.integers(0, 120, n)
+    trips[TRIP_DATE_COLUMN] = days.astype(str)
+    trips.loc[::37, TRIP_DATE_COLUMN] = 'not a date'  # dated DEFAULT_DAY instead
+    trips.loc[::41, 'Predicted_CO2_kg'] = np.nan  # unscored: not stored
+    trips.loc[::43, 'Industry_Avg_CO2_kg'] = np.nan
+    trips.loc[::47, 'Weather_Condition'] = np.nan  # scored with the fallback class
+    return trips
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = TripStore(str(tmp_path / 'history.sqlite'))
+    # Several batches, so buckets are upserted more than once
+    for seed in range(4):
+        store.add(_scored(700, seed), source='bulk', when=DEFAULT_DAY)
+    yield store
+    store.close()
+
+
+def assert_rollup_matches_rescan(store, **query):
+    got = store.rollup(**query)
+    expected = store.rollup(rescan=True, **query)
+    assert len(got)
+    pd.testing.assert_frame_equal(got, expected, rtol=1e-9)
+
+
+@pytest.mark.parametrize('period', list(PERIODS))
+@pytest.mark.parametrize('by', [(), ('Fuel_Type',), ('Traffic_Level', 'Weather_Condition')])
+def test_rollups_match_rescan(store, period, by):
+    assert_rollup_matches_rescan(store, period=period, by=by)
+
+
+@pytest.mark.parametrize('period', list(PERIODS))
+def test_filtered_and_bounded_rollups_match_rescan(store, period):
+    assert_rollup_matches_rescan(store, period=period, Fuel_Type='Diesel')
+    assert_rollup_matches_rescan(store, period=period, start='2025-02', end='2025-03', by=['Traffic_Level'])
+    assert_rollup_matches_rescan(store, period=period, start='2025-02-10', end='2025-02-20')
+
+
+def test_rollups_count_every_stored_trip(store):
+    stored = store.stats()['trips']
+    for period in PERIODS:
+        assert store.rollup(period)['Trips'].sum() == stored
+    assert stored == sum(_scored(700, seed)['Predicted_CO2_kg'].notna().sum() for seed in range(4))
+
+
+def test_unparsed_dates_and_empty_categories_have_buckets(store):
+    days = store.rollup('day', by=['Weather_Condition'])
+    assert DEFAULT_DAY in set(days['Period'])
+    assert EMPTY_LABEL in set(days['Weather_Condition'])
+
+
+def test_rebuild_reproduces_incremental_rollups(store):
+    before = {period: store.rollup(period, by=CATEGORICAL_COLUMNS) for period in PERIODS}
+    store.rebuild_rollups()
+    for period, table in before.items():
+        pd.testing.assert_frame_equal(store.rollup(period, by=CATEGORICAL_COLUMNS), table, rtol=1e-9)
+
+
+def test_bad_rollup_queries_are_rejected(store):
+    with pytest.raises(ValueError, match='period'):
+        store.rollup('week')
+    with pytest.raises(ValueError, match='Distance_km'):
+        store.rollup(by=['Distance_km'])
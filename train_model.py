@@ -0,0 +1,201 @@
+"""Regenerate the emission model artifacts from synthetic trip data.
+
+    python train_model.py                          # 5,000 trips, 200 trees, depth 12
+    python train_model.py --samples 2000000 --max-samples 0.2 --output-dir build/
+
+Writes the model and label encoder pickles, the model bundle, the trip
+dataset CSV and ``model_manifest.json`` (parameters, stage timings, library
+versions and artifact checksums) into the output directory.
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from emission_model import (AVG_CO2_PER_KM, BUNDLE_FILE, CATEGORICAL_COLUMNS, FEATURE_COLUMNS,
+                            MANIFEST_FILE, MODEL_DIR, MODEL_FILES)
+from trip_dataset import DATASET_FILE
+
+# Emission factors by fuel type (kg CO2 per liter)
+FUEL_EMISSIONS = {
+    'Diesel': 2.68,
+    'Petrol': 2.31,
+    'CNG': 1.65,    # Lower emissions for CNG
+    'Electric': 0.0  # Zero direct emissions
+}
+FUEL_MIX = {'Diesel': 0.3, 'Petrol': 0.3, 'CNG': 0.2, 'Electric': 0.2}
+TRAFFIC_MIX = {'Low': 0.3, 'Medium': 0.5, 'High': 0.2}
+WEATHER_MIX = {'Clear': 0.6, 'Rainy': 0.3, 'Foggy': 0.1}
+SAMPLE_DATASET_ROWS = 2000
+
+
+# =============================================
+# SYNTHETIC DATA
+# =============================================
+def _choice(rng, mix, n):
+    """Draw n labels from a {label: probability} mix as a categorical"""
+    labels = list(mix)
+    codes = rng.choice(len(labels), size=n, p=list(mix.values()))
+    return pd.Categorical.from_codes(codes, categories=labels), codes
+
+
+def generate_trips(n_samples, seed=42):
+    """Synthetic logistics trips with CO2 emissions, built column-wise"""
+    rng = np.random.default_rng(seed)
+    fuel, fuel_codes = _choice(rng, FUEL_MIX, n_samples)
+    trips = pd.DataFrame({
+        'Route_ID': np.arange(1, n_samples + 1),
+        'Distance_km': rng.uniform(50, 2000, n_samples),
+        'Fuel_Type': fuel,
+        'Fuel_Consumed_Liters': rng.uniform(10, 500, n_samples),
+        'Avg_Speed_kmph': rng.uniform(30, 100, n_samples),
+        'Traffic_Level': _choice(rng, TRAFFIC_MIX, n_samples)[0],
+        'Weather_Condition': _choice(rng, WEATHER_MIX, n_samples)[0],
+        'Cargo_Weight_kg': rng.uniform(500, 10000, n_samples),
+    })
+    factors = np.array([FUEL_EMISSIONS[f] for f in FUEL_MIX])
+    trips['CO2_Emission_kg'] = (trips['Fuel_Consumed_Liters'] * factors[fuel_codes]
+                                + trips['Distance_km'] * trips['Cargo_Weight_kg'] * AVG_CO2_PER_KM / 1000)
+    return trips
+
+
+def write_sample_dataset(path=DATASET_FILE, n_samples=SAMPLE_DATASET_ROWS, seed=42):
+    """Write a synthetic trip CSV for the Data Explorer"""
+    generate_trips(n_samples, seed).to_csv(path, index=False)
+    return path
+
+
+# =============================================
+# TRAINING
+# =============================================
+class StageTimer:
+    """Wall-clock seconds per named stage, printed as they finish"""
+
+    def __init__(self, verbose=True):
+        self.seconds = {}
+        self.verbose = verbose
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        yield
+        self.seconds[name] = time.perf_counter() - start
+        if self.verbose:
+            print(f"  {name:<18} {self.seconds[name]:>8.2f} s")
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def fit_encoders(trips):
+    """Fit one LabelEncoder per categorical column on its categories"""
+    from sklearn.preprocessing import LabelEncoder
+
+    return {col: LabelEncoder().fit(np.asarray(trips[col].cat.categories, dtype=str))
+            for col in CATEGORICAL_COLUMNS}
+
+
+def encode_features(trips, encoders):
+    """Feature matrix with label codes, mapped per category rather than per row"""
+    features = trips[FEATURE_COLUMNS].copy()
+    for col, encoder in encoders.items():
+        lookup = encoder.transform(np.asarray(trips[col].cat.categories, dtype=str))
+        features[col] = lookup[trips[col].cat.codes.to_numpy()]
+    return features
+
+
+def train(n_samples=5000, n_estimators=200, max_depth=12, min_samples_split=5, max_samples=None,
+          seed=42, n_jobs=-1, output_dir=MODEL_DIR, write_dataset=True, verbose=True):
+    """Generate data, fit the forest on all cores and write every artifact; returns the manifest"""
+    import joblib
+    import sklearn
+    from sklearn.ensemble import RandomForestRegressor
+
+    from forest_engine import CompiledForest
+    from model_bundle import write_bundle
+
+    os.makedirs(output_dir, exist_ok=True)
+    timer = StageTimer(verbose)
+    params = {'n_estimators': n_estimators, 'max_depth': max_depth, 'min_samples_split': min_samples_split,
+              'max_samples': max_samples, 'random_state': seed}
+    if verbose:
+        print(f"Training on {n_samples:,} synthetic trips with {params}")
+
+    with timer.stage('generate'):
+        trips = generate_trips(n_samples, seed)
+    with timer.stage('encode'):
+        encoders = fit_encoders(trips)
+        X = encode_features(trips, encoders)
+        y = trips['CO2_Emission_kg']
+    with timer.stage('fit'):
+        model = RandomForestRegressor(n_jobs=n_jobs, **params)
+        model.fit(X, y)
+        # Predictions are served single-threaded; only training fans out
+        model.set_params(n_jobs=None)
+
+    with timer.stage('write model'):
+        encoder_list = [encoders['Fuel_Type'], encoders['Traffic_Level'], encoders['Weather_Condition']]
+        for name, obj in zip(MODEL_FILES, [model] + encoder_list):
+            joblib.dump(obj, os.path.join(output_dir, name))
+        forest = CompiledForest.from_sklearn(model)
+        write_bundle(os.path.join(output_dir, BUNDLE_FILE), forest,
+                     {col: enc.classes_ for col, enc in encoders.items()},
+                     {'source': 'train_model.py',
+                      'feature_importances': model.feature_importances_.tolist(),
+                      'n_estimators': forest.n_trees,
+                      'training_rows': n_samples})
+    artifacts = MODEL_FILES + [BUNDLE_FILE]
+    if write_dataset:
+        with timer.stage('write dataset'):
+            trips.to_csv(os.path.join(output_dir, DATASET_FILE), index=False)
+        artifacts.append(DATASET_FILE)
+
+    manifest = {
+        'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'n_samples': n_samples,
+        'params': params,
+        'n_jobs': n_jobs,
+        'features': FEATURE_COLUMNS,
+        'vocabularies': {col: list(enc.classes_) for col, enc in encoders.items()},
+        'seconds': {name: round(s, 3) for name, s in timer.seconds.items()},
+        'versions': {'numpy': np.__version__, 'pandas': pd.__version__, 'scikit-learn': sklearn.__version__},
+        'artifacts': {name: _sha256(os.path.join(output_dir, name)) for name in artifacts},
+    }
+    with open(os.path.join(output_dir, MANIFEST_FILE), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    if verbose:
+        print(f"  {'total':<18} {sum(timer.seconds.values()):>8.2f} s -> {os.path.abspath(output_dir)}")
+    return manifest
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train the CO2 emission model on synthetic trips")
+    parser.add_argument('--samples', type=int, default=5000, help="synthetic trips to generate")
+    parser.add_argument('--trees', type=int, default=200)
+    parser.add_argument('--max-depth', type=int, default=12)
+    parser.add_argument('--min-samples-split', type=int, default=5)
+    parser.add_argument('--max-samples', type=float, default=None,
+                        help="fraction of rows bootstrapped per tree (bounds fit time on large data)")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--jobs', type=int, default=-1, help="training processes (-1 = all cores)")
+    parser.add_argument('--output-dir', default=MODEL_DIR)
+    parser.add_argument('--no-dataset', action='store_true', help="skip writing the trip CSV")
+    args = parser.parse_args(argv)
+    train(n_samples=args.samples, n_estimators=args.trees, max_depth=args.max_depth,
+          min_samples_split=args.min_samples_split, max_samples=args.max_samples, seed=args.seed,
+          n_jobs=args.jobs, output_dir=args.output_dir, write_dataset=not args.no_dataset)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,254 @@
+"""Columnar on-disk copy of the trip CSV used by the Data Explorer.
+
+The CSV is converted once, chunk by chunk, into a directory holding one
+``.npy`` file per column plus ``schema.json``. Text columns become integer
+category codes and numeric columns are downcast (floats to float32, integers
+to the narrowest type that fits). The copy is rebuilt whenever the CSV's size
+or mtime changes, and loads by memory-mapping the column files.
+"""
+import gzip
+import json
+import os
+import re
+import shutil
+import tempfile
+import zipfile
+
+import numpy as np
+import pandas as pd
+
+from emission_model import CATEGORICAL_COLUMNS
+
+DATASET_FILE = 'carbon_footprint_logistics_2000.csv'
+STORE_FORMAT_VERSION = 1
+CONVERT_CHUNK_ROWS = 500_000  # CSV rows parsed per chunk during conversion
+COPY_SLICE_ROWS = 1_000_000  # rows copied per slice when finalizing a column
+EXPORT_COPY_BYTES = 1 << 20  # bytes copied per read when exporting the source CSV
+EXPORT_GZIP_LEVEL = 6  # zlib's default; level 9 is several times slower for ~2% smaller files
+EXPORT_DIR = os.path.join(tempfile.gettempdir(), 'ecovision_exports')
+EXPORT_FORMATS = {'csv.gz': 'application/gzip', 'csv': 'text/csv', 'npz': 'application/zip'}
+
+
+class DatasetError(ValueError):
+    """The trip CSV cannot be converted to the columnar store"""
+
+
+def dataset_stamp(csv_path=DATASET_FILE):
+    """Identify the CSV by path, size and mtime (raises FileNotFoundError)"""
+    info = os.stat(csv_path)
+    return (os.path.abspath(csv_path), info.st_size, info.st_mtime_ns)
+
+
+def store_path(csv_path):
+    """Directory holding the columnar copy of csv_path"""
+    return os.path.splitext(csv_path)[0] + '.columns'
+
+
+def _narrowest_int(lo, hi):
+    for dtype in (np.int8, np.int16, np.int32):
+        info = np.iinfo(dtype)
+        if info.min <= lo and hi <= info.max:
+            return np.dtype(dtype)
+    return np.dtype(np.int64)
+
+
+def convert_csv(csv_path, store_dir=None, chunk_rows=CONVERT_CHUNK_ROWS):
+    """Convert csv_path into a columnar store without holding the whole file in memory"""
+    store_dir = store_dir or store_path(csv_path)
+    size, mtime_ns = dataset_stamp(csv_path)[1:]
+    tmp_dir = store_dir + '.tmp'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    columns = None
+    kinds = {}
+    vocabularies = {}
+    ranges = {}
+    raw_files = {}
+    rows = 0
+    try:
+        for chunk in pd.read_csv(csv_path, chunksize=chunk_rows):
+            if columns is None:
+                columns = list(chunk.columns)
+                for col in columns:
+                    if col in CATEGORICAL_COLUMNS or chunk[col].dtype == object:
+                        kinds[col] = 'category'
+                        vocabularies[col] = {}
+                    elif pd.api.types.is_integer_dtype(chunk[col]):
+                        kinds[col] = 'int'
+                        ranges[col] = None
+                    else:
+                        kinds[col] = 'float'
+                    raw_files[col] = open(os.path.join(tmp_dir, f'{col}.raw'), 'wb')
+            elif list(chunk.columns) != columns:
+                raise DatasetError("CSV columns changed between chunks")
+
+            for col in columns:
+                series = chunk[col]
+                if kinds[col] == 'category':
+                    vocab = vocabularies[col]
+                    for value in series.dropna().unique():
+                        vocab.setdefault(value, len(vocab))
+                    data = series.map(vocab).fillna(-1).to_numpy(np.int32)
+                elif kinds[col] == 'int':
+                    if not pd.api.types.is_integer_dtype(series):
+                        raise DatasetError(f"Column {col} has non-integer values after row {rows}")
+                    data = series.to_numpy(np.int64)
+                    lo, hi = int(data.min()), int(data.max())
+                    if ranges[col] is not None:
+                        lo, hi = min(lo, ranges[col][0]), max(hi, ranges[col][1])
+                    ranges[col] = (lo, hi)
+                else:
+                    data = series.to_numpy(np.float32)
+                raw_files[col].write(data.tobytes())
+            rows += len(chunk)
+    finally:
+        for f in raw_files.values():
+            f.close()
+
+    if columns is None:
+        shutil.rmtree(tmp_dir)
+        raise DatasetError(f"{csv_path} has no rows")
+
+    schema = {'format_version': STORE_FORMAT_VERSION, 'rows': rows,
+              'source': {'size': size, 'mtime_ns': mtime_ns}, 'columns': []}
+    for col in columns:
+        raw_dtype = {'category': np.int32, 'int': np.int64, 'float': np.float32}[kinds[col]]
+        entry = {'name': col, 'kind': kinds[col]}
+        if kinds[col] == 'category':
+            # Store categories sorted so codes order like the label encoders
+            ordered = sorted(vocabularies[col], key=str)
+            remap = np.full(len(ordered) + 1, -1, dtype=np.int32)
+            for new_code, value in enumerate(ordered):
+                remap[vocabularies[col][value]] = new_code
+            entry['categories'] = [str(v) for v in ordered]
+            final_dtype = _narrowest_int(-1, len(ordered))
+        elif kinds[col] == 'int':
+            remap = None
+            final_dtype = _narrowest_int(*ranges[col])
+        else:
+            remap = None
+            final_dtype = np.dtype(np.float32)
+        entry['dtype'] = final_dtype.str
+
+        raw_path = os.path.join(tmp_dir, f'{col}.raw')
+        raw = np.memmap(raw_path, dtype=raw_dtype, mode='r') if rows else np.empty(0, raw_dtype)
+        out = np.lib.format.open_memmap(os.path.join(tmp_dir, f'{col}.npy'), mode='w+',
+                                        dtype=final_dtype, shape=(rows,))
+        for start in range(0, rows, COPY_SLICE_ROWS):
+            part = raw[start:start + COPY_SLICE_ROWS]
+            out[start:start + COPY_SLICE_ROWS] = remap[part] if remap is not None else part
+        out.flush()
+        del out, raw
+        os.remove(raw_path)
+        schema['columns'].append(entry)
+
+    with open(os.path.join(tmp_dir, 'schema.json'), 'w') as f:
+        json.dump(schema, f, indent=2)
+    shutil.rmtree(store_dir, ignore_errors=True)
+    os.replace(tmp_dir, store_dir)
+    return store_dir
+
+
+def _read_schema(store_dir):
+    try:
+        with open(os.path.join(store_dir, 'schema.json')) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def ensure_store(csv_path=DATASET_FILE):
+    """Return the columnar store for csv_path, converting it first if stale"""
+    store_dir = store_path(csv_path)
+    size, mtime_ns = dataset_stamp(csv_path)[1:]
+    schema = _read_schema(store_dir)
+    if (schema is None or schema.get('format_version') != STORE_FORMAT_VERSION
+            or schema['source'] != {'size': size, 'mtime_ns': mtime_ns}):
+        convert_csv(csv_path, store_dir)
+    return store_dir
+
+
+def open_columns(csv_path=DATASET_FILE):
+    """Return (schema, {column: memory-mapped array}) without loading any rows"""
+    store_dir = ensure_store(csv_path)
+    schema = _read_schema(store_dir)
+    arrays = {entry['name']: np.load(os.path.join(store_dir, f"{entry['name']}.npy"), mmap_mode='r')
+              for entry in schema['columns']}
+    return schema, arrays
+
+
+def load_dataset(csv_path=DATASET_FILE, columns=None, rows=None):
+    """Load the trip dataset as a compact DataFrame with categorical text columns.
+
+    columns and rows (a slice of row positions) limit what is read from the store.
+    """
+    schema, arrays = open_columns(csv_path)
+    data = {}
+    for entry in schema['columns']:
+        if columns is not None and entry['name'] not in columns:
+            continue
+        values = arrays[entry['name']] if rows is None else arrays[entry['name']][rows]
+        if entry['kind'] == 'category':
+            data[entry['name']] = pd.Categorical.from_codes(values, categories=entry['categories'])
+        else:
+            data[entry['name']] = np.asarray(values)
+    return pd.DataFrame(data)
+
+
+# =============================================
+# EXPORT
+# =============================================
+def export_path(csv_path, fmt, export_dir=EXPORT_DIR):
+    """Where the export of this CSV version in fmt lives"""
+    _, size, mtime_ns = dataset_stamp(csv_path)
+    base = os.path.splitext(os.path.basename(csv_path))[0]
+    return os.path.join(export_dir, f"{base}-{size}-{mtime_ns}.{fmt}")
+
+
+def export_dataset(csv_path=DATASET_FILE, fmt='csv.gz', export_dir=EXPORT_DIR):
+    """Write (or reuse) an export of the dataset and return its path.
+
+    CSV exports stream the source CSV through unchanged (gzipped for csv.gz),
+    so they keep its full float64 precision. The npz export zips the store's
+    column files as they are, with schema.json holding the category labels;
+    its floats are the store's float32 copies.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format {fmt!r}")
+    path = export_path(csv_path, fmt, export_dir)
+    if os.path.exists(path):
+        return path
+    os.makedirs(export_dir, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+
+    if fmt == 'npz':
+        store_dir = ensure_store(csv_path)
+        with zipfile.ZipFile(tmp_path, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+            for name in sorted(os.listdir(store_dir)):
+                zf.write(os.path.join(store_dir, name), arcname=name)
+    else:
+        if fmt == 'csv.gz':
+            dest = gzip.open(tmp_path, 'wb', compresslevel=EXPORT_GZIP_LEVEL)
+        else:
+            dest = open(tmp_path, 'wb')
+        with open(csv_path, 'rb') as src, dest:
+            shutil.copyfileobj(src, dest, EXPORT_COPY_BYTES)
+
+    os.replace(tmp_path, path)
+    _remove_stale_exports(csv_path, export_dir)
+    return path
+
+
+def _remove_stale_exports(csv_path, export_dir):
+    """Drop exports of older versions of the same dataset, in every format"""
+    _, size, mtime_ns = dataset_stamp(csv_path)
+    base = os.path.splitext(os.path.basename(csv_path))[0]
+    current = f"{base}-{size}-{mtime_ns}."
+    export_name = re.compile(re.escape(base) + r'-\d+-\d+\.')
+    for name in os.listdir(export_dir):
+        if export_name.match(name) and not name.startswith(current):
+            try:
+                os.remove(os.path.join(export_dir, name))
+            except FileNotFoundError:
+                pass  # another session got there first
@@ -0,0 +1,265 @@
+"""Local history of scored trips in SQLite, with daily and monthly rollups.
+
+Every scored trip (Emission Scan or bulk scoring) is appended to the
+``trips`` table, indexed on date, fuel type, traffic and weather. The
+``rollups`` table holds one row per day or month and combination of those
+three categories: trips, predicted CO2, distance, tonne-km and the industry
+average. Each insert aggregates its batch in pandas and upserts the touched
+buckets in the same transaction, so the rollups never lag the trips and a
+year of history is read from a few thousand aggregate rows instead of a
+rescan of every trip.
+
+    python trip_store.py add scored.csv.gz         # Trip_Date column optional, else today
+    python trip_store.py rollup --period month --by Fuel_Type
+    python trip_store.py rebuild                   # recompute the rollups from the trips
+"""
+import argparse
+import os
+import sqlite3
+import threading
+from datetime import datetime, timezone
+
+import numpy as np
+
+from emission_model import CATEGORICAL_COLUMNS, EMPTY_LABEL, FEATURE_COLUMNS, MODEL_DIR
+
+TRIP_STORE_FILE = os.path.join(MODEL_DIR, 'trip_history.sqlite')
+TRIP_DATE_COLUMN = 'Trip_Date'  # optional in scored files: the day each trip ran
+SCORE_COLUMNS = ['Predicted_CO2_kg', 'Industry_Avg_CO2_kg']
+PERIODS = {'day': 10, 'month': 7}  # bucket = leading characters of the ISO trip date
+ROLLUP_METRICS = ['Trips', 'CO2_kg', 'Distance_km', 'Tonne_km', 'Industry_Avg_CO2_kg']
+TRIP_COLUMNS = [TRIP_DATE_COLUMN, 'Source'] + FEATURE_COLUMNS + SCORE_COLUMNS
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS trips (
+    Trip_ID INTEGER PRIMARY KEY,
+    Trip_Date TEXT NOT NULL,
+    Source TEXT NOT NULL,
+    Distance_km REAL, Fuel_Type TEXT, Fuel_Consumed_Liters REAL, Avg_Speed_kmph REAL,
+    Traffic_Level TEXT, Weather_Condition TEXT, Cargo_Weight_kg REAL,
+    Predicted_CO2_kg REAL NOT NULL, Industry_Avg_CO2_kg REAL
+);
+CREATE INDEX IF NOT EXISTS trips_date ON trips (Trip_Date);
+CREATE INDEX IF NOT EXISTS trips_fuel ON trips (Fuel_Type);
+CREATE INDEX IF NOT EXISTS trips_traffic ON trips (Traffic_Level);
+CREATE INDEX IF NOT EXISTS trips_weather ON trips (Weather_Condition);
+CREATE TABLE IF NOT EXISTS rollups (
+    Period TEXT NOT NULL,
+    Bucket TEXT NOT NULL,
+    {', '.join(f'{col} TEXT NOT NULL' for col in CATEGORICAL_COLUMNS)},
+    Trips INTEGER NOT NULL, CO2_kg REAL NOT NULL, Distance_km REAL NOT NULL,
+    Tonne_km REAL NOT NULL, Industry_Avg_CO2_kg REAL NOT NULL,
+    PRIMARY KEY (Period, Bucket, {', '.join(CATEGORICAL_COLUMNS)})
+) WITHOUT ROWID;
+"""
+
+_UPSERT = f"""
+INSERT INTO rollups (Period, Bucket, {', '.join(CATEGORICAL_COLUMNS)}, {', '.join(ROLLUP_METRICS)})
+VALUES ({', '.join('?' * (2 + len(CATEGORICAL_COLUMNS) + len(ROLLUP_METRICS)))})
+ON CONFLICT (Period, Bucket, {', '.join(CATEGORICAL_COLUMNS)}) DO UPDATE SET {', '.join(f'{m} = {m} + excluded.{m}' for m in ROLLUP_METRICS)}
+"""
+
+# The same aggregates straight from the trips: used to rebuild the rollups
+# and as the rescan a dashboard would otherwise do
+_TRIP_AGGREGATES = ("COUNT(*), SUM(Predicted_CO2_kg), SUM(Distance_km), "
+                    "SUM(Distance_km * Cargo_Weight_kg / 1000), SUM(COALESCE(Industry_Avg_CO2_kg, 0))")
+
+
+def _date_bounds(column, start, end):
+    """WHERE clauses and parameters for an inclusive range of ISO date prefixes"""
+    where, params = [], []
+    if start:
+        where.append(f"{column} >= ?")
+        params.append(str(start))
+    if end:
+        where.append(f"{column} <= ?")
+        params.append(str(end) + '\uffff')  # '2025-01' as an end bound covers every day of the month
+    return where, params
+
+
+class TripStore:
+    """Append-only trip history with incrementally maintained rollups.
+
+    One connection is shared by every thread that uses the store (the app
+    keeps a single instance), so each operation holds a lock.
+    """
+
+    def __init__(self, path=TRIP_STORE_FILE):
+        self.path = path
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.execute('PRAGMA cache_size=-65536')
+        self.connection.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+
+    def close(self):
+        self.connection.close()
+
+    def add(self, scored, source, when=None):
+        """Append scored trips and update their rollups; returns the number stored.
+
+        Rows without a prediction (e.g. unknown categories in bulk scoring)
+        are skipped. Empty categories scored with the fallback class are
+        stored as EMPTY_LABEL, so they have a rollup bucket. Trips are dated
+        by their Trip_Date column where it parses, otherwise by ``when`` (a
+        date, default today in UTC).
+        """
+        import pandas as pd
+
+        scored = scored[scored['Predicted_CO2_kg'].notna()]
+        if scored.empty:
+            return 0
+        when = np.datetime64(when or datetime.now(timezone.utc).date(), 'D')
+        dates = np.full(len(scored), when)
+        if TRIP_DATE_COLUMN in scored.columns:
+            parsed = pd.to_datetime(scored[TRIP_DATE_COLUMN], errors='coerce', format='ISO8601')
+            parsed = parsed.to_numpy(dtype='datetime64[D]')
+            dates = np.where(np.isnat(parsed), when, parsed)
+        trips = pd.DataFrame({TRIP_DATE_COLUMN: dates.astype(str), 'Source': source}, index=scored.index)
+        for col in FEATURE_COLUMNS + SCORE_COLUMNS:
+            values = scored[col]
+            trips[col] = values.astype(object).fillna(EMPTY_LABEL) if col in CATEGORICAL_COLUMNS else values
+        rows = trips.astype(object).where(trips.notna(), None).itertuples(index=False, name=None)
+
+        with self._lock, self.connection:
+            self.connection.executemany(
+                f"INSERT INTO trips ({', '.join(TRIP_COLUMNS)}) VALUES ({', '.join('?' * len(TRIP_COLUMNS))})",
+                rows)
+            self.connection.executemany(_UPSERT, self._bucket_totals(trips))
+        return len(trips)
+
+    @staticmethod
+    def _bucket_totals(trips):
+        """Rollup rows for one batch of trips: (period, bucket, categories..., metrics...) for every period"""
+        import pandas as pd
+
+        values = pd.DataFrame({
+            'Trips': 1,
+            'CO2_kg': trips['Predicted_CO2_kg'],
+            'Distance_km': trips['Distance_km'],
+            'Tonne_km': trips['Distance_km'] * trips['Cargo_Weight_kg'] / 1000,
+            'Industry_Avg_CO2_kg': trips['Industry_Avg_CO2_kg'].fillna(0.0),
+        }, columns=ROLLUP_METRICS)
+        # One pass to days, then each period regroups the (much smaller) day totals
+        days = values.groupby([trips[TRIP_DATE_COLUMN]] + [trips[col] for col in CATEGORICAL_COLUMNS],
+                              sort=False).sum()
+        dates = days.index.get_level_values(0)
+        categories = [days.index.get_level_values(col) for col in CATEGORICAL_COLUMNS]
+        rows = []
+        for period, width in PERIODS.items():
+            totals = days.groupby([dates.str[:width]] + categories, sort=False).sum()
+            rows.extend((period,) + keys + (int(metrics[0]),) + tuple(float(v) for v in metrics[1:])
+                        for keys, metrics in zip(totals.index, totals.to_numpy(dtype=np.float64)))
+        return rows
+
+    def rebuild_rollups(self):
+        """Recompute every rollup from the trips table (after editing trips by hand)"""
+        with self._lock, self.connection:
+            self.connection.execute("DELETE FROM rollups")
+            for period, width in PERIODS.items():
+                self.connection.execute(
+                    f"INSERT INTO rollups SELECT ?, substr(Trip_Date, 1, {width}), "
+                    f"{', '.join(CATEGORICAL_COLUMNS)}, {_TRIP_AGGREGATES} FROM trips "
+                    f"GROUP BY 2, {', '.join(CATEGORICAL_COLUMNS)}", (period,))
+
+    def rollup(self, period='month', start=None, end=None, by=(), rescan=False, **filters):
+        """Totals per day or month as a DataFrame, read from the precomputed rollups.
+
+        ``start``/``end`` bound the buckets ('2025-01' or '2025-01-31', inclusive),
+        ``by`` splits each bucket by category columns and keyword filters
+        (Fuel_Type='Diesel') keep one category. ``rescan=True`` aggregates the
+        raw trips instead, for checking the rollups or timing the difference.
+        """
+        import pandas as pd
+
+        if period not in PERIODS:
+            raise ValueError(f"period must be one of {', '.join(PERIODS)}")
+        by = list(by)
+        unknown = [col for col in by + list(filters) if col not in CATEGORICAL_COLUMNS]
+        if unknown:
+            raise ValueError(f"Cannot group or filter by {', '.join(unknown)}")
+        width = PERIODS[period]
+        # Bounds select whole buckets, so a rescan covers exactly the rollup rows it checks
+        start, end = start and str(start)[:width], end and str(end)[:width]
+        if rescan:
+            bucket = f"substr(Trip_Date, 1, {width})"
+            where, params = _date_bounds('Trip_Date', start, end)
+        else:
+            bucket = "Bucket"
+            where, params = _date_bounds('Bucket', start, end)
+            where.insert(0, "Period = ?")
+            params.insert(0, period)
+        for col, value in filters.items():
+            where.append(f"{col} = ?")
+            params.append(value)
+        aggregates = _TRIP_AGGREGATES if rescan else ', '.join(f'SUM({m})' for m in ROLLUP_METRICS)
+        query = (f"SELECT {bucket}, {''.join(f'{col}, ' for col in by)}{aggregates} "
+                 f"FROM {'trips' if rescan else 'rollups'} "
+                 f"{'WHERE ' + ' AND '.join(where) if where else ''} "
+                 f"GROUP BY {', '.join(['1'] + by)} ORDER BY {', '.join(['1'] + by)}")
+        with self._lock:
+            rows = self.connection.execute(query, params).fetchall()
+        table = pd.DataFrame(rows, columns=['Period'] + by + ROLLUP_METRICS)
+        table['CO2_per_km'] = table['CO2_kg'] / table['Distance_km'].where(table['Distance_km'] > 0)
+        return table
+
+    def trips(self, start=None, end=None, limit=None, **filters):
+        """Raw stored trips as a DataFrame, newest first; dates and filters as in rollup()"""
+        import pandas as pd
+
+        where, params = _date_bounds('Trip_Date', start, end)
+        for col, value in filters.items():
+            if col not in CATEGORICAL_COLUMNS:
+                raise ValueError(f"Cannot filter by {col}")
+            where.append(f"{col} = ?")
+            params.append(value)
+        query = (f"SELECT Trip_ID, {', '.join(TRIP_COLUMNS)} FROM trips "
+                 f"{'WHERE ' + ' AND '.join(where) if where else ''} ORDER BY Trip_Date DESC, Trip_ID DESC"
+                 f"{f' LIMIT {int(limit)}' if limit else ''}")
+        with self._lock:
+            rows = self.connection.execute(query, params).fetchall()
+        return pd.DataFrame(rows, columns=['Trip_ID'] + TRIP_COLUMNS)
+
+    def stats(self):
+        """Trip count, date range and rollup row count"""
+        with self._lock:
+            trips, first, last = self.connection.execute(
+                "SELECT COUNT(*), MIN(Trip_Date), MAX(Trip_Date) FROM trips").fetchone()
+            rollups = self.connection.execute("SELECT COUNT(*) FROM rollups").fetchone()[0]
+        return {'trips': trips, 'first_date': first, 'last_date': last, 'rollup_rows': rollups}
+
+
+def main(argv=None):
+    import pandas as pd
+
+    parser = argparse.ArgumentParser(description="Trip history store with daily and monthly rollups")
+    parser.add_argument('--store', default=TRIP_STORE_FILE)
+    sub = parser.add_subparsers(dest='command', required=True)
+    p_add = sub.add_parser('add', help="append a scored trip file (score_cli.py output)")
+    p_add.add_argument('scored')
+    p_add.add_argument('--source', default='bulk')
+    p_rollup = sub.add_parser('rollup', help="print daily or monthly totals")
+    p_rollup.add_argument('--period', choices=list(PERIODS), default='month')
+    p_rollup.add_argument('--by', action='append', default=[], choices=CATEGORICAL_COLUMNS)
+    p_rollup.add_argument('--start')
+    p_rollup.add_argument('--end')
+    sub.add_parser('rebuild', help="recompute the rollups from the stored trips")
+    args = parser.parse_args(argv)
+
+    store = TripStore(args.store)
+    if args.command == 'add':
+        added = sum(store.add(chunk, args.source) for chunk in pd.read_csv(args.scored, chunksize=100_000))
+        print(f"Stored {added:,} trips in {args.store}")
+    elif args.command == 'rollup':
+        print(store.rollup(args.period, args.start, args.end, by=args.by).to_string(index=False))
+    else:
+        store.rebuild_rollups()
+    info = store.stats()
+    print(f"{info['trips']:,} trips from {info['first_date']} to {info['last_date']}, "
+          f"{info['rollup_rows']:,} rollup rows")
+    store.close()
+
+
+if __name__ == '__main__':
+    main()